@@ -0,0 +1,5 @@
+# asgi.py punto de entrada asgi de la aplicacion (por ejemplo: hypercorn asgi:app)
+
+from main import create_asgi_app
+
+app = create_asgi_app()
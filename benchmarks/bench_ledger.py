@@ -0,0 +1,85 @@
+# bench_ledger.py mide cuanto tardan las consultas de /api/analytics con muchos recibos por usuario
+#
+# uso: python benchmarks/bench_ledger.py [--receipts 30000] [--items 10] [--products 3000] [--queries 200]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from src.infrastructure.db.sqlite_receipt_ledger import SQLiteReceiptLedger
+from src.application.usecases.receipt_processing_result import ReceiptProcessingResult
+from domain.receipt_data import ReceiptData
+
+STORES = ["MERCADONA", "LIDL", "CARREFOUR", "DIA", "FARMACIA GARCIA", "BAR LA ESQUINA", None]
+
+
+def build_receipts(count: int, items: int, products: int, seed: int):
+    rnd = random.Random(seed)
+    names = [f"PRODUCTO {i}" for i in range(products)] + ["LECHE ENTERA 1L", "LECHE SEMI 1L", "PAN BARRA"]
+    for index in range(count):
+        fecha = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.choice([2024, 2025])}"
+        lines = [
+            ReceiptData(fecha=fecha, producto=rnd.choice(names), cantidad=rnd.randint(1, 3),
+                        precio=round(rnd.uniform(0.5, 20), 2), descuento=0.0)
+            for _ in range(items)
+        ]
+        yield f"bench-{index}", ReceiptProcessingResult(
+            receipt_data_list=lines,
+            total=round(sum(line.total for line in lines), 2),
+            comercio=rnd.choice(STORES)
+        )
+
+
+def measure(label: str, query, queries: int):
+    timings = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{label:<36} p50 {timings[len(timings) // 2]:>8.2f} ms   p95 {timings[int(len(timings) * 0.95)]:>8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receipts", type=int, default=30000, help="recibos del usuario medido")
+    parser.add_argument("--items", type=int, default=10, help="productos por recibo")
+    parser.add_argument("--products", type=int, default=3000, help="productos distintos")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = SQLiteReceiptLedger(str(Path(tmp) / "ledger.db"))
+        email = "bench@example.com"
+
+        start = time.perf_counter()
+        pending = []
+        for receipt in build_receipts(args.receipts, args.items, args.products, args.seed):
+            pending.append(receipt)
+            if len(pending) == 500:
+                ledger.record(email, pending)
+                pending = []
+        ledger.record(email, pending)
+        elapsed = time.perf_counter() - start
+        # otro usuario con los mismos datos, para comprobar que las consultas no leen filas ajenas
+        ledger.record("otro@example.com", list(build_receipts(1000, args.items, args.products, args.seed + 1)))
+        print(f"{args.receipts * args.items:,} productos guardados en {elapsed:.1f} s "
+              f"({args.receipts / elapsed:,.0f} recibos/s)")
+
+        measure("gasto por mes (todo)", lambda: ledger.totals_by_month(email), args.queries)
+        measure("gasto por comercio (un año)", lambda: ledger.totals_by_store(email, "2025-01", "2025-12"), args.queries)
+        measure("gasto por producto (un mes)", lambda: ledger.totals_by_product(email, "2025-03", "2025-03"), args.queries)
+        measure("gasto por producto (un año)", lambda: ledger.totals_by_product(email, "2025-01", "2025-12"), args.queries)
+        measure("\"leche\" en un mes", lambda: ledger.totals_by_product(email, "2025-03", "2025-03", product="leche"), args.queries)
+
+
+if __name__ == '__main__':
+    main()
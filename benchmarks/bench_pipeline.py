@@ -0,0 +1,183 @@
+# bench_pipeline.py mide el rendimiento de extremo a extremo de la aplicacion sin conexion a google
+#
+# uso: python benchmarks/bench_pipeline.py [--concurrency 1,2,4,8,16] [--requests 40]
+#          [--ocr 400,0.5,0] [--gemini 1200,0.6,0] [--sheets 300,0.4,0] [--no-fast-path] [--tracemalloc]
+#
+# arranca la aplicacion real de create_app() en un servidor local con sustitutos de cloud vision,
+# gemini y sheets (benchmarks/fakes.py), sube recibos a /api/process con una sesion firmada y sigue
+# /api/events hasta que el trabajo termina. para cada nivel de concurrencia imprime recibos/s,
+# latencias p50/p95/p99, errores y memoria. las latencias de los sustitutos se dan como
+# "mediana_ms,sigma,tasa_error" (lognormal).
+
+import argparse
+import http.client
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.fakes import FakeOCR, FakeGemini, FakeSheetsService, LatencyModel, load_corpus, make_image
+from src.infrastructure.db import sqlite_manager
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--requests", type=int, default=40, help="recibos enviados en cada nivel de concurrencia")
+    parser.add_argument("--ocr", default="400,0.5,0", help="latencia del ocr: mediana_ms,sigma,tasa_error")
+    parser.add_argument("--gemini", default="1200,0.6,0", help="latencia de gemini: mediana_ms,sigma,tasa_error")
+    parser.add_argument("--sheets", default="300,0.4,0", help="latencia de sheets: mediana_ms,sigma,tasa_error")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-fast-path", action="store_true", help="todos los recibos pasan por gemini")
+    parser.add_argument("--keep-caches", action="store_true", help="no desactiva los caches de ocr y gemini")
+    parser.add_argument("--tracemalloc", action="store_true", help="mide el pico de memoria de python (mas lento)")
+    args = parser.parse_args()
+
+    # todo lo que la aplicacion escribe en disco va a un directorio temporal
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.chdir(workdir)
+    sqlite_manager.DB_PATH = sqlite_manager.Path(workdir) / "ticketapp.db"
+    sqlite_manager.LEGACY_USERS_DB_PATH = sqlite_manager.Path(workdir) / "users.db"
+
+    os.environ["DATA_DIR"] = workdir
+    os.environ.setdefault("FLASK_SECRET_KEY", "bench-pipeline")
+    os.environ["GEMINI_CACHE_DB"] = ""
+    os.environ["OCR_CACHE_DB"] = ""
+    if not args.keep_caches:
+        # cada imagen lleva un nonce, pero los textos del corpus se repiten y acertarian en el cache de gemini
+        os.environ["OCR_CACHE_ENTRIES"] = "0"
+        os.environ["GEMINI_CACHE_ENTRIES"] = "0"
+    if args.no_fast_path:
+        os.environ["FAST_PATH_PARSER"] = "0"
+
+    # se importa despues de ajustar el entorno porque create_app lo lee
+    from main import create_app
+    from werkzeug.serving import make_server
+
+    corpus = load_corpus()
+    app = create_app(
+        ocr_backend=FakeOCR(corpus, LatencyModel.parse(args.ocr, seed=args.seed)),
+        gemini_backend=FakeGemini(corpus, LatencyModel.parse(args.gemini, seed=args.seed + 1)),
+        sheets_service_factory=FakeSheetsService.factory(LatencyModel.parse(args.sheets, seed=args.seed + 2))
+    )
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cookie = _session_cookie(app)
+
+    client = PipelineClient("127.0.0.1", server.server_port, cookie)
+    # una peticion de calentamiento para cargar plantillas, pools e imports perezosos
+    client.process(make_image(0))
+
+    print(f"corpus: {len(corpus)} recibos, directorio de trabajo: {workdir}")
+    print(f"{'concurrencia':>12} {'recibos/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errores':>8} {'rss max MB':>11} {'KB/peticion':>12}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        images = [make_image(i % len(corpus)) for i in range(args.requests)]
+        if args.tracemalloc:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(client.process, images))
+        elapsed = time.perf_counter() - start
+
+        per_request_kb = "-"
+        if args.tracemalloc:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # el pico se reparte entre las peticiones que estaban en vuelo a la vez
+            per_request_kb = f"{peak / 1024 / min(concurrency, args.requests):.0f}"
+
+        latencies = sorted(latency for ok, latency in outcomes if ok)
+        errors = sum(1 for ok, _ in outcomes if not ok)
+        # en linux ru_maxrss viene en kilobytes
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{concurrency:>12} {len(latencies) / elapsed:>10.2f} "
+              f"{_percentile(latencies, 50):>8.0f} {_percentile(latencies, 95):>8.0f} {_percentile(latencies, 99):>8.0f} "
+              f"{errors:>8} {rss_mb:>11.1f} {per_request_kb:>12}")
+
+    server.shutdown()
+
+
+class PipelineClient:
+    """sube un recibo a /api/process y espera el evento final en /api/events."""
+    def __init__(self, host: str, port: int, cookie: str):
+        self.host = host
+        self.port = port
+        self.cookie = cookie
+
+    def process(self, image: bytes):
+        """devuelve (ok, milisegundos) desde la subida hasta que el recibo queda en sheets."""
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        try:
+            boundary = uuid.uuid4().hex
+            body = (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="image"; filename="recibo.jpg"\r\n'
+                f"Content-Type: image/jpeg\r\n\r\n"
+            ).encode("ascii") + image + f"\r\n--{boundary}--\r\n".encode("ascii")
+            conn.request("POST", "/api/process", body=body, headers={
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Cookie": self.cookie
+            })
+            response = conn.getresponse()
+            queued = json.loads(response.read())
+            if response.status != 202:
+                return False, 0.0
+
+            conn.request("GET", f"/api/events/{queued['process_id']}", headers={"Cookie": self.cookie})
+            result = self._wait_final_event(conn.getresponse())
+        finally:
+            conn.close()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # un trabajo completado sin spreadsheet_id no llego a escribirse en sheets
+        ok = result is not None and result[0] == "completed" and bool(result[1].get("spreadsheet_id"))
+        return ok, elapsed_ms
+
+    def _wait_final_event(self, response):
+        event = None
+        while True:
+            line = response.readline()
+            if not line:
+                return None
+            line = line.decode("utf-8").rstrip("\r\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event in ("completed", "failed"):
+                return event, json.loads(line[len("data: "):])
+
+
+def _session_cookie(app) -> str:
+    # sesion firmada igual que la que deja /oauth2callback, con credenciales de mentira
+    serializer = app.session_interface.get_signing_serializer(app)
+    value = serializer.dumps({"user_credentials": {
+        "email": "bench@example.com",
+        "creds": {
+            "token": "fake-token",
+            "refresh_token": "fake-refresh-token",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "client_id": "fake-client-id",
+            "client_secret": "fake-client-secret",
+            "scopes": ["https://www.googleapis.com/auth/spreadsheets"]
+        }
+    }})
+    return f"{app.config['SESSION_COOKIE_NAME']}={value}"
+
+
+def _percentile(values, percentile: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))
+    return values[index]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# bench_preprocessing.py compara el ocr con y sin preprocesamiento sobre un corpus local de recibos
+#
+# uso: python benchmarks/bench_preprocessing.py <carpeta_con_imagenes> [--tessdata ruta] [--max-edge 2000]
+#
+# para cada imagen se mide el tamano antes/despues, el tiempo de tesseract en ambos casos
+# y la similitud entre los dos textos, para comprobar que el preprocesamiento no pierde informacion.
+
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.infrastructure.ocr.tesseract_ocr import TesseractOCR
+from src.infrastructure.ocr.preprocessing_ocr import ImagePreprocessor
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--tessdata", default=os.environ.get("TESSDATA_PREFIX", "/usr/share/tesseract-ocr/5/tessdata"))
+    parser.add_argument("--max-edge", type=int, default=2000)
+    args = parser.parse_args()
+
+    ocr = TesseractOCR(tessdata_path=args.tessdata)
+    preprocessor = ImagePreprocessor(max_long_edge=args.max_edge)
+
+    totals = {"bytes_in": 0, "bytes_out": 0, "ocr_raw": 0.0, "ocr_pre": 0.0, "prep": 0.0}
+    similarities = []
+    files = sorted(f for f in os.listdir(args.corpus) if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+
+    for name in files:
+        with open(os.path.join(args.corpus, name), "rb") as image_file:
+            content = image_file.read()
+
+        start = time.perf_counter()
+        raw_text = ocr.extract_text(content)
+        ocr_raw = time.perf_counter() - start
+
+        start = time.perf_counter()
+        processed = preprocessor.process(content)
+        prep = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pre_text = ocr.extract_text(processed)
+        ocr_pre = time.perf_counter() - start
+
+        similarity = difflib.SequenceMatcher(None, raw_text, pre_text).ratio()
+        similarities.append(similarity)
+        totals["bytes_in"] += len(content)
+        totals["bytes_out"] += len(processed)
+        totals["ocr_raw"] += ocr_raw
+        totals["ocr_pre"] += ocr_pre
+        totals["prep"] += prep
+        print(f"{name:<30} {len(content):>10,} -> {len(processed):>10,} bytes  "
+              f"ocr {ocr_raw:6.2f}s -> {ocr_pre:6.2f}s (+{prep:.2f}s prep)  similitud {similarity:.3f}")
+
+    if not files:
+        print("no se encontraron imagenes en el corpus")
+        return
+
+    print()
+    print(f"bytes: {totals['bytes_in']:,} -> {totals['bytes_out']:,} "
+          f"({100 * (1 - totals['bytes_out'] / totals['bytes_in']):.1f}% menos)")
+    print(f"tesseract: {totals['ocr_raw']:.2f}s -> {totals['ocr_pre']:.2f}s, preprocesamiento {totals['prep']:.2f}s")
+    print(f"similitud media del texto: {sum(similarities) / len(similarities):.3f}")
+
+
+if __name__ == '__main__':
+    main()
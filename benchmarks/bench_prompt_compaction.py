@@ -0,0 +1,64 @@
+# bench_prompt_compaction.py mide cuanto reduce la compactacion el prompt enviado a gemini
+#
+# uso: python benchmarks/bench_prompt_compaction.py <carpeta_con_textos_ocr .txt>
+#
+# siempre informa caracteres; si GEMINI_API_KEY esta definida tambien cuenta los tokens
+# reales de cada prompt con `count_tokens` (no genera contenido).
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.infrastructure.gemini.gemini_service_impl import GeminiServiceImpl
+from src.infrastructure.gemini.receipt_text_compactor import ReceiptTextCompactor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    model = None
+    if api_key:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(GeminiServiceImpl.MODEL_NAME)
+
+    compactor = ReceiptTextCompactor()
+    files = sorted(f for f in os.listdir(args.corpus) if f.endswith(".txt"))
+    totals = {"chars_raw": 0, "chars_compact": 0, "tokens_raw": 0, "tokens_compact": 0}
+
+    for name in files:
+        with open(os.path.join(args.corpus, name), encoding="utf-8") as text_file:
+            raw_text = text_file.read()
+        raw_prompt = GeminiServiceImpl.PROMPT_TEMPLATE.format(receipt_text=raw_text)
+        compact_prompt = GeminiServiceImpl.PROMPT_TEMPLATE.format(receipt_text=compactor.compact(raw_text))
+
+        line = f"{name:<30} caracteres {len(raw_prompt):>6} -> {len(compact_prompt):>6}"
+        totals["chars_raw"] += len(raw_prompt)
+        totals["chars_compact"] += len(compact_prompt)
+        if model is not None:
+            tokens_raw = model.count_tokens(raw_prompt).total_tokens
+            tokens_compact = model.count_tokens(compact_prompt).total_tokens
+            totals["tokens_raw"] += tokens_raw
+            totals["tokens_compact"] += tokens_compact
+            line += f"  tokens {tokens_raw:>5} -> {tokens_compact:>5}"
+        print(line)
+
+    if not files:
+        print("no se encontraron textos .txt en el corpus")
+        return
+
+    print()
+    print(f"caracteres por recibo: {totals['chars_raw'] / len(files):.0f} -> {totals['chars_compact'] / len(files):.0f}")
+    if model is not None:
+        saved = (totals["tokens_raw"] - totals["tokens_compact"]) / len(files)
+        print(f"tokens por recibo: {totals['tokens_raw'] / len(files):.0f} -> {totals['tokens_compact'] / len(files):.0f} "
+              f"({saved:.0f} tokens ahorrados por recibo)")
+
+
+if __name__ == '__main__':
+    main()
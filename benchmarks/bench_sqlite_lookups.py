@@ -0,0 +1,64 @@
+# bench_sqlite_lookups.py mide cuantas busquedas de spreadsheet_id por segundo hace la capa sqlite
+#
+# uso: python benchmarks/bench_sqlite_lookups.py [--users 200] [--lookups 20000]
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.infrastructure.db import sqlite_manager
+
+
+def legacy_get_spreadsheet_id(db_path: Path, user_email: str):
+    # reproduce el comportamiento anterior: create table y conexion nueva en cada busqueda
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_sheets (
+                email TEXT PRIMARY KEY,
+                spreadsheet_id TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+    with sqlite3.connect(db_path) as conn:
+        row = conn.execute("SELECT spreadsheet_id FROM user_sheets WHERE email=?", (user_email,)).fetchone()
+    return row[0] if row else None
+
+
+def measure(label: str, lookup, emails, lookups: int):
+    start = time.perf_counter()
+    for i in range(lookups):
+        lookup(emails[i % len(emails)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {lookups / elapsed:>12,.0f} busquedas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_manager.DB_PATH = Path(tmp) / "bench.db"
+        sqlite_manager.LEGACY_USERS_DB_PATH = Path(tmp) / "users.db"
+        emails = [f"user{i}@example.com" for i in range(args.users)]
+        for email in emails:
+            sqlite_manager.set_spreadsheet_id(email, f"sheet-{email}")
+
+        measure("antes (conexion por llamada)", lambda e: legacy_get_spreadsheet_id(sqlite_manager.DB_PATH, e), emails, args.lookups)
+
+        sqlite_manager.clear_cache()
+        measure("wal sin cache", lambda e: (sqlite_manager.clear_cache(), sqlite_manager.get_spreadsheet_id(e)), emails, args.lookups)
+
+        sqlite_manager.clear_cache()
+        measure("wal con cache", sqlite_manager.get_spreadsheet_id, emails, args.lookups)
+
+
+if __name__ == '__main__':
+    main()
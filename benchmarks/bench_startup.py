@@ -0,0 +1,141 @@
+# bench_startup.py mide el arranque en frio de la aplicacion: import de main.py, create_app() y calentamiento
+#
+# uso: python benchmarks/bench_startup.py [--runs 5] [--fakes] [--top 15] [--history benchmarks/startup_history.jsonl]
+#
+# cada medicion se hace en un proceso nuevo de python, como al escalar una replica. con --fakes
+# create_app() recibe los sustitutos de benchmarks/fakes.py y no construye clientes de google; sin
+# --fakes se usan los backends reales del entorno (GOOGLE_APPLICATION_CREDENTIALS, GEMINI_API_KEY...)
+# y el tiempo hasta listo incluye el calentamiento de sus clientes. --history anade una linea json
+# por ejecucion para seguir la evolucion entre versiones.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# codigo del proceso hijo: imprime una linea json con los tiempos de cada fase
+CHILD = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+imported = time.perf_counter()
+from src.infrastructure.db import sqlite_manager
+sqlite_manager.DB_PATH = sqlite_manager.Path({workdir!r}) / "ticketapp.db"
+sqlite_manager.LEGACY_USERS_DB_PATH = sqlite_manager.Path({workdir!r}) / "users.db"
+kwargs = {{}}
+if {fakes!r}:
+    from benchmarks.fakes import FakeOCR, FakeGemini, FakeSheetsService, LatencyModel, load_corpus
+    corpus = load_corpus()
+    kwargs = dict(
+        ocr_backend=FakeOCR(corpus, LatencyModel.parse("0,0,0")),
+        gemini_backend=FakeGemini(corpus, LatencyModel.parse("0,0,0")),
+        sheets_service_factory=FakeSheetsService.factory(LatencyModel.parse("0,0,0"))
+    )
+app = main.create_app(**kwargs)
+created = time.perf_counter()
+warm_up = main.main_bp.warm_up
+ready = warm_up.wait({timeout}) if warm_up is not None else True
+finished = time.perf_counter()
+print("STARTUP " + json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "ready_ms": (finished - start) * 1000,
+    "ready": ready,
+    "warm_up": warm_up.status()["tasks"] if warm_up is not None else {{}}
+}}))
+"""
+
+
+def run_once(fakes: bool, timeout: float, importtime: bool):
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as workdir:
+        env = dict(os.environ)
+        env.setdefault("FLASK_SECRET_KEY", "bench-startup")
+        env["DATA_DIR"] = workdir
+        command = [sys.executable]
+        if importtime:
+            command += ["-X", "importtime"]
+        command += ["-c", CHILD.format(root=ROOT, workdir=workdir, fakes=fakes, timeout=timeout)]
+        completed = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    line = next((l for l in completed.stdout.splitlines() if l.startswith("STARTUP ")), None)
+    if line is None:
+        raise RuntimeError(f"el proceso hijo fallo:\n{completed.stderr[-2000:]}")
+    return json.loads(line[len("STARTUP "):]), completed.stderr
+
+
+def top_imports(stderr: str, top: int):
+    # lineas de -X importtime: "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # solo los paquetes importados directamente, sin sangria
+        if not name.startswith("  "):
+            modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--fakes", action="store_true", help="usa los sustitutos locales en vez de los backends de google")
+    parser.add_argument("--timeout", type=float, default=60, help="segundos maximos de espera al calentamiento")
+    parser.add_argument("--top", type=int, default=15, help="imports mas lentos que se muestran")
+    parser.add_argument("--history", help="archivo jsonl al que se anade el resultado")
+    args = parser.parse_args()
+
+    results = []
+    for run in range(args.runs):
+        result, stderr = run_once(args.fakes, args.timeout, importtime=(run == 0))
+        if run == 0:
+            # la primera ejecucion (con -X importtime, algo mas lenta) solo sirve para el desglose
+            slowest = top_imports(stderr, args.top)
+            continue
+        results.append(result)
+    if not results:
+        results.append(run_once(args.fakes, args.timeout, importtime=False)[0])
+
+    print(f"{'fase':<16} {'mediana ms':>11} {'min ms':>9} {'max ms':>9}")
+    summary = {}
+    for phase in ("import_ms", "create_app_ms", "ready_ms"):
+        values = sorted(result[phase] for result in results)
+        summary[phase] = round(values[len(values) // 2], 1)
+        print(f"{phase[:-3]:<16} {summary[phase]:>11.1f} {values[0]:>9.1f} {values[-1]:>9.1f}")
+    last = results[-1]
+    print(f"listo: {last['ready']}  calentamiento: {json.dumps(last['warm_up'], ensure_ascii=False)}")
+
+    print("\nimports mas lentos (acumulado):")
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    if args.history:
+        record = dict(
+            summary,
+            date=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            commit=_git_commit(),
+            python=platform.python_version(),
+            fakes=args.fakes,
+            runs=len(results),
+            ready=last["ready"]
+        )
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(record) + "\n")
+        print(f"\nresultado anadido a {args.history}")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+if __name__ == '__main__':
+    main()
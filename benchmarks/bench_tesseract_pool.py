@@ -0,0 +1,48 @@
+# bench_tesseract_pool.py mide imagenes por segundo de ParallelTesseractOCR segun el numero de procesos
+#
+# uso: python benchmarks/bench_tesseract_pool.py <carpeta_con_imagenes> [--workers 1,2,4,8] [--repeat 2]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.infrastructure.ocr.parallel_tesseract_ocr import ParallelTesseractOCR
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--tessdata", default=os.environ.get("TESSDATA_PREFIX", "/usr/share/tesseract-ocr/5/tessdata"))
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=2, help="veces que se procesa el corpus en cada medicion")
+    args = parser.parse_args()
+
+    images = []
+    for name in sorted(os.listdir(args.corpus)):
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            with open(os.path.join(args.corpus, name), "rb") as image_file:
+                images.append(image_file.read())
+    if not images:
+        print("no se encontraron imagenes en el corpus")
+        return
+    images = images * args.repeat
+
+    print(f"{'procesos':>8} {'imagenes/s':>12} {'segundos':>10}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        ocr = ParallelTesseractOCR(tessdata_path=args.tessdata, max_workers=workers)
+        # una pasada de calentamiento para que los procesos ya esten creados
+        ocr.extract_texts(images[:workers])
+        start = time.perf_counter()
+        ocr.extract_texts(images)
+        elapsed = time.perf_counter() - start
+        ocr.shutdown()
+        print(f"{workers:>8} {len(images) / elapsed:>12.2f} {elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
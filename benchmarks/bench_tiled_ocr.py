@@ -0,0 +1,115 @@
+# bench_tiled_ocr.py mide como crece la latencia del ocr con el alto del ticket, con y sin franjas en paralelo
+#
+# uso: python benchmarks/bench_tiled_ocr.py <carpeta_con_imagenes> [--engine tesseract|vision]
+#          [--heights 2000,4000,6000,8000,10000] [--workers 4] [--tile-height 1600] [--overlap 200] [--tessdata ruta]
+#
+# cada imagen se lleva a cada alto de --heights: si es mas alta se recorta por abajo y si es mas baja se apilan
+# copias suyas hasta llegar, para simular un ticket largo. para cada imagen y alto se imprime el tiempo de una
+# sola llamada al motor, el tiempo por franjas, el numero de franjas y la similitud entre los dos textos; al
+# final, la mediana por alto y la pendiente (ms por cada 1000 px) de cada modo. con --engine vision cada
+# franja es una llamada facturada a cloud vision (GOOGLE_APPLICATION_CREDENTIALS).
+
+import argparse
+import difflib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.infrastructure.ocr.tiled_ocr import TiledOCRService, ImageTiler
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("--engine", choices=("tesseract", "vision"), default="tesseract")
+    parser.add_argument("--heights", default="2000,4000,6000,8000,10000")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tile-height", type=int, default=1600)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--tessdata", default=os.environ.get("TESSDATA_PREFIX", "/usr/share/tesseract-ocr/5/tessdata"))
+    args = parser.parse_args()
+
+    heights = [int(h) for h in args.heights.split(",")]
+    ocr = _build_engine(args)
+    # en el benchmark se parte cualquier alto, para ver tambien donde deja de compensar
+    tiler = ImageTiler(tile_height=args.tile_height, overlap=args.overlap, min_height=0, min_aspect=0, max_tiles=1000)
+    tiled = TiledOCRService(ocr, tiler, max_workers=args.workers)
+
+    files = sorted(f for f in os.listdir(args.corpus) if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+    single_times = {h: [] for h in heights}
+    tiled_times = {h: [] for h in heights}
+
+    for name in files:
+        with open(os.path.join(args.corpus, name), "rb") as image_file:
+            original = image_file.read()
+        for height in heights:
+            content = _at_height(original, height)
+
+            start = time.perf_counter()
+            single_text = ocr.extract_text(content)
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            tiled_text = tiled.extract_text(content)
+            elapsed = time.perf_counter() - start
+
+            single_times[height].append(single)
+            tiled_times[height].append(elapsed)
+            similarity = difflib.SequenceMatcher(None, single_text, tiled_text).ratio()
+            print(f"{name:<30} {height:>6} px  una llamada {single:6.2f}s  franjas {elapsed:6.2f}s "
+                  f"({len(tiler.bounds(height))} franjas)  similitud {similarity:.3f}")
+
+    if not files:
+        print("no hay imagenes en la carpeta")
+        return
+
+    print(f"\n{'alto px':>8} {'una llamada s':>14} {'franjas s':>10} {'aceleracion':>12}")
+    for height in heights:
+        single = statistics.median(single_times[height])
+        elapsed = statistics.median(tiled_times[height])
+        print(f"{height:>8} {single:>14.2f} {elapsed:>10.2f} {single / elapsed if elapsed else 0:>11.2f}x")
+    print(f"\npendiente: una llamada {_slope(heights, single_times):.0f} ms por 1000 px, "
+          f"franjas {_slope(heights, tiled_times):.0f} ms por 1000 px ({args.workers} en paralelo)")
+
+
+def _build_engine(args):
+    if args.engine == "vision":
+        from src.infrastructure.ocr.cloud_vision_ocr import CloudVisionOCR
+        return CloudVisionOCR(credentials_path=os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"))
+    from src.infrastructure.ocr.tesseract_ocr import TesseractOCR
+    return TesseractOCR(tessdata_path=args.tessdata)
+
+
+def _at_height(content: bytes, height: int) -> bytes:
+    # apila copias de la imagen (o la recorta) hasta el alto pedido, con el ancho original
+    from PIL import Image, ImageOps
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        canvas = Image.new("RGB", (image.width, height), "white")
+        for top in range(0, height, image.height):
+            canvas.paste(image, (0, top))
+    output = io.BytesIO()
+    canvas.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def _slope(heights, times) -> float:
+    # recta de minimos cuadrados sobre las medianas, en milisegundos por cada 1000 px
+    medians = [statistics.median(times[h]) for h in heights]
+    if len(heights) < 2:
+        return 0.0
+    mean_h = statistics.mean(heights)
+    mean_t = statistics.mean(medians)
+    variance = sum((h - mean_h) ** 2 for h in heights)
+    covariance = sum((h - mean_h) * (t - mean_t) for h, t in zip(heights, medians))
+    return covariance / variance * 1000 * 1000 if variance else 0.0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# fakes.py contiene sustitutos locales de cloud vision, gemini y google sheets para los benchmarks
+#
+# cada sustituto implementa el mismo puerto que el servicio real y simula su latencia con una
+# distribucion lognormal (mediana y dispersion configurables) y una tasa de errores.
+# las respuestas salen de un corpus grabado: textos ocr y el json que devolvio gemini para cada uno.
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from src.application.ports.gemini_interface import GeminiInterface
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "receipts.json")
+
+# prefijo de las imagenes falsas: b"FAKE:<indice del corpus>:<nonce>"
+IMAGE_PREFIX = b"FAKE:"
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Dict[str, Any]]:
+    """devuelve la lista de recibos grabados, cada uno con ocr_text y gemini."""
+    with open(path, "r", encoding="utf-8") as corpus_file:
+        return json.load(corpus_file)
+
+
+def make_image(index: int) -> bytes:
+    """
+    Crea los bytes de una imagen falsa para el recibo `index` del corpus.
+    El nonce hace que cada subida tenga un hash distinto y no acierte en el cache de ocr.
+    """
+    return IMAGE_PREFIX + f"{index}:{uuid.uuid4().hex}".encode("ascii")
+
+
+class LatencyModel:
+    """
+    Latencia lognormal con una tasa de errores. La mediana esta en milisegundos y
+    `sigma` controla la cola (0 da una latencia fija).
+    """
+    def __init__(self, median_ms: float, sigma: float = 0.5, error_rate: float = 0.0, seed: int = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = None) -> "LatencyModel":
+        """construye el modelo desde "mediana_ms[,sigma[,tasa_error]]", por ejemplo "400,0.6,0.01"."""
+        values = [float(v) for v in spec.split(",")]
+        return cls(*values, seed=seed)
+
+    def wait(self, service: str):
+        """duerme la latencia simulada y lanza un error con la probabilidad configurada."""
+        with self._lock:
+            delay = self.median_ms / 1000 * self._random.lognormvariate(0, self.sigma) if self.median_ms > 0 else 0
+            failed = self._random.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise ConnectionError(f"error simulado en {service}")
+
+
+class FakeOCR(OCRService):
+    """sustituto de CloudVisionOCR: devuelve el texto grabado del recibo que codifica la imagen."""
+    def __init__(self, corpus: List[Dict[str, Any]], latency: LatencyModel):
+        self.corpus = corpus
+        self.latency = latency
+
+    def extract_text(self, image: ImageSource) -> str:
+        content = read_image_bytes(image)
+        if not content.startswith(IMAGE_PREFIX):
+            raise ValueError("la imagen no la ha creado make_image()")
+        index = int(content[len(IMAGE_PREFIX):].split(b":", 1)[0])
+        self.latency.wait("ocr")
+        return self.corpus[index]["ocr_text"]
+
+
+class FakeGemini(GeminiInterface):
+    """sustituto de GeminiServiceImpl: devuelve el json grabado para el texto ocr recibido."""
+    cache_version = "fake-gemini"
+
+    def __init__(self, corpus: List[Dict[str, Any]], latency: LatencyModel):
+        self.by_text = {receipt["ocr_text"]: receipt["gemini"] for receipt in corpus}
+        self.latency = latency
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict:
+        self.latency.wait("gemini")
+        data = self.by_text.get(receipt_text)
+        if data is None:
+            raise KeyError("texto ocr fuera del corpus")
+        # se devuelve una copia para que nadie modifique el corpus
+        return json.loads(json.dumps(data))
+
+
+class FakeSheetsService:
+    """
+    Sustituto de GoogleSheetsService con el mismo constructor. Cada escritura simula
+    una llamada de append; el buffer de escritura y el pool de clientes se ignoran.
+    """
+    latency: LatencyModel = LatencyModel(median_ms=0)
+
+    def __init__(self, creds, user_email: str, write_buffer=None, client_pool=None, metrics=None):
+        self.user_email = user_email
+        self.metrics = metrics
+        self.spreadsheet_id = f"fake-{user_email}"
+
+    @classmethod
+    def factory(cls, latency: LatencyModel):
+        """devuelve una subclase con la latencia indicada, para pasarla como sheets_service_factory."""
+        return type(cls.__name__, (cls,), {"latency": latency})
+
+    def save_to_sheet(self, result, on_written=None, on_failed=None):
+        return self.save_results_to_sheet([result], on_written=on_written, on_failed=on_failed)
+
+    def save_results_to_sheet(self, results, on_written=None, on_failed=None):
+        start = time.perf_counter()
+        try:
+            self.latency.wait("sheets")
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_duration("sheets_append", time.perf_counter() - start)
+        rows = sum(len(result.receipt_data_list) + 1 for result in results)
+        if on_written is not None:
+            on_written()
+        return {"spreadsheet_id": self.spreadsheet_id, "updated_cells": rows * 5}
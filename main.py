@@ -4,25 +4,72 @@ from flask import Flask
 from dotenv import load_dotenv
 import os
 import sys
+import atexit
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # se anade el directorio src al path del sistema
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.controllers.main_controller import main_bp
 from src.infrastructure.auth.google_auth import GoogleAuth
+from src.infrastructure.auth.credential_store import CredentialStore
+from src.infrastructure.clients.google_client_pool import GoogleClientPool
+from src.application.ports.gemini_interface import GeminiInterface
 from src.infrastructure.gemini.gemini_service_impl import GeminiServiceImpl
+from src.infrastructure.gemini.cached_gemini_service import CachedGeminiService
+from src.infrastructure.gemini.fast_path_receipt_parser import FastPathReceiptParser
+from src.infrastructure.gemini.receipt_text_compactor import ReceiptTextCompactor
 from src.infrastructure.ocr.cloud_vision_ocr import CloudVisionOCR
+from src.infrastructure.ocr.batching_cloud_vision_ocr import BatchingCloudVisionOCR
+from src.infrastructure.ocr.parallel_tesseract_ocr import ParallelTesseractOCR
+from src.infrastructure.ocr.hybrid_ocr import HybridOCRService
+from src.infrastructure.ocr.cached_ocr import CachedOCRService
+from src.infrastructure.ocr.preprocessing_ocr import PreprocessingOCRService, ImagePreprocessor
+from src.infrastructure.ocr.tiled_ocr import TiledOCRService, ImageTiler
 from src.application.usecases.receipt_processing_service import ReceiptProcessingService
+from src.application.usecases.receipt_batch_service import ReceiptBatchService
+from src.infrastructure.concurrency.bounded_services import BoundedOCRService, BoundedGeminiService
+from src.infrastructure.resilience.circuit_breaker import CircuitBreaker
+from src.infrastructure.resilience.resilient_caller import ResilientCaller
+from src.infrastructure.resilience.resilient_services import (
+    ResilientOCRService, ResilientGeminiService, AsyncResilientOCRService, AsyncResilientGeminiService
+)
+from src.infrastructure.ocr.async_cloud_vision_ocr import AsyncCloudVisionOCR
+from src.infrastructure.ocr.cached_ocr import AsyncCachedOCRService
+from src.infrastructure.ocr.preprocessing_ocr import AsyncPreprocessingOCRService
+from src.infrastructure.gemini.gemini_service_impl import AsyncGeminiServiceImpl
+from src.infrastructure.gemini.cached_gemini_service import AsyncCachedGeminiService
+from src.infrastructure.gemini.fast_path_receipt_parser import AsyncFastPathReceiptParser
+from src.infrastructure.concurrency.async_adapters import ThreadedAsyncOCR, ThreadedAsyncGemini
+from src.infrastructure.sheets.async_sheets_service import ThreadedAsyncSheetsService
+from src.application.usecases.async_receipt_processing_service import AsyncReceiptProcessingService
+from src.infrastructure.jobs.job_manager import JobManager
+from src.infrastructure.sheets.sheets_write_buffer import SheetsWriteBuffer
+from src.infrastructure.sheets.google_sheets_service import GoogleSheetsService
+from src.infrastructure.db.sqlite_manager import init_db
+from src.infrastructure.db.sqlite_receipt_ledger import SQLiteReceiptLedger
+from src.infrastructure.metrics.prometheus_metrics import PrometheusMetrics
+from src.infrastructure.debug.background_artifact_store import BackgroundArtifactStore
+from src.infrastructure.dedup.multi_index_duplicate_index import MultiIndexDuplicateIndex
+from src.infrastructure.dedup.perceptual_hash import dhash
+from src.infrastructure.startup.warm_up import WarmUp
 
 # se cargan las variables de entorno desde el archivo .env
 load_dotenv()
 
 # esta funcion crea y configura la aplicacion flask
-def create_app():
+# los parametros opcionales sustituyen los servicios de google (por ejemplo en benchmarks sin conexion);
+# con async_pipeline tambien se prepara el camino asincrono que sirve create_asgi_app
+def create_app(ocr_backend=None, gemini_backend=None, sheets_service_factory=None, async_pipeline=False):
     app = Flask(__name__)
     # se obtiene la clave secreta para la sesion
     app.secret_key = os.environ.get("FLASK_SECRET_KEY")
 
+    # limite del cuerpo de la peticion: flask corta la subida antes de leerla entera
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("REQUEST_MAX_BYTES", str(200 * 1024 * 1024)))
+
     # se obtiene la url del servidor
     server_url = os.environ.get("SERVER_URL")
 
@@ -30,27 +77,465 @@ def create_app():
     gemini_api_key = os.environ.get("GEMINI_API_KEY")
     credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
 
+    # el esquema de sqlite se crea una sola vez al arrancar
+    init_db()
+
+    # metricas de latencia por etapa y contadores, expuestas en /metrics
+    metrics = PrometheusMetrics()
+
+    # las llamadas a backends externos llevan plazo, reintentos y circuito (EXTERNAL_RESILIENCE=0 lo desactiva)
+    resilience = os.environ.get("EXTERNAL_RESILIENCE", "1") == "1"
+
+    # los clientes de los backends se construyen en la primera llamada; el calentamiento
+    # los adelanta en segundo plano y /readyz no responde 200 hasta que termina
+    warm_up = WarmUp(metrics)
+
     # se inicializan los servicios necesarios
-    ocr_service = CloudVisionOCR(credentials_path=credentials_path)
-    gemini_service = GeminiServiceImpl(api_key=gemini_api_key)
-    google_auth_service = GoogleAuth(auth_url=server_url)
+    if ocr_backend is not None:
+        base_ocr = _with_resilience(ocr_backend, "ocr", "OCR", metrics) if resilience else ocr_backend
+    else:
+        base_ocr = _build_ocr_engine(credentials_path, metrics if resilience else None, warm_up)
+    # el motor sin decoradores, para leer sus estadisticas
+    engine_ocr = base_ocr
+
+    # preprocesamiento opcional de la imagen antes de enviarla al ocr
+    if os.environ.get("OCR_PREPROCESS", "0") == "1":
+        base_ocr = PreprocessingOCRService(base_ocr, ImagePreprocessor(
+            max_long_edge=int(os.environ.get("OCR_PREPROCESS_MAX_EDGE", "2000")),
+            grayscale=os.environ.get("OCR_PREPROCESS_GRAYSCALE", "1") == "1",
+            jpeg_quality=int(os.environ.get("OCR_PREPROCESS_QUALITY", "85"))
+        ))
+
+    # los tickets largos se parten en franjas que se leen en paralelo (por fuera del preprocesamiento,
+    # que se aplica a cada franja y asi no reduce el ticket entero a OCR_PREPROCESS_MAX_EDGE)
+    if os.environ.get("OCR_TILING", "0") == "1":
+        tiled_ocr = TiledOCRService(
+            base_ocr,
+            ImageTiler(
+                tile_height=int(os.environ.get("OCR_TILE_HEIGHT", "1600")),
+                overlap=int(os.environ.get("OCR_TILE_OVERLAP", "200")),
+                min_height=int(os.environ.get("OCR_TILE_MIN_HEIGHT", "3000")),
+                max_tiles=int(os.environ.get("OCR_TILE_MAX_TILES", "12"))
+            ),
+            max_workers=int(os.environ.get("OCR_TILE_WORKERS", "4"))
+        )
+        metrics.register_collector("ocr_tiling_total", lambda: {
+            (("result", result),): value for result, value in tiled_ocr.stats().items()
+        })
+        base_ocr = tiled_ocr
+
+    # el ocr se envuelve en un cache por hash de imagen para no repetir llamadas al motor
+    # (el cache va por fuera para que un acierto no pague el preprocesamiento)
+    ocr_service = CachedOCRService(
+        base_ocr,
+        max_entries=int(os.environ.get("OCR_CACHE_ENTRIES", "256")),
+        max_bytes=int(os.environ.get("OCR_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+        db_path=os.environ.get("OCR_CACHE_DB"),
+        wait_timeout=float(os.environ.get("OCR_CACHE_WAIT_SECONDS", "60"))
+    )
+    # gemini se envuelve en un cache por texto normalizado y version de modelo/prompt
+    # el texto ocr se compacta antes de armar el prompt (menos tokens por llamada)
+    compactor = ReceiptTextCompactor() if os.environ.get("GEMINI_COMPACT_TEXT", "1") == "1" else None
+    gemini_impl = gemini_backend or GeminiServiceImpl(
+        api_key=gemini_api_key,
+        compactor=compactor,
+        timeout=float(os.environ.get("GEMINI_TIMEOUT", "30")) or None,
+        raise_errors=resilience
+    )
+    gemini_llm = CachedGeminiService(
+        _with_resilience(gemini_impl, "gemini", "GEMINI", metrics) if resilience else gemini_impl,
+        version=getattr(gemini_impl, "cache_version", ""),
+        max_entries=int(os.environ.get("GEMINI_CACHE_ENTRIES", "512")),
+        ttl_seconds=float(os.environ.get("GEMINI_CACHE_TTL", str(7 * 24 * 3600))),
+        db_path=os.environ.get("GEMINI_CACHE_DB")
+    )
+    # los recibos bien formados se analizan en local y solo el resto llega a gemini
+    fast_path_enabled = os.environ.get("FAST_PATH_PARSER", "1") == "1"
+    gemini_service = _with_fast_path(gemini_llm, fast_path_enabled)
+    # los clientes de las apis de google se reutilizan entre peticiones
+    client_pool = GoogleClientPool(idle_seconds=float(os.environ.get("GOOGLE_CLIENT_IDLE_SECONDS", "600")))
+    # los tokens de cada usuario se guardan en el servidor y se refrescan antes de caducar
+    # (CREDENTIAL_STORE_DB vacio los deja en la cookie de sesion, como antes)
+    credential_store = None
+    credential_store_path = os.environ.get("CREDENTIAL_STORE_DB")
+    if credential_store_path is None:
+        credential_store_path = _data_path("credentials.db")
+    if credential_store_path:
+        # sin CREDENTIAL_ENCRYPTION_KEY los tokens se guardan sin cifrar, solo protegidos por los permisos del archivo
+        encryption_key = os.environ.get("CREDENTIAL_ENCRYPTION_KEY")
+        if not encryption_key:
+            print("⚠️ CREDENTIAL_ENCRYPTION_KEY no esta definida: los refresh tokens se guardan sin cifrar")
+        credential_store = CredentialStore(
+            credential_store_path,
+            refresh_margin=float(os.environ.get("CREDENTIAL_REFRESH_MARGIN", "600")),
+            check_interval=float(os.environ.get("CREDENTIAL_REFRESH_INTERVAL", "60")),
+            active_seconds=float(os.environ.get("CREDENTIAL_ACTIVE_DAYS", "7")) * 24 * 3600,
+            metrics=metrics,
+            encryption_key=encryption_key
+        )
+        credential_store.start()
+        atexit.register(credential_store.close)
+    google_auth_service = GoogleAuth(auth_url=server_url, client_pool=client_pool, credential_store=credential_store)
+    if google_auth_service.client_secrets_file:
+        warm_up.register("oauth_client_config", google_auth_service.client_config)
+
+    # artefactos de depuracion por recibo, escritos en segundo plano (DEBUG_ARTIFACTS=0 los desactiva del todo)
+    debug_store = None
+    if os.environ.get("DEBUG_ARTIFACTS", "0") == "1":
+        debug_store = BackgroundArtifactStore(
+            base_dir=os.environ.get("DEBUG_ARTIFACTS_DIR", "receipt_debug"),
+            sample_rate=float(os.environ.get("DEBUG_ARTIFACTS_SAMPLE_RATE", "1")),
+            max_receipts=int(os.environ.get("DEBUG_ARTIFACTS_MAX_RECEIPTS", "500")),
+            max_age_seconds=float(os.environ.get("DEBUG_ARTIFACTS_MAX_AGE_HOURS", "72")) * 3600,
+            queue_size=int(os.environ.get("DEBUG_ARTIFACTS_QUEUE", "1000"))
+        )
+        atexit.register(debug_store.flush)
+        metrics.register_collector("debug_artifacts_total", lambda: {
+            (("result", result),): debug_store.stats()[result]
+            for result in ("written", "dropped", "failed", "sampled_out", "deleted_receipts")
+        })
+
+    # huellas perceptuales por usuario: una foto repetida del mismo recibo reutiliza el resultado anterior
+    duplicate_index = None
+    # desactivado por defecto: tickets distintos con el mismo formato dan huellas casi iguales
+    if os.environ.get("DUPLICATE_DETECTION", "0") == "1":
+        duplicate_index = MultiIndexDuplicateIndex(
+            hasher=dhash,
+            hash_bits=128,
+            max_distance=int(os.environ.get("DUPLICATE_MAX_DISTANCE", "3")),
+            max_entries_per_user=int(os.environ.get("DUPLICATE_MAX_ENTRIES", "5000"))
+        )
+        metrics.register_collector("duplicate_index_events_total", lambda: {
+            (("result", result),): value for result, value in duplicate_index.stats().items()
+        })
 
     # se inicializa el servicio principal de procesamiento de recibos
     receipt_processor = ReceiptProcessingService(
         ocr_service=ocr_service,
-        gemini_service=gemini_service
+        gemini_service=gemini_service,
+        metrics=metrics,
+        debug_store=debug_store,
+        duplicate_index=duplicate_index
     )
 
+    # para los lotes se usa un procesador propio con limites de concurrencia por backend
+    # (el analisis local no pasa por el limite de gemini)
+    batch_processor = ReceiptProcessingService(
+        ocr_service=BoundedOCRService(ocr_service, int(os.environ.get("BATCH_OCR_CONCURRENCY", "8"))),
+        gemini_service=_with_fast_path(
+            BoundedGeminiService(gemini_llm, int(os.environ.get("BATCH_GEMINI_CONCURRENCY", "4"))),
+            fast_path_enabled
+        ),
+        metrics=metrics,
+        debug_store=debug_store,
+        duplicate_index=duplicate_index
+    )
+    batch_service = ReceiptBatchService(
+        batch_processor,
+        max_workers=int(os.environ.get("BATCH_WORKERS", "16"))
+    )
+
+    if gemini_backend is None:
+        warm_up.register("gemini", gemini_impl.warm_up)
+    if sheets_service_factory is None:
+        # discovery de sheets y oauth2 ya parseado para el primer usuario
+        warm_up.register("google_api_client", client_pool.warm_up)
+    if duplicate_index is not None or os.environ.get("OCR_PREPROCESS", "0") == "1" or isinstance(base_ocr, TiledOCRService):
+        warm_up.register("pillow", lambda: importlib.import_module("PIL.Image"))
+
+    # se inicializa el pool de trabajos que procesa los recibos en segundo plano
+    job_manager = JobManager(
+        max_workers=int(os.environ.get("PROCESS_WORKERS", "4")),
+        ttl_seconds=int(os.environ.get("PROCESS_STATUS_TTL", "600"))
+    )
+
+    # las filas de sheets se acumulan por hoja y se escriben en bloque (0 desactiva el buffer)
+    sheets_flush_interval = float(os.environ.get("SHEETS_FLUSH_INTERVAL", "2"))
+    sheets_write_buffer = None
+    if sheets_flush_interval > 0:
+        # las filas pendientes se guardan en disco hasta que llegan a sheets (SHEETS_JOURNAL_DB vacio lo desactiva)
+        sheets_journal_path = os.environ.get("SHEETS_JOURNAL_DB")
+        if sheets_journal_path is None:
+            sheets_journal_path = _data_path("sheets_pending.db")
+        sheets_write_buffer = SheetsWriteBuffer(
+            max_rows=int(os.environ.get("SHEETS_FLUSH_MAX_ROWS", "500")),
+            flush_interval=sheets_flush_interval,
+            metrics=metrics,
+            journal_path=sheets_journal_path or None,
+            service_resolver=_sheets_service_resolver(credential_store, client_pool)
+        )
+        # al apagar se vacia el buffer, despues de que terminen los trabajos en curso
+        atexit.register(sheets_write_buffer.close)
+    atexit.register(job_manager.shutdown)
+
+    # los aciertos de los caches y las decisiones de los atajos se leen al exportar las metricas
+    _register_cache_collectors(metrics, ocr_service, gemini_llm, gemini_service, engine_ocr, gemini_impl)
+
     # se inyectan los servicios en el blueprint para su uso
     main_bp.receipt_processor = receipt_processor
     main_bp.google_auth_service = google_auth_service
     main_bp.gemini_service = gemini_service
+    main_bp.job_manager = job_manager
+    main_bp.batch_service = batch_service
+    main_bp.sheets_write_buffer = sheets_write_buffer
+    main_bp.client_pool = client_pool
+    main_bp.metrics = metrics
+    main_bp.sheets_service_factory = sheets_service_factory or GoogleSheetsService
+    main_bp.sheets_semaphore = threading.BoundedSemaphore(int(os.environ.get("BATCH_SHEETS_CONCURRENCY", "2")))
+    main_bp.batch_max_files = int(os.environ.get("BATCH_MAX_FILES", "200"))
+    main_bp.batch_max_bytes = int(os.environ.get("BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+    main_bp.upload_max_bytes = int(os.environ.get("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+    # plazo total de cada recibo, desde la subida hasta tener el json (0 sin plazo)
+    main_bp.request_deadline = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "60")) if resilience else 0.0
+    # copia local de cada recibo para /api/analytics, en el directorio de datos (LEDGER_DB vacio la desactiva)
+    ledger_path = os.environ.get("LEDGER_DB")
+    if ledger_path is None:
+        ledger_path = _data_path("ledger.db")
+    main_bp.receipt_ledger = SQLiteReceiptLedger(ledger_path, metrics=metrics) if ledger_path else None
+
+    # WARM_UP=0 deja todo para la primera peticion y /readyz responde listo desde el arranque
+    if os.environ.get("WARM_UP", "1") == "1":
+        warm_up.start()
+        main_bp.warm_up = warm_up
+
+    if async_pipeline:
+        _configure_async_pipeline(
+            app, ocr_service, base_ocr, gemini_service, gemini_llm,
+            # el cliente asincrono de vision no parte los tickets largos: con OCR_TILING se usa el camino por hilos
+            native_ocr=(ocr_backend is None and os.environ.get("OCR_ENGINE", "vision") == "vision"
+                        and not isinstance(base_ocr, TiledOCRService)),
+            native_gemini=gemini_backend is None,
+            gemini_impl=gemini_impl,
+            credentials_path=credentials_path,
+            raise_errors=resilience,
+            metrics=metrics,
+            debug_store=debug_store,
+            duplicate_index=duplicate_index
+        )
 
     # se registra el blueprint en la aplicacion
     app.register_blueprint(main_bp)
 
     return app
 
+# crea la aplicacion asgi: las rutas /api/async/ las sirve quart sin un hilo por peticion
+# y el resto de rutas siguen en la aplicacion flask, adaptada a asgi
+def create_asgi_app(ocr_backend=None, gemini_backend=None, sheets_service_factory=None):
+    # quart y asgiref solo hacen falta si se despliega por asgi
+    from quart import Quart
+    from asgiref.wsgi import WsgiToAsgi
+    from src.controllers.async_controller import async_bp
+
+    flask_app = create_app(ocr_backend, gemini_backend, sheets_service_factory, async_pipeline=True)
+    quart_app = Quart(__name__)
+    quart_app.config["MAX_CONTENT_LENGTH"] = flask_app.config["MAX_CONTENT_LENGTH"]
+    quart_app.register_blueprint(async_bp)
+    wsgi_app = WsgiToAsgi(flask_app)
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan" or scope.get("path", "").startswith("/api/async/"):
+            await quart_app(scope, receive, send)
+        else:
+            await wsgi_app(scope, receive, send)
+
+    return app
+
+# prepara el procesador asincrono sobre los mismos caches, atajo local y circuitos que el camino sincrono;
+# cloud vision y gemini usan sus clientes asincronos y el resto de motores corre en un pool de hilos
+def _configure_async_pipeline(app, ocr_service, base_ocr, gemini_service, gemini_llm, native_ocr, native_gemini,
+                              gemini_impl, credentials_path, raise_errors, metrics, debug_store, duplicate_index):
+    from src.controllers.async_controller import async_bp
+
+    executor = ThreadPoolExecutor(
+        max_workers=int(os.environ.get("ASYNC_THREAD_WORKERS", "16")),
+        thread_name_prefix="async-offload"
+    )
+
+    if native_ocr:
+        preprocessing = base_ocr if isinstance(base_ocr, PreprocessingOCRService) else None
+        sync_vision = preprocessing.ocr_service if preprocessing is not None else base_ocr
+        async_ocr = AsyncCloudVisionOCR(
+            credentials_path=credentials_path,
+            timeout=float(os.environ.get("OCR_TIMEOUT", "15")) or None,
+            raise_errors=raise_errors
+        )
+        # se comparte el circuito y las latencias con el camino sincrono
+        if isinstance(sync_vision, ResilientOCRService):
+            async_ocr = AsyncResilientOCRService(async_ocr, sync_vision.caller)
+        if preprocessing is not None:
+            async_ocr = AsyncPreprocessingOCRService(async_ocr, preprocessing)
+        async_ocr = AsyncCachedOCRService(async_ocr, ocr_service)
+    else:
+        async_ocr = ThreadedAsyncOCR(ocr_service, executor)
+
+    if native_gemini:
+        async_gemini = AsyncGeminiServiceImpl(gemini_impl)
+        if isinstance(gemini_llm.gemini_service, ResilientGeminiService):
+            async_gemini = AsyncResilientGeminiService(async_gemini, gemini_llm.gemini_service.caller)
+        async_gemini = AsyncCachedGeminiService(async_gemini, gemini_llm)
+        if isinstance(gemini_service, FastPathReceiptParser):
+            async_gemini = AsyncFastPathReceiptParser(gemini_service, async_gemini)
+    else:
+        async_gemini = ThreadedAsyncGemini(gemini_service, executor)
+
+    async_bp.receipt_processor = AsyncReceiptProcessingService(
+        async_ocr, async_gemini, metrics=metrics, debug_store=debug_store, duplicate_index=duplicate_index
+    )
+    async_bp.sheets_service = ThreadedAsyncSheetsService(
+        main_bp.sheets_service_factory,
+        ThreadPoolExecutor(
+            max_workers=int(os.environ.get("ASYNC_SHEETS_WORKERS", "4")),
+            thread_name_prefix="async-sheets"
+        ),
+        write_buffer=main_bp.sheets_write_buffer,
+        client_pool=main_bp.client_pool,
+        metrics=metrics
+    )
+    async_bp.google_auth_service = main_bp.google_auth_service
+    async_bp.metrics = metrics
+    async_bp.session_serializer = app.session_interface.get_signing_serializer(app)
+    async_bp.session_cookie_name = app.config["SESSION_COOKIE_NAME"]
+    async_bp.session_max_age = app.permanent_session_lifetime.total_seconds()
+    async_bp.upload_max_bytes = main_bp.upload_max_bytes
+    async_bp.request_deadline = main_bp.request_deadline
+    async_bp.receipt_ledger = main_bp.receipt_ledger
+
+# construye el motor ocr elegido con OCR_ENGINE: vision (cloud vision), tesseract (local,
+# pool de procesos) o hybrid (tesseract primero y cloud vision solo si la confianza no alcanza)
+# si se pasan metricas, cloud vision se envuelve con plazo, reintentos y circuito
+def _build_ocr_engine(credentials_path, resilience_metrics=None, warm_up=None):
+    resilience = resilience_metrics is not None
+    vision_timeout = float(os.environ.get("OCR_TIMEOUT", "15")) or None
+    ocr_engine = os.environ.get("OCR_ENGINE", "vision")
+
+    tesseract_ocr = None
+    if ocr_engine in ("tesseract", "hybrid"):
+        tesseract_workers = int(os.environ.get("TESSERACT_WORKERS", "0"))
+        tesseract_ocr = ParallelTesseractOCR(
+            tessdata_path=os.environ.get("TESSDATA_PATH", "/usr/share/tesseract-ocr/5/tessdata"),
+            language=os.environ.get("TESSERACT_LANG", "spa"),
+            max_workers=tesseract_workers or None
+        )
+        if warm_up is not None:
+            warm_up.register("tesseract", tesseract_ocr.warm_up)
+
+    vision_ocr = None
+    if ocr_engine in ("vision", "hybrid"):
+        # si hay ventana de lotes, las llamadas concurrentes se agrupan en una sola peticion
+        vision_batch_window_ms = float(os.environ.get("VISION_BATCH_WINDOW_MS", "0"))
+        if vision_batch_window_ms > 0:
+            vision_ocr = BatchingCloudVisionOCR(
+                credentials_path=credentials_path,
+                window_seconds=vision_batch_window_ms / 1000,
+                max_batch_size=int(os.environ.get("VISION_BATCH_MAX_SIZE", "16")),
+                max_batch_bytes=int(os.environ.get("VISION_BATCH_MAX_BYTES", str(8 * 1024 * 1024))),
+                timeout=vision_timeout,
+                raise_errors=resilience
+            )
+        else:
+            vision_ocr = CloudVisionOCR(credentials_path=credentials_path, timeout=vision_timeout, raise_errors=resilience)
+        if warm_up is not None:
+            warm_up.register("vision", vision_ocr.warm_up)
+        if resilience:
+            vision_ocr = _with_resilience(vision_ocr, "vision", "OCR", resilience_metrics)
+
+    if ocr_engine == "hybrid":
+        base_ocr = HybridOCRService(
+            local_ocr=tesseract_ocr,
+            remote_ocr=vision_ocr,
+            min_confidence=float(os.environ.get("HYBRID_MIN_CONFIDENCE", "70")),
+            min_price_tokens=int(os.environ.get("HYBRID_MIN_PRICE_TOKENS", "2")),
+            require_date=os.environ.get("HYBRID_REQUIRE_DATE", "1") == "1"
+        )
+    else:
+        base_ocr = tesseract_ocr or vision_ocr
+    return base_ocr
+
+# registra en las metricas las estadisticas que ya llevan los servicios con cache o atajos
+def _register_cache_collectors(metrics, ocr_service, gemini_llm, gemini_service, base_ocr, gemini_impl):
+    def cache_events():
+        events = {}
+        for cache, stats in (("ocr", ocr_service.stats()), ("gemini", gemini_llm.stats())):
+            # coalesced y store_errors solo los lleva el cache de ocr (llamadas que esperaron a otra
+            # igual en curso y textos que no se pudieron guardar en disco)
+            for result in ("memory_hits", "disk_hits", "misses", "coalesced", "store_errors"):
+                if result in stats:
+                    events[(("cache", cache), ("result", result))] = stats[result]
+        if isinstance(gemini_service, FastPathReceiptParser):
+            for result, value in gemini_service.stats().items():
+                events[(("cache", "fast_path"), ("result", result))] = value
+        return events
+    metrics.register_collector("cache_events_total", cache_events)
+
+    if isinstance(base_ocr, HybridOCRService):
+        metrics.register_collector("ocr_engine_requests_total", lambda: {
+            (("engine", engine),): values["requests"] for engine, values in base_ocr.stats().items()
+        })
+
+    # tokens de cada llamada a gemini y caracteres del texto antes y despues de compactarlo
+    if isinstance(gemini_impl, GeminiServiceImpl):
+        metrics.register_collector("gemini_calls_total", lambda: {(): gemini_impl.usage_stats()["calls"]})
+        metrics.register_collector("gemini_tokens_total", lambda: {
+            (("kind", kind),): gemini_impl.usage_stats()[f"{kind}_tokens"] for kind in ("prompt", "output")
+        })
+        metrics.register_collector("gemini_receipt_chars_total", lambda: {
+            (("kind", kind),): gemini_impl.usage_stats()[key]
+            for kind, key in (("original", "chars_in"), ("compacted", "chars_sent"))
+        })
+
+# envuelve un backend externo con plazo, reintentos, circuito y duplicados opcionales;
+# `prefix` elige las variables de entorno propias del backend (OCR_TIMEOUT, GEMINI_HEDGE...)
+def _with_resilience(service, name: str, prefix: str, metrics):
+    caller = ResilientCaller(
+        name=name,
+        attempt_timeout=float(os.environ.get(f"{prefix}_TIMEOUT", "15" if prefix == "OCR" else "30")) or None,
+        stage_share=float(os.environ.get(f"{prefix}_STAGE_SHARE", "0.4" if prefix == "OCR" else "0.8")),
+        max_retries=int(os.environ.get("EXTERNAL_MAX_RETRIES", "2")),
+        backoff_seconds=float(os.environ.get("EXTERNAL_BACKOFF_MS", "200")) / 1000,
+        max_backoff_seconds=float(os.environ.get("EXTERNAL_BACKOFF_MAX_MS", "2000")) / 1000,
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=int(os.environ.get("BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.environ.get("BREAKER_RESET_SECONDS", "30"))
+        ),
+        hedge=os.environ.get(f"{prefix}_HEDGE", "0") == "1",
+        hedge_min_delay=float(os.environ.get("HEDGE_MIN_DELAY_MS", "200")) / 1000,
+        metrics=metrics
+    )
+    if isinstance(service, GeminiInterface):
+        return ResilientGeminiService(service, caller)
+    return ResilientOCRService(service, caller)
+
+# envuelve el servicio de gemini con el analizador local si esta activado
+def _with_fast_path(gemini_service, enabled: bool):
+    return FastPathReceiptParser(fallback=gemini_service) if enabled else gemini_service
+
+# con las credenciales guardadas en el servidor, las filas recuperadas del journal
+# se escriben al arrancar sin esperar al siguiente recibo del usuario
+def _sheets_service_resolver(credential_store, client_pool):
+    if credential_store is None:
+        return None
+
+    def resolve(user_email):
+        def service_factory():
+            creds = credential_store.get(user_email)
+            if creds is None:
+                raise ValueError(f"no hay credenciales guardadas de {user_email}")
+            return client_pool.get(user_email, 'sheets', 'v4', creds)
+        return service_factory
+    return resolve
+
+# devuelve la ruta de un archivo dentro de DATA_DIR, el directorio de los datos de los usuarios;
+# por defecto queda fuera del codigo fuente ($XDG_DATA_HOME/ticketapp o ~/.local/share/ticketapp)
+def _data_path(name: str) -> str:
+    data_dir = os.environ.get("DATA_DIR") or os.path.join(
+        os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"),
+        "ticketapp"
+    )
+    # solo el usuario del servicio puede leer el directorio
+    os.makedirs(data_dir, mode=0o700, exist_ok=True)
+    return os.path.join(data_dir, name)
+
 # este bloque se ejecuta solo si el script es el principal
 if __name__ == '__main__':
     # .\.venv\Scripts\activate
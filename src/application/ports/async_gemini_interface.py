@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+
+class AsyncGeminiInterface(ABC):
+    @abstractmethod
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict:
+        """
+        Versión asíncrona de GeminiInterface.process_text_from_receipt.
+
+        Args:
+            receipt_text: El texto completo extraído del recibo.
+
+        Returns:
+            Un diccionario con los datos estructurados del recibo.
+        """
+        pass
@@ -0,0 +1,17 @@
+from abc import ABC, abstractmethod
+from .ocr_service import ImageSource
+
+class AsyncOCRService(ABC):
+    @abstractmethod
+    async def extract_text(self, image: ImageSource) -> str:
+        """
+        Versión asíncrona de OCRService.extract_text: la espera de la red no ocupa un hilo.
+
+        Args:
+            image: La ruta del archivo de imagen, sus bytes (bytes, bytearray o memoryview)
+                o un stream binario abierto.
+
+        Returns:
+            Una cadena de texto con el contenido extraído.
+        """
+        pass
@@ -0,0 +1,19 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+from ..usecases.receipt_processing_result import ReceiptProcessingResult
+
+class AsyncSheetsService(ABC):
+    @abstractmethod
+    async def save_results(self, creds, user_email: str, results: List[ReceiptProcessingResult]) -> Dict:
+        """
+        Guarda los recibos en la hoja de cálculo del usuario.
+
+        Args:
+            creds: Credenciales OAuth del usuario.
+            user_email: Email del usuario, que identifica su hoja.
+            results: Los recibos procesados.
+
+        Returns:
+            Un diccionario con al menos "spreadsheet_id".
+        """
+        pass
@@ -0,0 +1,23 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+class DebugArtifactStore(ABC):
+    @abstractmethod
+    def should_capture(self, receipt_id: str) -> bool:
+        """
+        Indica si se guardan los artefactos de depuración de este recibo.
+        Se decide una vez por recibo para que sus artefactos vayan juntos.
+        """
+        pass
+
+    @abstractmethod
+    def save(self, receipt_id: str, name: str, content: Any):
+        """
+        Guarda un artefacto intermedio del procesamiento sin bloquear a quien llama.
+
+        Args:
+            receipt_id: Identificador del recibo (el process_id de la petición).
+            name: Nombre del artefacto, por ejemplo "raw_text.txt" o "gemini_output.json".
+            content: Texto o estructura serializable a JSON.
+        """
+        pass
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+from ..usecases.receipt_processing_result import ReceiptProcessingResult
+
+class DuplicateIndex(ABC):
+    @abstractmethod
+    def lookup(self, user_email: str, content: bytes, text: str) -> Tuple[Optional[int], Optional[Tuple[str, ReceiptProcessingResult]]]:
+        """
+        Busca entre los recibos ya procesados del usuario una foto casi igual a esta.
+        Una huella parecida solo es candidata: recibos distintos con el mismo formato
+        dan huellas casi iguales, así que el texto del OCR tiene que confirmarlo.
+
+        Args:
+            user_email: Email del usuario; solo se comparan sus propios recibos.
+            content: Bytes de la imagen subida.
+            text: Texto extraído por el OCR de esta imagen.
+
+        Returns:
+            (huella, coincidencia): la huella de la imagen, para guardarla después con
+            `store` (None si la imagen no se pudo leer), y el par (receipt_id, resultado)
+            del recibo original, o None si no hay ninguno confirmado.
+        """
+        pass
+
+    @abstractmethod
+    def store(self, user_email: str, fingerprint: int, text: str, receipt_id: str, result: ReceiptProcessingResult):
+        """
+        Guarda el resultado de un recibo procesado para detectar sus copias.
+
+        Args:
+            user_email: Email del usuario dueño del recibo.
+            fingerprint: Huella devuelta por `lookup` para esa imagen.
+            text: Texto del OCR de la imagen, para confirmar las copias.
+            receipt_id: Identificador del recibo original.
+            result: Resultado que se devolverá para sus copias.
+        """
+        pass
@@ -0,0 +1,25 @@
+from abc import ABC, abstractmethod
+
+class MetricsRecorder(ABC):
+    @abstractmethod
+    def observe_duration(self, stage: str, seconds: float):
+        """
+        Registra cuánto tardó una etapa del procesamiento.
+
+        Args:
+            stage: Nombre de la etapa (por ejemplo "ocr", "gemini", "sheets_append").
+            seconds: Duración en segundos.
+        """
+        pass
+
+    @abstractmethod
+    def increment(self, counter: str, amount: float = 1, **labels):
+        """
+        Incrementa un contador.
+
+        Args:
+            counter: Nombre del contador (por ejemplo "receipt_requests_total").
+            amount: Cantidad a sumar.
+            labels: Etiquetas del contador (por ejemplo stage="ocr").
+        """
+        pass
@@ -1,15 +1,34 @@
 from abc import ABC, abstractmethod
+from typing import BinaryIO, Union
+
+# una imagen puede llegar como ruta, como bytes en memoria o como stream binario
+ImageSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
 
 class OCRService(ABC):
     @abstractmethod
-    def extract_text(self, image_path: str) -> str:
+    def extract_text(self, image: ImageSource) -> str:
         """
         Extrae el texto de una imagen utilizando la tecnología OCR.
 
         Args:
-            image_path: La ruta del archivo de imagen.
+            image: La ruta del archivo de imagen, sus bytes (bytes, bytearray o memoryview)
+                o un stream binario abierto.
 
         Returns:
             Una cadena de texto con el contenido extraído.
         """
-        pass
\ No newline at end of file
+        pass
+
+def read_image_bytes(image: ImageSource) -> bytes:
+    """
+    Devuelve el contenido de la imagen como bytes. Si ya son bytes se devuelven
+    sin copiar; las rutas y los streams se leen una sola vez.
+    """
+    if isinstance(image, bytes):
+        return image
+    if isinstance(image, (bytearray, memoryview)):
+        return bytes(image)
+    if isinstance(image, str):
+        with open(image, 'rb') as image_file:
+            return image_file.read()
+    return image.read()
@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from ..usecases.receipt_processing_result import ReceiptProcessingResult
+
+class ReceiptLedger(ABC):
+    @abstractmethod
+    def record(self, user_email: str, receipts: List[Tuple[str, ReceiptProcessingResult]]) -> int:
+        """
+        Guarda recibos procesados en el registro local del usuario.
+
+        Args:
+            user_email: Email del usuario dueño de los recibos.
+            receipts: Pares (receipt_id, ReceiptProcessingResult). Un receipt_id ya
+                registrado para el usuario se ignora, así repetir la llamada no duplica gastos.
+
+        Returns:
+            El número de recibos nuevos guardados.
+        """
+        pass
+
+    @abstractmethod
+    def totals_by_month(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None) -> List[Dict]:
+        """
+        Devuelve el gasto del usuario por mes.
+
+        Args:
+            user_email: Email del usuario.
+            start_month: Primer mes incluido, en formato "yyyy-mm" (None sin límite).
+            end_month: Último mes incluido, en formato "yyyy-mm" (None sin límite).
+
+        Returns:
+            Una lista de {"month", "receipts", "total"} ordenada por mes.
+        """
+        pass
+
+    @abstractmethod
+    def totals_by_product(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                          product: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """
+        Devuelve el gasto del usuario por producto en un rango de meses.
+
+        Args:
+            user_email: Email del usuario.
+            start_month: Primer mes incluido, "yyyy-mm" (None sin límite).
+            end_month: Último mes incluido, "yyyy-mm" (None sin límite).
+            product: Prefijo del nombre del producto, sin distinguir mayúsculas ni tildes.
+            limit: Número máximo de productos, de mayor a menor gasto.
+
+        Returns:
+            Una lista de {"product", "quantity", "total"}.
+        """
+        pass
+
+    @abstractmethod
+    def totals_by_store(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                        limit: int = 50) -> List[Dict]:
+        """
+        Devuelve el gasto del usuario por comercio en un rango de meses.
+
+        Args:
+            user_email: Email del usuario.
+            start_month: Primer mes incluido, "yyyy-mm" (None sin límite).
+            end_month: Último mes incluido, "yyyy-mm" (None sin límite).
+            limit: Número máximo de comercios, de mayor a menor gasto.
+
+        Returns:
+            Una lista de {"store", "receipts", "total"}; "store" es None para los recibos sin comercio.
+        """
+        pass
@@ -0,0 +1,129 @@
+# src/application/usecases/async_receipt_processing_service.py
+
+from dataclasses import replace
+from typing import Callable, Optional
+from ..ports.ocr_service import ImageSource, read_image_bytes
+from ..ports.async_ocr_service import AsyncOCRService
+from ..ports.async_gemini_interface import AsyncGeminiInterface
+from ..ports.metrics_recorder import MetricsRecorder
+from ..ports.debug_artifact_store import DebugArtifactStore
+from ..ports.duplicate_index import DuplicateIndex
+from .receipt_processing_result import ReceiptProcessingResult
+from .receipt_processing_service import DebugCapture, convert_dict_to_receipt_result
+import asyncio
+import time
+import uuid
+
+class AsyncReceiptProcessingService:
+    """
+    Versión asíncrona de ReceiptProcessingService: mientras un recibo espera al OCR
+    o a Gemini, el bucle de eventos atiende otros, así un solo proceso mantiene
+    cientos de recibos en vuelo sin un hilo por cada uno.
+    """
+    def __init__(
+        self,
+        ocr_service: AsyncOCRService,
+        gemini_service: AsyncGeminiInterface,
+        metrics: Optional[MetricsRecorder] = None,
+        debug_store: Optional[DebugArtifactStore] = None,
+        duplicate_index: Optional[DuplicateIndex] = None
+    ):
+        self.ocr_service = ocr_service
+        self.gemini_service = gemini_service
+        # registro opcional de duraciones y fallos por etapa
+        self.metrics = metrics
+        # almacen opcional de artefactos intermedios; solo encola, no bloquea el bucle de eventos
+        self.debug_store = debug_store
+        # indice opcional de huellas; la huella se calcula en un hilo porque decodifica la imagen
+        self.duplicate_index = duplicate_index
+
+    async def process_receipt(
+        self,
+        image: ImageSource,
+        on_stage: Optional[Callable[[str], None]] = None,
+        receipt_id: Optional[str] = None,
+        user_email: Optional[str] = None,
+        check_duplicates: bool = True
+    ) -> Optional[ReceiptProcessingResult]:
+        """
+        Procesa la imagen de un recibo y devuelve el resultado normalizado, o None si falla.
+        Los artefactos de depuración y los duplicados se tratan como en ReceiptProcessingService.
+
+        Si se pasa `on_stage`, se invoca con el nombre de cada etapa al empezarla
+        ("ocr", "dedup", "gemini", "normalize").
+        """
+        notify = on_stage or (lambda stage: None)
+        debug = DebugCapture(self.debug_store, receipt_id)
+        fingerprint = None
+        dedup = self.duplicate_index is not None and user_email and check_duplicates
+        stage = "ocr"
+        try:
+            if dedup:
+                image = read_image_bytes(image)
+
+            notify(stage)
+            start = time.perf_counter()
+            raw_text = await self.ocr_service.extract_text(image)
+            self._observe(stage, start)
+            debug.save("raw_text.txt", raw_text or "")
+            if not raw_text or raw_text.strip() == "":
+                print("⚠️ Error en el OCR. No se puede procesar.")
+                self._count_failure(stage)
+                return None
+
+            if dedup:
+                stage = "dedup"
+                notify(stage)
+                start = time.perf_counter()
+                fingerprint, match = await asyncio.to_thread(self.duplicate_index.lookup, user_email, image, raw_text)
+                self._observe(stage, start)
+                if match is not None:
+                    original_id, original = match
+                    print(f"🔹 Recibo duplicado de {original_id}, se reutiliza el resultado.")
+                    return replace(original, duplicate_of=original_id)
+
+            stage = "gemini"
+            notify(stage)
+            start = time.perf_counter()
+            structured_data = await self.gemini_service.process_text_from_receipt(raw_text)
+            self._observe(stage, start)
+            debug.save("gemini_output.json", structured_data)
+
+            stage = "normalize"
+            notify(stage)
+            start = time.perf_counter()
+            result = convert_dict_to_receipt_result(structured_data)
+            self._observe(stage, start)
+            if result is not None:
+                debug.save("normalized_output.json", {
+                    "receipt_data": [vars(r) for r in result.receipt_data_list],
+                    "total": result.total,
+                    "comercio": result.comercio
+                })
+            else:
+                print("⚠️ No se pudo normalizar el resultado.")
+                self._count_failure(stage)
+
+            if result is not None and fingerprint is not None:
+                # store toma el lock del indice (y una implementacion persistente escribiria en disco)
+                await asyncio.to_thread(
+                    self.duplicate_index.store, user_email, fingerprint, raw_text, receipt_id or uuid.uuid4().hex, result
+                )
+            return result
+
+        except Exception as e:
+            print(f"⚠️ Error general en procesamiento: {e}")
+            self._count_failure(stage)
+            debug.save("error.txt", f"{stage}: {e}")
+            # sin tiempo no hay recibo que devolver: quien llama lo trata como error, no como resultado vacio
+            if isinstance(e, TimeoutError):
+                raise
+            return None
+
+    def _observe(self, stage: str, start: float):
+        if self.metrics is not None:
+            self.metrics.observe_duration(stage, time.perf_counter() - start)
+
+    def _count_failure(self, stage: str):
+        if self.metrics is not None:
+            self.metrics.increment("receipt_failures_total", stage=stage)
@@ -0,0 +1,58 @@
+# src/application/usecases/receipt_batch_service.py
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+from ..ports.ocr_service import ImageSource
+from .receipt_processing_service import ReceiptProcessingService
+from .receipt_processing_result import ReceiptProcessingResult
+
+class ReceiptBatchService:
+    """
+    Procesa varias imágenes de recibos en paralelo usando un ReceiptProcessingService.
+    Los límites por backend (OCR, Gemini) los aplican los servicios que recibe el procesador.
+    """
+    def __init__(self, receipt_processor: ReceiptProcessingService, max_workers: int = 16):
+        self.receipt_processor = receipt_processor
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="receipt-batch")
+
+    def process_batch(
+        self,
+        images: List[ImageSource],
+        on_item_done: Optional[Callable[[int, int], None]] = None,
+        batch_id: Optional[str] = None,
+        user_email: Optional[str] = None,
+        check_duplicates: bool = True
+    ) -> List[Optional[ReceiptProcessingResult]]:
+        """
+        Procesa todas las imágenes a la vez y devuelve los resultados en el mismo orden.
+        Un recibo que no se pudo procesar queda como None.
+
+        Si se pasa `on_item_done`, se invoca con (terminados, total) cada vez que acaba una imagen.
+        Con `batch_id`, cada recibo se identifica como "<batch_id>-<indice>" en los artefactos de depuración.
+        Con `user_email`, las fotos repetidas de recibos anteriores del usuario se marcan con `duplicate_of`
+        (salvo con `check_duplicates=False`).
+        """
+        results: List[Optional[ReceiptProcessingResult]] = [None] * len(images)
+        futures = {
+            self.executor.submit(
+                self.receipt_processor.process_receipt,
+                image,
+                receipt_id=f"{batch_id}-{index}" if batch_id else None,
+                user_email=user_email,
+                check_duplicates=check_duplicates
+            ): index
+            for index, image in enumerate(images)
+        }
+
+        done = 0
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                print(f"⚠️ Error procesando la imagen {index}: {e}")
+            done += 1
+            if on_item_done is not None:
+                on_item_done(done, len(images))
+
+        return results
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 from domain.receipt_data import ReceiptData
 
 @dataclass(frozen=True)
@@ -8,4 +8,8 @@ class ReceiptProcessingResult:
     Contiene los resultados del procesamiento de un recibo.
     """
     receipt_data_list: List[ReceiptData]
-    total: float
\ No newline at end of file
+    total: float
+    # nombre del comercio del recibo, si se pudo identificar
+    comercio: Optional[str] = None
+    # id del recibo ya procesado del que esta foto es una copia; None si es un recibo nuevo
+    duplicate_of: Optional[str] = None
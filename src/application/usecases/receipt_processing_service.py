@@ -1,140 +1,237 @@
 # src/application/usecases/receipt_processing_service.py
 
-from typing import List, Dict
-from ..ports.ocr_service import OCRService
+from dataclasses import replace
+from typing import List, Dict, Callable, Optional
+from ..ports.ocr_service import OCRService, ImageSource, read_image_bytes
 from ..ports.gemini_interface import GeminiInterface
+from ..ports.metrics_recorder import MetricsRecorder
+from ..ports.debug_artifact_store import DebugArtifactStore
+from ..ports.duplicate_index import DuplicateIndex
 from ...domain.receipt_data import ReceiptData
 from .receipt_processing_result import ReceiptProcessingResult
 from datetime import datetime, timedelta
-import json
-import os
+import time
+import uuid
 
 class ReceiptProcessingService:
-    def __init__(self, ocr_service: OCRService, gemini_service: GeminiInterface):
+    def __init__(
+        self,
+        ocr_service: OCRService,
+        gemini_service: GeminiInterface,
+        metrics: Optional[MetricsRecorder] = None,
+        debug_store: Optional[DebugArtifactStore] = None,
+        duplicate_index: Optional[DuplicateIndex] = None
+    ):
         self.ocr_service = ocr_service
         self.gemini_service = gemini_service
+        # registro opcional de duraciones y fallos por etapa
+        self.metrics = metrics
+        # almacen opcional de artefactos intermedios (texto crudo, json de gemini, resultado)
+        self.debug_store = debug_store
+        # indice opcional de huellas para no procesar dos veces fotos del mismo recibo
+        self.duplicate_index = duplicate_index
+
+    def process_receipt(
+        self,
+        image: ImageSource,
+        on_stage: Optional[Callable[[str], None]] = None,
+        receipt_id: Optional[str] = None,
+        user_email: Optional[str] = None,
+        check_duplicates: bool = True
+    ) -> ReceiptProcessingResult:
+        """
+        Procesa la imagen de un recibo para extraer y estructurar los datos.
+        Si hay almacén de depuración y el recibo entra en el muestreo, se guardan
+        el texto crudo, el JSON de Gemini y el resultado normalizado bajo `receipt_id`.
 
-        # Carpeta para guardar logs intermedios
-        self.debug_folder = "receipt_debug"
-        # os.makedirs(self.debug_folder, exist_ok=True)  # 👈 Solo para pruebas, comentar en producción
+        Si se pasa `on_stage`, se invoca con el nombre de cada etapa al empezarla
+        ("ocr", "dedup", "gemini", "normalize").
 
-    def process_receipt(self, image_path: str) -> ReceiptProcessingResult:
-        """
-        Procesa la imagen de un recibo para extraer y estructurar los datos,
-        guardando archivos de depuración con el texto crudo, JSON de Gemini
-        y resultado final normalizado.
+        Con índice de duplicados y `user_email`, una foto casi igual a otra ya procesada
+        del mismo usuario y con el mismo texto devuelve el resultado anterior con
+        `duplicate_of` sin pasar por Gemini. `check_duplicates=False` procesa la foto
+        aunque parezca una copia (el usuario confirma que es otro recibo).
+
+        Los errores se registran y devuelven None, salvo TimeoutError (plazo de la
+        petición agotado o backend sin respuesta), que se propaga.
         """
+        notify = on_stage or (lambda stage: None)
+        debug = DebugCapture(self.debug_store, receipt_id)
+        fingerprint = None
+        dedup = self.duplicate_index is not None and user_email and check_duplicates
+        stage = "ocr"
         try:
-            # 1️⃣ Texto crudo desde Cloud Vision
-            raw_text = self.ocr_service.extract_text(image_path)
-            raw_file = os.path.join(self.debug_folder, "raw_text.txt")
-            with open(raw_file, "w", encoding="utf-8") as f:
-                f.write(raw_text or "")
-            print(f"🔹 Texto crudo guardado en {raw_file}")
+            if dedup:
+                # los bytes se leen una vez: se usan para el ocr y para la huella
+                image = read_image_bytes(image)
+
+            # 1️⃣ Texto crudo desde el OCR
+            notify(stage)
+            start = time.perf_counter()
+            raw_text = self.ocr_service.extract_text(image)
+            self._observe(stage, start)
+            debug.save("raw_text.txt", raw_text or "")
 
             if not raw_text or raw_text.strip() == "":
                 print("⚠️ Error en Cloud Vision. No se puede procesar.")
+                self._count_failure(stage)
                 return None
 
+            if dedup:
+                # una huella parecida solo es candidata; el texto del ocr confirma la copia
+                stage = "dedup"
+                notify(stage)
+                start = time.perf_counter()
+                fingerprint, match = self.duplicate_index.lookup(user_email, image, raw_text)
+                self._observe(stage, start)
+                if match is not None:
+                    original_id, original = match
+                    print(f"🔹 Recibo duplicado de {original_id}, se reutiliza el resultado.")
+                    return replace(original, duplicate_of=original_id)
+
             # 2️⃣ JSON devuelto por Gemini
+            stage = "gemini"
+            notify(stage)
+            start = time.perf_counter()
             structured_data = self.gemini_service.process_text_from_receipt(raw_text)
-            gemini_file = os.path.join(self.debug_folder, "gemini_output.json")
-            with open(gemini_file, "w", encoding="utf-8") as f:
-                json.dump(structured_data, f, indent=2, ensure_ascii=False)
-            print(f"🔹 JSON de Gemini guardado en {gemini_file}")
+            self._observe(stage, start)
+            debug.save("gemini_output.json", structured_data)
 
             # 3️⃣ Resultado final normalizado
+            stage = "normalize"
+            notify(stage)
+            start = time.perf_counter()
             result = self._convert_dict_to_receipt_result(structured_data)
+            self._observe(stage, start)
             if result is not None:
-                normalized_file = os.path.join(self.debug_folder, "normalized_output.json")
-                normalized_data = {
+                debug.save("normalized_output.json", {
                     "receipt_data": [vars(r) for r in result.receipt_data_list],
-                    "total": result.total
-                }
-                with open(normalized_file, "w", encoding="utf-8") as f:
-                    json.dump(normalized_data, f, indent=2, ensure_ascii=False)
-                print(f"🔹 Resultado final normalizado guardado en {normalized_file}")
+                    "total": result.total,
+                    "comercio": result.comercio
+                })
             else:
                 print("⚠️ No se pudo normalizar el resultado.")
+                self._count_failure(stage)
 
+            if result is not None and fingerprint is not None:
+                self.duplicate_index.store(user_email, fingerprint, raw_text, receipt_id or uuid.uuid4().hex, result)
             return result
 
         except Exception as e:
             print(f"⚠️ Error general en procesamiento: {e}")
+            self._count_failure(stage)
+            debug.save("error.txt", f"{stage}: {e}")
+            # sin tiempo no hay recibo que devolver: quien llama lo trata como error, no como resultado vacio
+            if isinstance(e, TimeoutError):
+                raise
             return None
 
+    def _observe(self, stage: str, start: float):
+        if self.metrics is not None:
+            self.metrics.observe_duration(stage, time.perf_counter() - start)
+
+    def _count_failure(self, stage: str):
+        if self.metrics is not None:
+            self.metrics.increment("receipt_failures_total", stage=stage)
+
     def _convert_dict_to_receipt_result(self, data: Dict) -> ReceiptProcessingResult:
+        return convert_dict_to_receipt_result(data)
+
+
+class DebugCapture:
+    """
+    Decide una sola vez por recibo si se capturan sus artefactos; sin almacén
+    o fuera del muestreo, `save` no hace nada.
+    """
+    def __init__(self, store: Optional[DebugArtifactStore], receipt_id: Optional[str]):
+        self.store = store
+        self.receipt_id = None
+        if store is not None:
+            receipt_id = receipt_id or uuid.uuid4().hex
+            if store.should_capture(receipt_id):
+                self.receipt_id = receipt_id
+
+    def save(self, name: str, content):
+        if self.receipt_id is not None:
+            self.store.save(self.receipt_id, name, content)
+
+
+def convert_dict_to_receipt_result(data: Dict) -> ReceiptProcessingResult:
+    """
+    Convierte un diccionario en un objeto ReceiptProcessingResult.
+    Normaliza la fecha raíz y asegura que todos los productos sean válidos.
+    """
+    def normalize_fecha(fecha_val) -> str:
         """
-        Convierte un diccionario en un objeto ReceiptProcessingResult.
-        Normaliza la fecha raíz y asegura que todos los productos sean válidos.
+        Convierte cualquier fecha a formato dd/mm/yyyy.
+        Maneja números tipo Excel (int, float o string) y strings dd/mm/yyyy.
+        Devuelve None si no se puede convertir.
         """
-        def normalize_fecha(fecha_val) -> str:
-            """
-            Convierte cualquier fecha a formato dd/mm/yyyy.
-            Maneja números tipo Excel (int, float o string) y strings dd/mm/yyyy.
-            Devuelve None si no se puede convertir.
-            """
-            if fecha_val is None:
-                return None
-            try:
-                numero = int(float(fecha_val))
-                fecha = datetime(1899, 12, 30) + timedelta(days=numero)
-                return fecha.strftime("%d/%m/%Y")
-            except (ValueError, TypeError):
-                pass
+        if fecha_val is None:
+            return None
+        try:
+            numero = int(float(fecha_val))
+            fecha = datetime(1899, 12, 30) + timedelta(days=numero)
+            return fecha.strftime("%d/%m/%Y")
+        except (ValueError, TypeError):
+            pass
 
-            try:
-                fecha_str = str(fecha_val).strip()
-                datetime.strptime(fecha_str, "%d/%m/%Y")
-                return fecha_str
-            except (ValueError, TypeError):
-                pass
+        try:
+            fecha_str = str(fecha_val).strip()
+            datetime.strptime(fecha_str, "%d/%m/%Y")
+            return fecha_str
+        except (ValueError, TypeError):
+            pass
 
-            return None
+        return None
 
-        receipt_data_list = []
-        total = data.get("total_general", 0.0)
+    receipt_data_list = []
+    total = data.get("total_general", 0.0)
 
-        # Normalizamos solo la fecha raíz
-        fecha_raiz = normalize_fecha(data.get("fecha"))
-        if fecha_raiz is None:
-            print("⚠️ No se pudo determinar la fecha del recibo. Revisar OCR/Gemini.")
-            return None
+    # Normalizamos solo la fecha raíz
+    fecha_raiz = normalize_fecha(data.get("fecha"))
+    if fecha_raiz is None:
+        print("⚠️ No se pudo determinar la fecha del recibo. Revisar OCR/Gemini.")
+        return None
 
-        productos = data.get("productos", [])
+    productos = data.get("productos", [])
 
-        for prod in productos:
+    for prod in productos:
+        try:
+            # Cantidad como int
             try:
-                # Cantidad como int
-                try:
-                    cantidad = int(float(prod.get("cantidad", 1)))
-                    if cantidad <= 0:
-                        cantidad = 1
-                except (ValueError, TypeError):
+                cantidad = int(float(prod.get("cantidad", 1)))
+                if cantidad <= 0:
                     cantidad = 1
+            except (ValueError, TypeError):
+                cantidad = 1
+
+            # Precio como float
+            try:
+                precio = round(float(prod.get("precio_unitario", 0.0)), 2)
+            except (ValueError, TypeError):
+                precio = 0.0
+
+            # Nombre seguro
+            nombre = str(prod.get("nombre", "")).strip()
+
+            # Todos los productos usan la misma fecha raíz
+            receipt_data_list.append(ReceiptData(
+                fecha=fecha_raiz,
+                producto=nombre,
+                cantidad=cantidad,
+                precio=precio,
+                descuento=0.0
+            ))
+        except Exception as e:
+            print(f"⚠️ Error con producto {prod}: {e}")
+            continue
+
+    # el comercio es opcional; una cadena vacia cuenta como desconocido
+    comercio = str(data.get("comercio") or "").strip() or None
 
-                # Precio como float
-                try:
-                    precio = round(float(prod.get("precio_unitario", 0.0)), 2)
-                except (ValueError, TypeError):
-                    precio = 0.0
-
-                # Nombre seguro
-                nombre = str(prod.get("nombre", "")).strip()
-
-                # Todos los productos usan la misma fecha raíz
-                receipt_data_list.append(ReceiptData(
-                    fecha=fecha_raiz,
-                    producto=nombre,
-                    cantidad=cantidad,
-                    precio=precio,
-                    descuento=0.0
-                ))
-            except Exception as e:
-                print(f"⚠️ Error con producto {prod}: {e}")
-                continue
-
-        return ReceiptProcessingResult(
-            receipt_data_list=receipt_data_list,
-            total=round(float(total), 2)
-        )
+    return ReceiptProcessingResult(
+        receipt_data_list=receipt_data_list,
+        total=round(float(total), 2),
+        comercio=comercio
+    )
@@ -0,0 +1,125 @@
+# async_controller.py contiene las rutas asincronas que se sirven por asgi (ver create_asgi_app en main.py)
+
+import asyncio
+import uuid
+
+from quart import Blueprint, jsonify, request
+
+from ..application.usecases.async_receipt_processing_service import AsyncReceiptProcessingService
+from ..application.ports.async_sheets_service import AsyncSheetsService
+from ..application.ports.receipt_ledger import ReceiptLedger
+from ..infrastructure.auth.google_auth import GoogleAuth
+from ..infrastructure.metrics.prometheus_metrics import PrometheusMetrics
+from ..infrastructure.resilience.deadline import Deadline, use_deadline
+
+# se crea el blueprint de quart para las rutas asincronas
+async_bp = Blueprint('async_api', __name__)
+
+# se declaran las dependencias que seran inyectadas desde main.py
+async_bp.receipt_processor: AsyncReceiptProcessingService = None
+async_bp.sheets_service: AsyncSheetsService = None
+async_bp.google_auth_service: GoogleAuth = None
+async_bp.metrics: PrometheusMetrics = None
+# serializador de la cookie de sesion de flask, para leer la misma sesion que deja /oauth2callback
+async_bp.session_serializer = None
+async_bp.session_cookie_name: str = "session"
+async_bp.session_max_age: float = None
+async_bp.upload_max_bytes: int = 15 * 1024 * 1024
+async_bp.request_deadline: float = 0.0
+async_bp.receipt_ledger: ReceiptLedger = None
+
+# endpoint asincrono: procesa el recibo y lo guarda en sheets sin ocupar un hilo mientras espera
+@async_bp.route('/api/async/process', methods=['POST'])
+async def process_receipt():
+    async_bp.metrics.increment("receipt_requests_total", endpoint="async_process")
+    # se verifica que el usuario este autenticado
+    user_session = _load_session()
+    if 'user_credentials' not in user_session:
+        return jsonify({"error": "usuario no autenticado"}), 401
+
+    # se verifica si el archivo esta en la peticion
+    files = await request.files
+    file = files.get('image')
+    if file is None:
+        return jsonify({"error": "no se ha subido ningun archivo"}), 400
+    if file.filename == '':
+        return jsonify({"error": "no se ha seleccionado ningun archivo"}), 400
+
+    content = file.read(async_bp.upload_max_bytes + 1)
+    if len(content) > async_bp.upload_max_bytes:
+        return jsonify({"error": f"la imagen supera el limite de {async_bp.upload_max_bytes} bytes"}), 413
+
+    # con el almacen de credenciales puede leer sqlite o refrescar el token: fuera del bucle de eventos
+    try:
+        creds = await asyncio.to_thread(async_bp.google_auth_service.get_creds_from_session, user_session)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 401
+    user_email = user_session['user_credentials']['email']
+
+    # las llamadas externas se reparten el plazo de la peticion
+    deadline = Deadline.after(async_bp.request_deadline) if async_bp.request_deadline > 0 else None
+    receipt_id = uuid.uuid4().hex
+    # con force=1 el usuario confirma que no es una copia de un recibo ya guardado
+    form = await request.form
+    check_duplicates = form.get('force') != '1'
+    try:
+        with use_deadline(deadline):
+            receipt_data = await async_bp.receipt_processor.process_receipt(
+                content, receipt_id=receipt_id, user_email=user_email, check_duplicates=check_duplicates
+            )
+    except TimeoutError as e:
+        return jsonify({"error": f"se agoto el tiempo para procesar el recibo: {e}"}), 504
+    if receipt_data is None:
+        return jsonify({"error": "no se pudo procesar el recibo"}), 422
+
+    # una copia de un recibo ya guardado no se vuelve a escribir en sheets ni en el registro local
+    if receipt_data.duplicate_of:
+        return jsonify({
+            "data": receipt_data,
+            "message": "el recibo ya estaba guardado y no se ha vuelto a escribir; si es un recibo distinto, vuelve a subirlo con force=1",
+            "spreadsheet_id": None,
+            "sheets_status": "duplicado",
+            "duplicate_of": receipt_data.duplicate_of
+        })
+
+    if async_bp.receipt_ledger is not None:
+        try:
+            # sqlite bloquea, se escribe desde un hilo para no detener el bucle de eventos
+            await asyncio.to_thread(async_bp.receipt_ledger.record, user_email, [(receipt_id, receipt_data)])
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar en el registro local: {e}")
+            async_bp.metrics.increment("receipt_failures_total", stage="ledger")
+
+    try:
+        # se guarda la informacion en google sheets
+        result_sheet = await async_bp.sheets_service.save_results(creds, user_email, [receipt_data])
+        # con el buffer activo las filas solo estan encoladas al responder
+        if result_sheet.get("queued"):
+            message = "datos procesados y encolados para guardar en google sheets"
+            sheets_status = "encolado"
+        else:
+            message = "datos guardados en google sheets"
+            sheets_status = "guardado"
+        spreadsheet_id = result_sheet["spreadsheet_id"]
+    except Exception as e:
+        async_bp.metrics.increment("receipt_failures_total", stage="sheets")
+        message = f"datos procesados, pero no se pudieron guardar en sheets: {e}"
+        spreadsheet_id = None
+        sheets_status = "error"
+
+    return jsonify({
+        "data": receipt_data,
+        "message": message,
+        "spreadsheet_id": spreadsheet_id,
+        "sheets_status": sheets_status
+    })
+
+def _load_session() -> dict:
+    """devuelve la sesion firmada por flask, o un diccionario vacio si falta o no es valida."""
+    cookie = request.cookies.get(async_bp.session_cookie_name)
+    if not cookie:
+        return {}
+    try:
+        return async_bp.session_serializer.loads(cookie, max_age=async_bp.session_max_age)
+    except Exception:
+        return {}
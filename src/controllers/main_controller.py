@@ -4,13 +4,22 @@
 #esto es debido a que cada diviision se le agregaran llamadas a funciones especificas para errores que se repitan.entonces si no lo dividov quedara un archivo largo:
 #el objetivo es el siguiente:
 #Emantener funcional el achivo maincontroller hasta que se tenga la estructura nueva completa:, esto es para mantenerlo por las dudas de que no funcione  los demasarchivos creados.Una vez creada la modularizacion se comenta el archivo que no tenia todo modularizado para probar si funciona.
-from flask import Blueprint, jsonify, request, redirect, session, url_for, render_template
-import os, uuid
+from flask import Blueprint, Response, current_app, jsonify, request, redirect, session, url_for, render_template
+import os, zipfile, zlib
 
 from ..application.usecases.receipt_processing_service import ReceiptProcessingService
+from ..application.usecases.receipt_batch_service import ReceiptBatchService
 from ..infrastructure.auth.google_auth import GoogleAuth
 from ..infrastructure.sheets.google_sheets_service import GoogleSheetsService
-from ..infrastructure.gemini.gemini_service_impl import GeminiServiceImpl
+from ..infrastructure.sheets.sheets_write_buffer import SheetsWriteBuffer
+from ..infrastructure.clients.google_client_pool import GoogleClientPool
+from ..application.ports.gemini_interface import GeminiInterface
+from ..application.ports.receipt_ledger import ReceiptLedger
+from ..infrastructure.jobs.job_manager import JobManager
+from ..infrastructure.metrics.prometheus_metrics import PrometheusMetrics
+from ..infrastructure.resilience.deadline import Deadline, use_deadline
+from ..infrastructure.db.sqlite_receipt_ledger import parse_month
+from ..infrastructure.startup.warm_up import WarmUp
 
 # se crea el blueprint para organizar las rutas
 main_bp = Blueprint('main', __name__, template_folder='../../templates')
@@ -18,10 +27,33 @@ main_bp = Blueprint('main', __name__, template_folder='../../templates')
 # se declaran las dependencias que seran inyectadas desde main.py
 main_bp.receipt_processor: ReceiptProcessingService = None
 main_bp.google_auth_service: GoogleAuth = None
-main_bp.gemini_service: GeminiServiceImpl = None
+main_bp.gemini_service: GeminiInterface = None
+main_bp.job_manager: JobManager = None
+main_bp.batch_service: ReceiptBatchService = None
+main_bp.sheets_semaphore = None
+main_bp.sheets_write_buffer: SheetsWriteBuffer = None
+main_bp.client_pool: GoogleClientPool = None
+main_bp.batch_max_files: int = 200
+main_bp.batch_max_bytes: int = 200 * 1024 * 1024
+main_bp.upload_max_bytes: int = 15 * 1024 * 1024
+main_bp.metrics: PrometheusMetrics = None
+# fabrica del servicio de sheets por peticion; se puede sustituir por uno falso en benchmarks
+main_bp.sheets_service_factory = GoogleSheetsService
+# segundos que tiene cada recibo para pasar por ocr y gemini (0 sin plazo)
+main_bp.request_deadline: float = 0.0
+# registro local de recibos para las consultas de /api/analytics (None lo desactiva)
+main_bp.receipt_ledger: ReceiptLedger = None
+# calentamiento de los clientes de los backends; None si esta desactivado
+main_bp.warm_up: WarmUp = None
 
-# diccionario para rastrear el estado de los procesos
-process_status = {}
+# al empezar una etapa del procesamiento, la anterior ya termino
+STAGE_DONE_EVENTS = {"gemini": "ocr_done", "normalize": "gemini_done"}
+
+# respuesta cuando el recibo es una copia de otro ya guardado: no se escribe, pero se avisa
+DUPLICATE_MESSAGE = "el recibo ya estaba guardado y no se ha vuelto a escribir; si es un recibo distinto, vuelve a subirlo con force=1"
+
+# extensiones de imagen aceptadas dentro de un zip
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
 
 # ruta principal que redirige a la pagina de login
 @main_bp.route('/')
@@ -64,17 +96,14 @@ def oauth2callback():
 
     return redirect(url_for('main.upload_page'))
 
-# endpoint para procesar un recibo
+# endpoint para procesar un recibo: encola el trabajo y devuelve el id de inmediato
 @main_bp.route('/api/process', methods=['POST'])
 def process_receipt():
+    main_bp.metrics.increment("receipt_requests_total", endpoint="process")
     # se verifica que el usuario este autenticado
     if 'user_credentials' not in session:
         return jsonify({"error": "usuario no autenticado"}), 401
 
-    # se genera un id unico para el proceso
-    process_id = str(uuid.uuid4())
-    process_status[process_id] = "pending"
-
     # se verifica si el archivo esta en la peticion
     if 'image' not in request.files:
         return jsonify({"error": "no se ha subido ningun archivo"}), 400
@@ -82,48 +111,398 @@ def process_receipt():
     if file.filename == '':
         return jsonify({"error": "no se ha seleccionado ningun archivo"}), 400
 
-    # se crea un directorio temporal y se guarda el archivo
-    temp_path = os.path.join("temp", file.filename)
-    os.makedirs("temp", exist_ok=True)
-    file.save(temp_path)
+    # la imagen se lee una sola vez a memoria, sin archivos temporales
+    content = _read_limited(file.stream, main_bp.upload_max_bytes)
+    if content is None:
+        return jsonify({"error": f"la imagen supera el limite de {main_bp.upload_max_bytes} bytes"}), 413
 
+    # la sesion solo existe en el hilo de la peticion, se leen las credenciales aqui
     try:
-        # ocr y procesamiento del recibo
-        raw_text = main_bp.receipt_processor.ocr_service.extract_text(temp_path)
-        receipt_data = main_bp.receipt_processor.process_receipt(temp_path)
-        process_status[process_id] = "completed"
-    except Exception as e:
-        process_status[process_id] = "failed"
-        return jsonify({"error": str(e)}), 500
-    finally:
-        # se elimina el archivo temporal
-        os.remove(temp_path)
-
-    try:
-        # se recuperan las credenciales de la sesion
         creds = main_bp.google_auth_service.get_creds_from_session(session)
-        user_email = session['user_credentials']['email']
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 401
+    user_email = session['user_credentials']['email']
 
-        # se guarda la informacion en google sheets
-        sheets_service = GoogleSheetsService(creds=creds, user_email=user_email)
-        result_sheet = sheets_service.save_to_sheet(receipt_data)
+    # con force=1 el usuario confirma que no es una copia de un recibo ya guardado
+    check_duplicates = request.form.get('force') != '1'
+
+    # se genera un id unico para el proceso y se encola
+    process_id = main_bp.job_manager.create_job()
+    main_bp.job_manager.submit(process_id, _run_receipt_job, content, creds, user_email, check_duplicates)
+
+    return jsonify({"process_id": process_id, "status": "pending"}), 202
 
+def _run_receipt_job(process_id, content, creds, user_email, check_duplicates=True):
+    """procesa el recibo y lo guarda en sheets dentro de un hilo del pool."""
+    job_manager = main_bp.job_manager
+    # el plazo empieza cuando un hilo toma el trabajo: la espera en la cola no se descuenta
+    # de lo que tienen el ocr y gemini; si se agota, el trabajo termina en failed
+    deadline = Deadline.after(main_bp.request_deadline) if main_bp.request_deadline > 0 else None
+    # ocr y procesamiento del recibo; las llamadas externas se reparten el plazo de la peticion
+    with use_deadline(deadline):
+        receipt_data = main_bp.receipt_processor.process_receipt(
+            content,
+            on_stage=lambda stage: _on_receipt_stage(process_id, stage),
+            receipt_id=process_id,
+            user_email=user_email,
+            check_duplicates=check_duplicates
+        )
+    # el resultado se emite antes de escribir en sheets para que el usuario lo vea antes
+    job_manager.add_event(process_id, "parsed", {"data": receipt_data})
+
+    # una copia de un recibo ya guardado no se vuelve a escribir en sheets ni en el registro local
+    if receipt_data is not None and receipt_data.duplicate_of:
+        job_manager.add_event(process_id, "duplicate", {"duplicate_of": receipt_data.duplicate_of})
+        return {
+            "data": receipt_data,
+            "message": DUPLICATE_MESSAGE,
+            "spreadsheet_id": None,
+            "sheets_status": "duplicado",
+            "duplicate_of": receipt_data.duplicate_of
+        }
+    if receipt_data is not None:
+        _record_in_ledger(user_email, [(process_id, receipt_data)])
+
+    try:
+        # se guarda la informacion en google sheets
+        job_manager.set_stage(process_id, "sheets")
+        sheets_service = main_bp.sheets_service_factory(creds=creds, user_email=user_email, write_buffer=main_bp.sheets_write_buffer, client_pool=main_bp.client_pool, metrics=main_bp.metrics)
+        spreadsheet_id = sheets_service.spreadsheet_id
         message = "datos guardados en google sheets"
-        spreadsheet_id = result_sheet["spreadsheet_id"]
+        result_sheet = sheets_service.save_to_sheet(
+            receipt_data,
+            on_written=_sheets_written_callback(process_id, spreadsheet_id, message),
+            on_failed=_sheets_failed_callback(process_id)
+        )
+        message, sheets_status = _sheets_message(
+            process_id, result_sheet, message, "datos procesados y encolados para guardar en google sheets"
+        )
 
     except Exception as e:
+        main_bp.metrics.increment("receipt_failures_total", stage="sheets")
         message = f"datos procesados, pero no se pudieron guardar en sheets: {e}"
         spreadsheet_id = None
+        sheets_status = "error"
 
-    # se devuelve la respuesta en formato json
-    return jsonify({
-        "process_id": process_id,
+    return {
         "data": receipt_data,
         "message": message,
-        "spreadsheet_id": spreadsheet_id
-    })
+        "spreadsheet_id": spreadsheet_id,
+        "sheets_status": sheets_status
+    }
+
+def _sheets_written_callback(process_id, spreadsheet_id, message):
+    """devuelve la funcion que avisa y termina el trabajo cuando las filas ya estan en google sheets."""
+    def on_written():
+        main_bp.job_manager.add_event(process_id, "sheets_written", {"spreadsheet_id": spreadsheet_id})
+        main_bp.job_manager.complete(process_id, {"message": message, "sheets_status": "guardado"})
+    return on_written
+
+def _sheets_failed_callback(process_id):
+    """devuelve la funcion que termina el trabajo como failed cuando el buffer da las filas por perdidas."""
+    def on_failed(error):
+        main_bp.metrics.increment("receipt_failures_total", stage="sheets")
+        main_bp.job_manager.add_event(process_id, "sheets_failed", {"error": str(error)})
+        message = f"datos procesados, pero no se pudieron guardar en sheets: {error}"
+        main_bp.job_manager.fail(process_id, message, {"message": message, "sheets_status": "error"})
+    return on_failed
+
+def _sheets_message(process_id, result_sheet, written_message, queued_message):
+    """devuelve (mensaje, estado de sheets); con buffer el trabajo sigue en curso hasta que se escriban las filas."""
+    if not result_sheet.get("queued"):
+        return written_message, "guardado"
+    main_bp.job_manager.defer(process_id)
+    main_bp.job_manager.add_event(process_id, "sheets_queued", {"spreadsheet_id": result_sheet["spreadsheet_id"]})
+    return queued_message, "encolado"
+
+def _on_receipt_stage(process_id, stage):
+    """registra la etapa y emite el evento de la etapa que acaba de terminar."""
+    main_bp.job_manager.set_stage(process_id, stage)
+    if stage in STAGE_DONE_EVENTS:
+        main_bp.job_manager.add_event(process_id, STAGE_DONE_EVENTS[stage])
+
+# endpoint para procesar muchos recibos a la vez (varios archivos o un zip)
+@main_bp.route('/api/process/batch', methods=['POST'])
+def process_receipt_batch():
+    main_bp.metrics.increment("receipt_requests_total", endpoint="batch")
+    # se verifica que el usuario este autenticado
+    if 'user_credentials' not in session:
+        return jsonify({"error": "usuario no autenticado"}), 401
+
+    files = [f for f in request.files.getlist('images') if f.filename]
+    if not files:
+        return jsonify({"error": "no se ha subido ningun archivo"}), 400
+
+    # se leen las imagenes (o el contenido del zip) a memoria, sin archivos temporales
+    # los limites de numero y tamano se comprueban antes de leer cada imagen
+    items = []
+    total_bytes = 0
+    for file in files:
+        if file.filename.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    for entry in archive.infolist():
+                        name = os.path.basename(entry.filename)
+                        if entry.is_dir() or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                            continue
+                        # file_size es el tamano descomprimido que declara el zip: se descarta sin descomprimir
+                        error = _batch_limit_error(name, len(items), total_bytes, entry.file_size)
+                        if error is not None:
+                            return error
+                        with archive.open(entry) as source:
+                            content = _read_limited(source, main_bp.upload_max_bytes)
+                        # el tamano declarado puede mentir; se vuelve a comprobar con lo leido
+                        if content is None:
+                            return jsonify({"error": f"{name} supera el limite de {main_bp.upload_max_bytes} bytes"}), 413
+                        total_bytes += len(content)
+                        if total_bytes > main_bp.batch_max_bytes:
+                            return jsonify({"error": f"el lote supera el limite de {main_bp.batch_max_bytes} bytes"}), 413
+                        items.append((name, content))
+            except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError, EOFError, zlib.error) as e:
+                # zip corrupto, cifrado o con una compresion no soportada
+                return jsonify({"error": f"{file.filename} no es un zip valido: {e}"}), 400
+        else:
+            error = _batch_limit_error(file.filename, len(items), total_bytes, 0)
+            if error is not None:
+                return error
+            content = _read_limited(file.stream, main_bp.upload_max_bytes)
+            if content is None:
+                return jsonify({"error": f"{file.filename} supera el limite de {main_bp.upload_max_bytes} bytes"}), 413
+            total_bytes += len(content)
+            if total_bytes > main_bp.batch_max_bytes:
+                return jsonify({"error": f"el lote supera el limite de {main_bp.batch_max_bytes} bytes"}), 413
+            items.append((file.filename, content))
+
+    if not items:
+        return jsonify({"error": f"el lote debe tener entre 1 y {main_bp.batch_max_files} imagenes"}), 400
+
+    # la sesion solo existe en el hilo de la peticion, se leen las credenciales aqui
+    try:
+        creds = main_bp.google_auth_service.get_creds_from_session(session)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 401
+    user_email = session['user_credentials']['email']
+
+    check_duplicates = request.form.get('force') != '1'
+
+    process_id = main_bp.job_manager.create_job()
+    main_bp.job_manager.submit(process_id, _run_batch_job, items, creds, user_email, check_duplicates)
+
+    return jsonify({"process_id": process_id, "status": "pending", "count": len(items)}), 202
+
+def _run_batch_job(process_id, items, creds, user_email, check_duplicates=True):
+    """procesa todas las imagenes del lote en paralelo y hace una sola escritura en sheets."""
+    job_manager = main_bp.job_manager
+    job_manager.set_stage(process_id, f"receipts 0/{len(items)}")
+    results = main_bp.batch_service.process_batch(
+        [content for _, content in items],
+        on_item_done=lambda done, total: job_manager.set_stage(process_id, f"receipts {done}/{total}"),
+        batch_id=process_id,
+        user_email=user_email,
+        check_duplicates=check_duplicates
+    )
+
+    per_image = [
+        {
+            "filename": filename,
+            "data": result,
+            "error": None if result is not None else "no se pudo procesar el recibo",
+            "duplicate_of": result.duplicate_of if result is not None else None
+        }
+        for (filename, _), result in zip(items, results)
+    ]
+    # las copias de recibos ya guardados se devuelven pero no se escriben otra vez
+    processed = [result for result in results if result is not None and not result.duplicate_of]
+    duplicates = sum(1 for result in results if result is not None and result.duplicate_of)
+    # el id de cada recibo del lote es el mismo que usa el procesador para sus artefactos
+    _record_in_ledger(user_email, [
+        (f"{process_id}-{index}", result) for index, result in enumerate(results)
+        if result is not None and not result.duplicate_of
+    ])
+
+    spreadsheet_id = None
+    sheets_status = None
+    if not processed and duplicates:
+        message = f"los {duplicates} recibos procesados ya estaban guardados y no se han vuelto a escribir; si alguno es distinto, vuelve a subirlo con force=1"
+    elif not processed:
+        message = "no se pudo procesar ningun recibo del lote"
+    else:
+        try:
+            # se guardan todos los recibos con una sola escritura en google sheets
+            job_manager.set_stage(process_id, "sheets")
+            message = f"{len(processed)} de {len(items)} recibos guardados en google sheets"
+            if duplicates:
+                message += f" ({duplicates} ya estaban guardados y no se han vuelto a escribir; si alguno es distinto, vuelve a subirlo con force=1)"
+            with main_bp.sheets_semaphore:
+                sheets_service = main_bp.sheets_service_factory(creds=creds, user_email=user_email, write_buffer=main_bp.sheets_write_buffer, client_pool=main_bp.client_pool, metrics=main_bp.metrics)
+                result_sheet = sheets_service.save_results_to_sheet(
+                    processed,
+                    on_written=_sheets_written_callback(process_id, sheets_service.spreadsheet_id, message),
+                    on_failed=_sheets_failed_callback(process_id)
+                )
+            spreadsheet_id = result_sheet["spreadsheet_id"]
+            message, sheets_status = _sheets_message(
+                process_id, result_sheet, message,
+                f"{len(processed)} de {len(items)} recibos encolados para guardar en google sheets"
+            )
+        except Exception as e:
+            main_bp.metrics.increment("receipt_failures_total", stage="sheets")
+            message = f"datos procesados, pero no se pudieron guardar en sheets: {e}"
+            sheets_status = "error"
+
+    return {
+        "results": per_image,
+        "message": message,
+        "spreadsheet_id": spreadsheet_id,
+        "sheets_status": sheets_status
+    }
+
+def _record_in_ledger(user_email, receipts):
+    """guarda los recibos en el registro local; un fallo aqui no impide escribir en sheets."""
+    if main_bp.receipt_ledger is None or not receipts:
+        return
+    try:
+        main_bp.receipt_ledger.record(user_email, receipts)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar en el registro local: {e}")
+        main_bp.metrics.increment("receipt_failures_total", stage="ledger")
+
+def _batch_limit_error(name: str, count: int, total_bytes: int, size: int):
+    """devuelve la respuesta 413 si anadir una imagen de `size` bytes supera los limites del lote, o none."""
+    if count >= main_bp.batch_max_files:
+        return jsonify({"error": f"el lote supera el limite de {main_bp.batch_max_files} imagenes"}), 413
+    if size > main_bp.upload_max_bytes:
+        return jsonify({"error": f"{name} supera el limite de {main_bp.upload_max_bytes} bytes"}), 413
+    if total_bytes + size > main_bp.batch_max_bytes:
+        return jsonify({"error": f"el lote supera el limite de {main_bp.batch_max_bytes} bytes"}), 413
+    return None
+
+def _read_limited(stream, max_bytes: int):
+    """lee el stream completo en una sola lectura acotada; devuelve none si supera el limite."""
+    content = stream.read(max_bytes + 1)
+    if len(content) > max_bytes:
+        return None
+    return content
 
 # endpoint para obtener el estado del procesamiento
 @main_bp.route('/api/status/<process_id>')
 def get_status(process_id):
-    return jsonify({"process_id": process_id, "status": process_status.get(process_id, "not found")})
\ No newline at end of file
+    job = main_bp.job_manager.get_job(process_id)
+    if job is None:
+        return jsonify({"process_id": process_id, "status": "not found"}), 404
+
+    response = {
+        "process_id": process_id,
+        "status": job["status"],
+        "stage": job["stage"]
+    }
+    if job["result"] is not None:
+        # con el trabajo a la espera del buffer de sheets (o si este fallo) se devuelve el resultado parcial
+        response.update(job["result"])
+    if job["status"] == "failed":
+        response["error"] = job["error"]
+    return jsonify(response)
+
+# endpoint de server-sent events con el progreso del procesamiento
+@main_bp.route('/api/events/<process_id>')
+def stream_events(process_id):
+    if main_bp.job_manager.get_job(process_id) is None:
+        return jsonify({"process_id": process_id, "status": "not found"}), 404
+
+    # el proveedor json de flask sabe serializar los dataclasses del resultado
+    dumps = current_app.json.dumps
+    job_manager = main_bp.job_manager
+
+    def generate():
+        position = 0
+        while True:
+            state = job_manager.wait_events(process_id, position, timeout=15)
+            if state is None:
+                return
+            events, finished = state
+            if not events:
+                if finished:
+                    return
+                # comentario para mantener viva la conexion
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                payload = {"elapsed_ms": event["elapsed_ms"]}
+                if event["data"] is not None:
+                    payload.update(event["data"])
+                yield f"event: {event['event']}\ndata: {dumps(payload)}\n\n"
+            position += len(events)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+# endpoints de gasto del usuario, leidos del registro local en vez de google sheets
+# parametros: from y to en formato yyyy-mm, limit, y product (prefijo del nombre) en /products
+@main_bp.route('/api/analytics/months')
+def analytics_by_month():
+    return _analytics_response("months", lambda ledger, email, first, last: ledger.totals_by_month(email, first, last))
+
+@main_bp.route('/api/analytics/products')
+def analytics_by_product():
+    product = request.args.get("product")
+    return _analytics_response("products", lambda ledger, email, first, last: ledger.totals_by_product(
+        email, first, last, product=product, limit=_analytics_limit()
+    ))
+
+@main_bp.route('/api/analytics/stores')
+def analytics_by_store():
+    return _analytics_response("stores", lambda ledger, email, first, last: ledger.totals_by_store(
+        email, first, last, limit=_analytics_limit()
+    ))
+
+def _analytics_response(key, query):
+    """valida la sesion y el rango de meses y devuelve el resultado de la consulta."""
+    main_bp.metrics.increment("receipt_requests_total", endpoint=f"analytics_{key}")
+    if 'user_credentials' not in session:
+        return jsonify({"error": "usuario no autenticado"}), 401
+    if main_bp.receipt_ledger is None:
+        return jsonify({"error": "el registro local esta desactivado"}), 404
+
+    first = request.args.get("from")
+    last = request.args.get("to")
+    try:
+        parse_month(first)
+        parse_month(last)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = query(main_bp.receipt_ledger, session['user_credentials']['email'], first, last)
+    return jsonify({
+        "from": first,
+        "to": last,
+        key: rows,
+        "total": round(sum(row["total"] for row in rows), 2)
+    })
+
+def _analytics_limit() -> int:
+    # numero de filas pedido, acotado para que una peticion no devuelva la tabla entera
+    try:
+        limit = int(request.args.get("limit", "50"))
+    except ValueError:
+        limit = 50
+    return max(1, min(limit, 500))
+
+# sonda de vida: el proceso responde aunque los clientes aun no esten listos
+@main_bp.route('/healthz')
+def healthz():
+    return jsonify({"status": "ok"})
+
+# sonda de disponibilidad: 503 hasta que termina el calentamiento de los clientes
+@main_bp.route('/readyz')
+def readyz():
+    if main_bp.warm_up is None:
+        return jsonify({"ready": True})
+    status = main_bp.warm_up.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+# endpoint de metricas en formato de texto de prometheus
+@main_bp.route('/metrics')
+def metrics():
+    return Response(main_bp.metrics.render(), mimetype="text/plain; version=0.0.4")
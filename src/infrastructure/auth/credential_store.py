@@ -0,0 +1,329 @@
+# credential_store.py guarda en el servidor las credenciales de google de cada usuario y las refresca antes de que caduquen
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+from ...application.ports.metrics_recorder import MetricsRecorder
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_credentials (
+        email TEXT PRIMARY KEY,
+        token TEXT,
+        refresh_token TEXT,
+        token_uri TEXT NOT NULL,
+        client_id TEXT NOT NULL,
+        client_secret TEXT NOT NULL,
+        scopes TEXT NOT NULL,
+        expiry REAL,
+        last_used REAL NOT NULL
+    )
+"""
+
+# google-auth refresca por su cuenta (dentro de la llamada a la api) a menos de 3 min 45 s de caducar;
+# en la peticion se adelanta un poco para que el token refrescado quede guardado
+INLINE_MARGIN_SECONDS = 240
+# last_used se escribe como mucho una vez cada 10 minutos por usuario
+TOUCH_INTERVAL_SECONDS = 600
+# los tokens de fernet empiezan asi (version 0x80 en base64)
+FERNET_PREFIX = "gAAAAA"
+
+
+class CredentialStore:
+    """
+    Credenciales OAuth de Google por usuario, en memoria y en SQLite.
+    - un solo objeto Credentials por usuario, compartido por todas las peticiones y clientes
+    - un hilo en segundo plano refresca los tokens que caducan dentro de `refresh_margin`
+      y guarda los tokens nuevos, también los que google-auth refresque por su cuenta
+    - solo se refrescan los usuarios activos en los últimos `active_seconds`
+    - con `encryption_key` el refresh_token y el client_secret se guardan cifrados con Fernet;
+      el archivo SQLite solo lo puede leer el usuario del servicio (0600)
+    """
+    def __init__(
+        self,
+        db_path: str,
+        refresh_margin: float = 600,
+        check_interval: float = 60,
+        active_seconds: float = 7 * 24 * 3600,
+        retry_seconds: float = 600,
+        metrics: Optional[MetricsRecorder] = None,
+        encryption_key: Optional[str] = None
+    ):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite; se crea si no existe.
+            refresh_margin: Segundos antes de caducar en los que el token se refresca en segundo plano.
+            check_interval: Segundos entre dos revisiones del hilo de refresco.
+            active_seconds: Un usuario sin peticiones en este tiempo deja de refrescarse.
+            retry_seconds: Espera tras un refresco fallido antes de volver a intentarlo en segundo plano.
+            metrics: Registro opcional de refrescos ("credential_refresh_total") y su duración.
+            encryption_key: Clave Fernet (base64) para cifrar el refresh_token y el client_secret.
+        """
+        self.db_path = str(db_path)
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self.active_seconds = active_seconds
+        self.retry_seconds = retry_seconds
+        self.metrics = metrics
+        self._fernet = None
+        if encryption_key:
+            # cryptography solo hace falta si se cifran las credenciales
+            from cryptography.fernet import Fernet
+            self._fernet = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+        # email -> credentials compartidas
+        self._creds: Dict[str, object] = {}
+        # email -> (token, expiry) escritos por ultima vez en sqlite
+        self._persisted: Dict[str, tuple] = {}
+        self._touched: Dict[str, float] = {}
+        self._retry_after: Dict[str, float] = {}
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._thread = None
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # el archivo se crea vacio con permisos 0600 antes de que sqlite lo abra
+        os.close(os.open(self.db_path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._connection()
+        conn.execute(SCHEMA)
+        conn.commit()
+        if self._fernet is not None:
+            self._encrypt_plaintext_rows()
+        self._restrict_permissions()
+
+    def put(self, user_email: str, creds):
+        """guarda las credenciales recien obtenidas en el login."""
+        with self._lock:
+            self._creds[user_email] = creds
+            self._retry_after.pop(user_email, None)
+        self._persist(user_email, creds)
+        self._touch(user_email, force=True)
+
+    def get(self, user_email: str):
+        """devuelve las credenciales del usuario, o none si no hay ninguna guardada."""
+        with self._lock:
+            creds = self._creds.get(user_email)
+        if creds is None:
+            creds = self._load(user_email)
+            if creds is None:
+                return None
+            with self._lock:
+                creds = self._creds.setdefault(user_email, creds)
+        # el hilo de refresco no llego a tiempo (por ejemplo justo despues de arrancar)
+        if _expires_within(creds, INLINE_MARGIN_SECONDS):
+            self._refresh(user_email, creds, "inline", INLINE_MARGIN_SECONDS)
+        self._touch(user_email)
+        return creds
+
+    def refresh_due(self) -> int:
+        """refresca las credenciales activas que caducan dentro del margen; devuelve cuantas se refrescaron."""
+        now = time.time()
+        with self._lock:
+            cached = list(self._creds.items())
+            # los usuarios inactivos salen de memoria; siguen en sqlite
+            for email in [e for e, _ in cached if now - self._touched.get(e, now) > self.active_seconds]:
+                del self._creds[email]
+        # tokens que google-auth refresco dentro de una llamada a la api
+        for email, creds in cached:
+            if self._persisted.get(email) != (creds.token, creds.expiry):
+                self._persist(email, creds)
+
+        rows = self._connection().execute("""
+            SELECT email FROM user_credentials
+            WHERE refresh_token IS NOT NULL AND expiry IS NOT NULL AND expiry < ? AND last_used > ?
+        """, (now + self.refresh_margin, now - self.active_seconds)).fetchall()
+        refreshed = 0
+        for (email,) in rows:
+            with self._lock:
+                if self._retry_after.get(email, 0) > now:
+                    continue
+                creds = self._creds.get(email)
+            if creds is None:
+                creds = self._load(email)
+                if creds is None:
+                    continue
+                with self._lock:
+                    creds = self._creds.setdefault(email, creds)
+            if self._refresh(email, creds, "background", self.refresh_margin):
+                refreshed += 1
+        return refreshed
+
+    def start(self):
+        """arranca el hilo que refresca los tokens en segundo plano."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="credential-refresh", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """detiene el hilo de refresco."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh_due()
+            except Exception as e:
+                print(f"⚠️ Error al revisar las credenciales: {e}")
+
+    def _refresh(self, user_email: str, creds, mode: str, margin: float) -> bool:
+        # google.auth.transport.requests solo se importa cuando hay que refrescar
+        from google.auth.transport.requests import Request
+        with self._user_lock(user_email):
+            # otro hilo pudo refrescarlas mientras se esperaba el lock
+            if not _expires_within(creds, margin):
+                return False
+            start = time.perf_counter()
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                print(f"⚠️ Error al refrescar las credenciales de {user_email}: {e}")
+                with self._lock:
+                    self._retry_after[user_email] = time.time() + self.retry_seconds
+                self._count(mode, "error")
+                return False
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            self._retry_after.pop(user_email, None)
+        self._persist(user_email, creds)
+        self._count(mode, "ok")
+        if self.metrics is not None:
+            self.metrics.observe_duration("credential_refresh", elapsed)
+        return True
+
+    def _persist(self, user_email: str, creds):
+        row = (
+            user_email, creds.token, self._encrypt(creds.refresh_token), creds.token_uri, creds.client_id,
+            self._encrypt(creds.client_secret), json.dumps(list(creds.scopes or [])), _epoch(creds.expiry), time.time()
+        )
+        conn = self._connection()
+        # sin prompt=consent google no repite el refresh_token en un segundo login: se conserva el anterior
+        with self._write_lock, conn:
+            conn.execute("""
+                INSERT INTO user_credentials
+                    (email, token, refresh_token, token_uri, client_id, client_secret, scopes, expiry, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(email) DO UPDATE SET
+                    token=excluded.token,
+                    refresh_token=COALESCE(excluded.refresh_token, refresh_token),
+                    token_uri=excluded.token_uri,
+                    client_id=excluded.client_id,
+                    client_secret=excluded.client_secret,
+                    scopes=excluded.scopes,
+                    expiry=excluded.expiry
+            """, row)
+        with self._lock:
+            self._persisted[user_email] = (creds.token, creds.expiry)
+
+    def _load(self, user_email: str):
+        from google.oauth2.credentials import Credentials
+        row = self._connection().execute("""
+            SELECT token, refresh_token, token_uri, client_id, client_secret, scopes, expiry
+            FROM user_credentials WHERE email=?
+        """, (user_email,)).fetchone()
+        if row is None:
+            return None
+        token, refresh_token, token_uri, client_id, client_secret, scopes, expiry = row
+        creds = Credentials(
+            token=token,
+            refresh_token=self._decrypt(refresh_token),
+            token_uri=token_uri,
+            client_id=client_id,
+            client_secret=self._decrypt(client_secret),
+            scopes=json.loads(scopes),
+            expiry=_datetime(expiry)
+        )
+        with self._lock:
+            self._persisted[user_email] = (creds.token, creds.expiry)
+        return creds
+
+    def _touch(self, user_email: str, force: bool = False):
+        now = time.time()
+        with self._lock:
+            if not force and now - self._touched.get(user_email, 0) < TOUCH_INTERVAL_SECONDS:
+                return
+            self._touched[user_email] = now
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute("UPDATE user_credentials SET last_used=? WHERE email=?", (now, user_email))
+
+    def _encrypt(self, value: Optional[str]) -> Optional[str]:
+        if value is None or self._fernet is None:
+            return value
+        return self._fernet.encrypt(value.encode("utf-8")).decode("ascii")
+
+    def _decrypt(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        if not value.startswith(FERNET_PREFIX):
+            # fila guardada antes de activar el cifrado
+            return value
+        if self._fernet is None:
+            raise RuntimeError("las credenciales guardadas estan cifradas y no hay clave para descifrarlas")
+        return self._fernet.decrypt(value.encode("ascii")).decode("utf-8")
+
+    def _encrypt_plaintext_rows(self):
+        # las filas guardadas antes de activar el cifrado se cifran al arrancar
+        conn = self._connection()
+        rows = conn.execute("SELECT email, refresh_token, client_secret FROM user_credentials").fetchall()
+        with self._write_lock, conn:
+            for email, refresh_token, client_secret in rows:
+                if (refresh_token is None or refresh_token.startswith(FERNET_PREFIX)) \
+                        and client_secret.startswith(FERNET_PREFIX):
+                    continue
+                conn.execute(
+                    "UPDATE user_credentials SET refresh_token=?, client_secret=? WHERE email=?",
+                    (self._encrypt(self._decrypt(refresh_token)), self._encrypt(self._decrypt(client_secret)), email)
+                )
+
+    def _restrict_permissions(self):
+        # sqlite crea los archivos -wal y -shm con la umask del proceso
+        for suffix in ("", "-wal", "-shm"):
+            path = self.db_path + suffix
+            if os.path.exists(path):
+                os.chmod(path, 0o600)
+
+    def _user_lock(self, user_email: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_email, threading.Lock())
+
+    def _count(self, mode: str, result: str):
+        if self.metrics is not None:
+            self.metrics.increment("credential_refresh_total", mode=mode, result=result)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+def _expires_within(creds, seconds: float) -> bool:
+    # sin caducidad conocida (por ejemplo una sesion antigua) se deja a google-auth, que refresca con un 401
+    if creds.expiry is None or not creds.refresh_token:
+        return False
+    return _epoch(creds.expiry) - time.time() <= seconds
+
+
+def _epoch(expiry: Optional[datetime]) -> Optional[float]:
+    # google-auth guarda la caducidad como datetime utc sin zona
+    if expiry is None:
+        return None
+    return expiry.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _datetime(epoch: Optional[float]) -> Optional[datetime]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
@@ -1,13 +1,14 @@
 # google_auth.py esta clase maneja la autenticacion con google
 
+import json
 import os
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import threading
+from ..clients.google_client_pool import GoogleClientPool
+from .credential_store import CredentialStore
 
 class GoogleAuth:
     # el constructor inicializa la clase con la url de autenticacion
-    def __init__(self, auth_url: str):
+    def __init__(self, auth_url: str, client_pool: GoogleClientPool = None, credential_store: CredentialStore = None):
         # estos son los permisos o scopes necesarios
         self.scopes = [
             "https://www.googleapis.com/auth/spreadsheets",
@@ -18,12 +19,29 @@ class GoogleAuth:
         # se obtiene la ruta del archivo de secretos del cliente desde las variables de entorno
         self.client_secrets_file = os.environ.get("CLIENT_SECRETS_FILE")
         self.auth_url = auth_url
+        # pool opcional para reutilizar el discovery y las conexiones http
+        self.client_pool = client_pool
+        # almacen opcional de credenciales en el servidor; sin el viajan en la cookie de sesion
+        self.credential_store = credential_store
+        # el archivo de secretos se lee y se parsea una sola vez
+        self._client_config = None
+        self._client_config_lock = threading.Lock()
+
+    def client_config(self) -> dict:
+        """devuelve la configuracion del cliente oauth leida de CLIENT_SECRETS_FILE."""
+        if self._client_config is None:
+            with self._client_config_lock:
+                if self._client_config is None:
+                    with open(self.client_secrets_file, "r", encoding="utf-8") as f:
+                        self._client_config = json.load(f)
+        return self._client_config
 
     def get_auth_url(self):
         """devuelve la url de autorizacion de google y el estado de la sesion oauth."""
+        from google_auth_oauthlib.flow import Flow
         # se crea el objeto flow para manejar el flujo de autenticacion
-        flow = Flow.from_client_secrets_file(
-            self.client_secrets_file,
+        flow = Flow.from_client_config(
+            self.client_config(),
             scopes=self.scopes,
             redirect_uri=f"{self.auth_url}/oauth2callback"
         )
@@ -38,9 +56,11 @@ class GoogleAuth:
         """
         intercambia el codigo de autorizacion por credenciales y devuelve (email, creds).
         """
+        from google_auth_oauthlib.flow import Flow
+        from googleapiclient.discovery import build
         # se crea un nuevo objeto flow
-        flow = Flow.from_client_secrets_file(
-            self.client_secrets_file,
+        flow = Flow.from_client_config(
+            self.client_config(),
             scopes=self.scopes,
             state=state,
             redirect_uri=f"{self.auth_url}/oauth2callback"
@@ -51,7 +71,10 @@ class GoogleAuth:
         creds = flow.credentials
 
         # se obtiene el email del usuario usando la api de oauth2
-        oauth2_service = build('oauth2', 'v2', credentials=creds)
+        if self.client_pool is not None:
+            oauth2_service = self.client_pool.build('oauth2', 'v2', creds)
+        else:
+            oauth2_service = build('oauth2', 'v2', credentials=creds)
         user_info = oauth2_service.userinfo().get().execute()
         email = user_info.get('email')
 
@@ -59,6 +82,11 @@ class GoogleAuth:
 
     def store_user_creds_in_session(self, email, creds, session):
         """guardar credenciales y email en sesion tras login oauth."""
+        if self.credential_store is not None:
+            # los tokens se quedan en el servidor y la sesion solo identifica al usuario
+            self.credential_store.put(email, creds)
+            session['user_credentials'] = {"email": email}
+            return
         # se guarda un diccionario con las credenciales en la sesion
         session['user_credentials'] = {
             "email": email,
@@ -73,17 +101,28 @@ class GoogleAuth:
         }
 
     def get_creds_from_session(self, session):
-        """reconstruye objeto credentials desde sesion."""
+        """devuelve las credenciales del usuario de la sesion, del almacen del servidor si lo hay."""
+        from google.oauth2.credentials import Credentials
         user_data = session.get('user_credentials')
         if not user_data:
             raise ValueError("no hay credenciales en la sesion. el usuario debe iniciar sesion primero.")
-        creds_data = user_data['creds']
-        # se crea y devuelve el objeto credentials
-        return Credentials(
+        if self.credential_store is not None:
+            creds = self.credential_store.get(user_data['email'])
+            if creds is not None:
+                return creds
+        creds_data = user_data.get('creds')
+        if creds_data is None:
+            raise ValueError("no hay credenciales guardadas para el usuario. debe iniciar sesion de nuevo.")
+        # se crea el objeto credentials
+        creds = Credentials(
             token=creds_data['token'],
             refresh_token=creds_data.get('refresh_token'),
             token_uri=creds_data['token_uri'],
             client_id=creds_data['client_id'],
             client_secret=creds_data['client_secret'],
             scopes=creds_data['scopes']
-        )
\ No newline at end of file
+        )
+        # una sesion de antes del almacen se copia al servidor la primera vez
+        if self.credential_store is not None:
+            self.credential_store.put(user_data['email'], creds)
+        return creds
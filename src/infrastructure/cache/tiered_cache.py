@@ -0,0 +1,104 @@
+# tiered_cache.py contiene las piezas de cache reutilizables: un lru en memoria y un almacen sqlite persistente
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+
+class LRUCache:
+    """
+    Cache en memoria con politica lru, limitada por numero de entradas,
+    por tamano total en bytes y opcionalmente por tiempo de vida.
+    """
+    def __init__(self, max_entries: int = 256, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """devuelve el valor o none si no existe o expiro."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, size, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                return None
+            # se marca como usado recientemente
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int = 0):
+        """guarda un valor indicando su tamano aproximado en bytes."""
+        # un valor mas grande que todo el cache no se guarda
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, time.time())
+            self._bytes += size
+            # se expulsan las entradas menos usadas hasta cumplir los limites
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+class SQLiteCacheStore:
+    """
+    Almacen clave/valor en sqlite para que el cache sobreviva a reinicios.
+    Los valores se guardan como texto.
+    """
+    def __init__(self, db_path: str, table: str, ttl_seconds: Optional[float] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # una sola conexion compartida protegida por el lock
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """devuelve el valor guardado o none si no existe o expiro."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at FROM {self.table} WHERE cache_key=?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+            return None
+        return value
+
+    def set(self, key: str, value: str):
+        """guarda o reemplaza un valor."""
+        with self._lock:
+            self._conn.execute(f"""
+                INSERT INTO {self.table} (cache_key, value, stored_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET value=excluded.value, stored_at=excluded.stored_at
+            """, (key, value, time.time()))
+            self._conn.commit()
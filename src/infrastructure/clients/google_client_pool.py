@@ -0,0 +1,94 @@
+# google_client_pool.py esta clase reutiliza los clientes de las apis de google entre peticiones
+
+import json
+import threading
+import time
+
+
+class GoogleClientPool:
+    """
+    Pool de clientes de googleapiclient por (usuario, api, version).
+    - el documento de discovery se lee una sola vez del paquete (sin red) y se reutiliza ya parseado
+    - cada hilo tiene su propia conexion http persistente, porque httplib2 no es seguro entre hilos
+    - un cliente se descarta si cambian las credenciales del usuario o si no se usa en `idle_seconds`
+    """
+    def __init__(self, idle_seconds: float = 600):
+        self.idle_seconds = idle_seconds
+        # (api, version) -> documento de discovery ya parseado
+        self._documents = {}
+        # (user_key, api, version, hilo) -> {"client", "fingerprint", "last_used"}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self, user_key: str, api: str, version: str, creds):
+        """devuelve un cliente reutilizable para el usuario, construyendolo si hace falta."""
+        key = (user_key, api, version, threading.get_ident())
+        fingerprint = self._fingerprint(creds)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                entry["last_used"] = now
+                return entry["client"]
+
+        # credenciales nuevas o distintas: se construye un cliente nuevo
+        client = self.build(api, version, creds)
+        with self._lock:
+            self._clients[key] = {"client": client, "fingerprint": fingerprint, "last_used": now}
+        return client
+
+    def build(self, api: str, version: str, creds):
+        """construye un cliente sin guardarlo, reutilizando el discovery y la conexion del hilo."""
+        # googleapiclient tarda en importarse; se carga con el primer cliente o en warm_up
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build, build_from_document
+        http = AuthorizedHttp(creds, http=self._thread_http())
+        document = self._document(api, version)
+        if document is None:
+            # la api no viene en el paquete: se usa el discovery normal
+            return build(api, version, http=http, cache_discovery=False)
+        return build_from_document(document, http=http)
+
+    def warm_up(self, apis=(("sheets", "v4"), ("oauth2", "v2"))):
+        """importa googleapiclient y parsea los documentos de discovery antes de la primera peticion."""
+        from googleapiclient import discovery  # noqa: F401
+        for api, version in apis:
+            self._document(api, version)
+
+    def evict(self, user_key: str):
+        """descarta todos los clientes de un usuario (por ejemplo al cerrar sesion)."""
+        with self._lock:
+            for key in [k for k in self._clients if k[0] == user_key]:
+                del self._clients[key]
+
+    def _document(self, api: str, version: str):
+        with self._lock:
+            if (api, version) in self._documents:
+                return self._documents[(api, version)]
+        from googleapiclient.discovery_cache import get_static_doc
+        content = get_static_doc(api, version)
+        document = json.loads(content) if content else None
+        with self._lock:
+            self._documents[(api, version)] = document
+        return document
+
+    def _thread_http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import httplib2
+            http = httplib2.Http()
+            self._local.http = http
+        return http
+
+    def _fingerprint(self, creds):
+        # el refresh_token identifica la sesion; el token de acceso cambia con cada refresco
+        return (creds.client_id, creds.refresh_token or creds.token)
+
+    def _evict_idle(self, now: float):
+        # se llama con el lock tomado
+        expired = [k for k, entry in self._clients.items() if now - entry["last_used"] > self.idle_seconds]
+        for key in expired:
+            del self._clients[key]
@@ -0,0 +1,38 @@
+# async_adapters.py adapta servicios sincronos a los puertos asincronos ejecutandolos en un pool de hilos
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from ...application.ports.gemini_interface import GeminiInterface
+from ...application.ports.async_ocr_service import AsyncOCRService
+from ...application.ports.async_gemini_interface import AsyncGeminiInterface
+
+
+class ThreadedAsyncOCR(AsyncOCRService):
+    """
+    Adaptador de un OCRService sincrono (tesseract, hibrido...) al puerto asincrono.
+    Cada llamada ocupa un hilo de `executor` mientras dura.
+    """
+    def __init__(self, ocr_service: OCRService, executor: ThreadPoolExecutor):
+        self.ocr_service = ocr_service
+        self.executor = executor
+
+    async def extract_text(self, image: ImageSource) -> str:
+        content = read_image_bytes(image)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.ocr_service.extract_text, content)
+
+
+class ThreadedAsyncGemini(AsyncGeminiInterface):
+    """
+    Adaptador de un GeminiInterface sincrono al puerto asincrono.
+    Cada llamada ocupa un hilo de `executor` mientras dura.
+    """
+    def __init__(self, gemini_service: GeminiInterface, executor: ThreadPoolExecutor):
+        self.gemini_service = gemini_service
+        self.executor = executor
+
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.gemini_service.process_text_from_receipt, receipt_text)
@@ -0,0 +1,32 @@
+# bounded_services.py contiene decoradores que limitan cuantas llamadas concurrentes llegan a cada backend
+
+import threading
+from typing import Dict, Any
+from ...application.ports.ocr_service import OCRService, ImageSource
+from ...application.ports.gemini_interface import GeminiInterface
+
+
+class BoundedOCRService(OCRService):
+    """
+    Decorador de OCRService que deja pasar como maximo `max_concurrent` llamadas a la vez.
+    """
+    def __init__(self, ocr_service: OCRService, max_concurrent: int):
+        self.ocr_service = ocr_service
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def extract_text(self, image: ImageSource) -> str:
+        with self._semaphore:
+            return self.ocr_service.extract_text(image)
+
+
+class BoundedGeminiService(GeminiInterface):
+    """
+    Decorador de GeminiInterface que deja pasar como maximo `max_concurrent` llamadas a la vez.
+    """
+    def __init__(self, gemini_service: GeminiInterface, max_concurrent: int):
+        self.gemini_service = gemini_service
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        with self._semaphore:
+            return self.gemini_service.process_text_from_receipt(receipt_text)
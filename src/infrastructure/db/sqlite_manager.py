@@ -1,52 +1,113 @@
 # sqlite_manager.py esta clase se encarga de manejar la base de datos sqlite para persistencia
 
 import sqlite3
+import threading
 from pathlib import Path
 
 # ruta del archivo sqlite (local, junto a sqlite_manager.py)
 DB_PATH = Path(__file__).parent / "ticketapp.db"
-# se asegura que la carpeta exista antes de crear la base de datos
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+# base de datos antigua de user_store.py, se migra una vez al iniciar
+LEGACY_USERS_DB_PATH = Path(__file__).parent / "users.db"
+
+# cada hilo reutiliza su propia conexion
+_local = threading.local()
+# cache en memoria de email -> spreadsheet_id
+_spreadsheet_cache = {}
+_cache_lock = threading.Lock()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def get_connection() -> sqlite3.Connection:
+    """devuelve la conexion del hilo actual, abriendola en modo wal la primera vez."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != DB_PATH:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH)
+        # wal permite leer mientras otro hilo escribe
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
 
 
 def init_db():
-    """inicializa la base de datos y crea la tabla si no existe."""
-    # se establece la conexion con la base de datos
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
+    """inicializa la base de datos y crea la tabla si no existe. solo trabaja la primera vez."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn = get_connection()
         # se crea la tabla si no existe
-        c.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS user_sheets (
                 email TEXT PRIMARY KEY,
                 spreadsheet_id TEXT NOT NULL
             )
         """)
+        _migrate_legacy_users_db(conn)
         conn.commit()
+        _initialized = True
     print(f"[sqlite] init_db ejecutado. db en: {DB_PATH}")
 
 
 def get_spreadsheet_id(user_email: str) -> str | None:
     """devuelve el spreadsheet_id asociado a un usuario, o none si no existe."""
+    with _cache_lock:
+        if user_email in _spreadsheet_cache:
+            return _spreadsheet_cache[user_email]
+
     init_db()
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        # se busca el spreadsheet_id por email
-        c.execute("SELECT spreadsheet_id FROM user_sheets WHERE email=?", (user_email,))
-        row = c.fetchone()
-    # se devuelve el resultado o none si no se encuentra
-    return row[0] if row else None
+    # se busca el spreadsheet_id por email
+    row = get_connection().execute(
+        "SELECT spreadsheet_id FROM user_sheets WHERE email=?", (user_email,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    with _cache_lock:
+        _spreadsheet_cache[user_email] = row[0]
+    return row[0]
 
 
 def set_spreadsheet_id(user_email: str, spreadsheet_id: str):
     """guarda o actualiza el spreadsheet_id asociado a un usuario."""
     init_db()
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        # se inserta el id o se actualiza si ya existe
-        c.execute("""
-            INSERT INTO user_sheets (email, spreadsheet_id)
-            VALUES (?, ?)
-            ON CONFLICT(email) DO UPDATE SET spreadsheet_id=excluded.spreadsheet_id
-        """, (user_email, spreadsheet_id))
-        conn.commit()
-    print(f"[sqlite] spreadsheet_id guardado para {user_email}")
\ No newline at end of file
+    conn = get_connection()
+    # se inserta el id o se actualiza si ya existe
+    conn.execute("""
+        INSERT INTO user_sheets (email, spreadsheet_id)
+        VALUES (?, ?)
+        ON CONFLICT(email) DO UPDATE SET spreadsheet_id=excluded.spreadsheet_id
+    """, (user_email, spreadsheet_id))
+    conn.commit()
+    # se actualiza el cache despues de confirmar la escritura
+    with _cache_lock:
+        _spreadsheet_cache[user_email] = spreadsheet_id
+    print(f"[sqlite] spreadsheet_id guardado para {user_email}")
+
+
+def clear_cache():
+    """vacia el cache en memoria de spreadsheet_id."""
+    with _cache_lock:
+        _spreadsheet_cache.clear()
+
+
+def _migrate_legacy_users_db(conn: sqlite3.Connection):
+    # se copian los usuarios de users.db que no existan todavia en user_sheets
+    if not LEGACY_USERS_DB_PATH.exists():
+        return
+    conn.execute("ATTACH DATABASE ? AS legacy", (str(LEGACY_USERS_DB_PATH),))
+    try:
+        has_table = conn.execute(
+            "SELECT 1 FROM legacy.sqlite_master WHERE type='table' AND name='users'"
+        ).fetchone()
+        if has_table:
+            conn.execute("""
+                INSERT OR IGNORE INTO user_sheets (email, spreadsheet_id)
+                SELECT email, spreadsheet_id FROM legacy.users WHERE spreadsheet_id IS NOT NULL
+            """)
+            conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE legacy")
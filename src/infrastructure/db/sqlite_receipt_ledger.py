@@ -0,0 +1,246 @@
+# sqlite_receipt_ledger.py guarda una copia local de cada recibo para consultar el gasto sin leer google sheets
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ...application.ports.receipt_ledger import ReceiptLedger
+from ...application.ports.metrics_recorder import MetricsRecorder
+from ...application.usecases.receipt_processing_result import ReceiptProcessingResult
+
+MONTH_PATTERN = re.compile(r"^(\d{4})-(\d{2})$")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ledger_receipts (
+        email TEXT NOT NULL,
+        receipt_id TEXT NOT NULL,
+        fecha INTEGER NOT NULL,
+        comercio TEXT,
+        total REAL NOT NULL,
+        recorded_at REAL NOT NULL,
+        PRIMARY KEY (email, receipt_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_ledger_receipts_email_fecha ON ledger_receipts (email, fecha);
+
+    CREATE TABLE IF NOT EXISTS ledger_items (
+        email TEXT NOT NULL,
+        receipt_id TEXT NOT NULL,
+        fecha INTEGER NOT NULL,
+        producto TEXT NOT NULL,
+        producto_key TEXT NOT NULL,
+        cantidad INTEGER NOT NULL,
+        precio REAL NOT NULL,
+        importe REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ledger_items_email_fecha ON ledger_items (email, fecha);
+    CREATE INDEX IF NOT EXISTS idx_ledger_items_email_producto ON ledger_items (email, producto_key, fecha);
+
+    CREATE TABLE IF NOT EXISTS ledger_month_totals (
+        email TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        receipts INTEGER NOT NULL,
+        total REAL NOT NULL,
+        PRIMARY KEY (email, month)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS ledger_product_totals (
+        email TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        producto_key TEXT NOT NULL,
+        producto TEXT NOT NULL,
+        cantidad INTEGER NOT NULL,
+        total REAL NOT NULL,
+        PRIMARY KEY (email, month, producto_key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_ledger_product_totals_key ON ledger_product_totals (email, producto_key, month);
+
+    CREATE TABLE IF NOT EXISTS ledger_store_totals (
+        email TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        comercio_key TEXT NOT NULL,
+        comercio TEXT,
+        receipts INTEGER NOT NULL,
+        total REAL NOT NULL,
+        PRIMARY KEY (email, month, comercio_key)
+    ) WITHOUT ROWID;
+"""
+
+
+class SQLiteReceiptLedger(ReceiptLedger):
+    """
+    Implementación de ReceiptLedger en sqlite. Además de los recibos y sus productos
+    (con la fecha como entero yyyymmdd, ordenable e indexable) mantiene totales por
+    usuario y mes, por producto y por comercio, que se actualizan en la misma transacción
+    que cada inserción. Las consultas leen esos totales y no dependen del número de filas.
+    """
+    def __init__(self, db_path: str, metrics: Optional[MetricsRecorder] = None):
+        """
+        Args:
+            db_path: Ruta del archivo sqlite.
+            metrics: Registro opcional de la duración de escrituras y consultas.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.metrics = metrics
+        # cada hilo lee con su propia conexion; las escrituras se serializan con el lock
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connection().executescript(SCHEMA)
+
+    def record(self, user_email: str, receipts: List[Tuple[str, ReceiptProcessingResult]]) -> int:
+        start = time.perf_counter()
+        recorded = 0
+        conn = self._connection()
+        with self._write_lock, conn:
+            for receipt_id, result in receipts:
+                if self._insert_receipt(conn, user_email, receipt_id, result):
+                    recorded += 1
+        self._observe("ledger_write", start)
+        return recorded
+
+    def totals_by_month(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None) -> List[Dict]:
+        start = time.perf_counter()
+        first, last = _month_range(start_month, end_month)
+        rows = self._connection().execute("""
+            SELECT month, receipts, total FROM ledger_month_totals
+            WHERE email=? AND month BETWEEN ? AND ?
+            ORDER BY month
+        """, (user_email, first, last)).fetchall()
+        self._observe("ledger_query", start)
+        return [
+            {"month": _format_month(month), "receipts": receipts, "total": round(total, 2)}
+            for month, receipts, total in rows
+        ]
+
+    def totals_by_product(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                          product: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        start = time.perf_counter()
+        first, last = _month_range(start_month, end_month)
+        query = """
+            SELECT MIN(producto), SUM(cantidad), SUM(total) AS spent FROM ledger_product_totals
+            WHERE email=? AND month BETWEEN ? AND ?
+        """
+        params = [user_email, first, last]
+        prefix = normalize_key(product or "")
+        if prefix:
+            # rango sobre la clave normalizada para que el prefijo use el indice
+            query += " AND producto_key >= ? AND producto_key < ?"
+            params += [prefix, prefix + "\uffff"]
+        query += " GROUP BY producto_key ORDER BY spent DESC LIMIT ?"
+        params.append(limit)
+        rows = self._connection().execute(query, params).fetchall()
+        self._observe("ledger_query", start)
+        return [
+            {"product": producto, "quantity": cantidad, "total": round(total, 2)}
+            for producto, cantidad, total in rows
+        ]
+
+    def totals_by_store(self, user_email: str, start_month: Optional[str] = None, end_month: Optional[str] = None,
+                        limit: int = 50) -> List[Dict]:
+        start = time.perf_counter()
+        first, last = _month_range(start_month, end_month)
+        rows = self._connection().execute("""
+            SELECT MIN(comercio), SUM(receipts), SUM(total) AS spent FROM ledger_store_totals
+            WHERE email=? AND month BETWEEN ? AND ?
+            GROUP BY comercio_key ORDER BY spent DESC LIMIT ?
+        """, (user_email, first, last, limit)).fetchall()
+        self._observe("ledger_query", start)
+        return [
+            {"store": comercio, "receipts": receipts, "total": round(total, 2)}
+            for comercio, receipts, total in rows
+        ]
+
+    def _insert_receipt(self, conn: sqlite3.Connection, user_email: str, receipt_id: str, result: ReceiptProcessingResult) -> bool:
+        fecha = sortable_date(result.receipt_data_list[0].fecha) if result.receipt_data_list else None
+        if fecha is None:
+            print(f"⚠️ El recibo {receipt_id} no tiene productos con fecha valida, no se guarda en el registro local.")
+            return False
+
+        inserted = conn.execute("""
+            INSERT OR IGNORE INTO ledger_receipts (email, receipt_id, fecha, comercio, total, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_email, receipt_id, fecha, result.comercio, result.total, time.time())).rowcount
+        if not inserted:
+            return False
+
+        month = fecha // 100
+        items = [
+            (user_email, receipt_id, fecha, item.producto, normalize_key(item.producto), item.cantidad, item.precio, round(item.total, 2))
+            for item in result.receipt_data_list
+        ]
+        conn.executemany("""
+            INSERT INTO ledger_items (email, receipt_id, fecha, producto, producto_key, cantidad, precio, importe)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, items)
+
+        # los totales se actualizan en la misma transaccion que el recibo
+        conn.execute("""
+            INSERT INTO ledger_month_totals (email, month, receipts, total) VALUES (?, ?, 1, ?)
+            ON CONFLICT(email, month) DO UPDATE SET
+                receipts=receipts + 1, total=total + excluded.total
+        """, (user_email, month, result.total))
+        conn.executemany("""
+            INSERT INTO ledger_product_totals (email, month, producto_key, producto, cantidad, total) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(email, month, producto_key) DO UPDATE SET
+                cantidad=cantidad + excluded.cantidad, total=total + excluded.total
+        """, [(user_email, month, key, producto, cantidad, importe) for _, _, _, producto, key, cantidad, _, importe in items])
+        conn.execute("""
+            INSERT INTO ledger_store_totals (email, month, comercio_key, comercio, receipts, total) VALUES (?, ?, ?, ?, 1, ?)
+            ON CONFLICT(email, month, comercio_key) DO UPDATE SET
+                receipts=receipts + 1, total=total + excluded.total
+        """, (user_email, month, normalize_key(result.comercio or ""), result.comercio, result.total))
+        return True
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # wal permite leer mientras otro hilo escribe
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _observe(self, stage: str, start: float):
+        if self.metrics is not None:
+            self.metrics.observe_duration(stage, time.perf_counter() - start)
+
+
+def sortable_date(fecha: str) -> Optional[int]:
+    """convierte una fecha dd/mm/yyyy en el entero yyyymmdd, o none si no es valida."""
+    try:
+        parsed = datetime.strptime(str(fecha).strip(), "%d/%m/%Y")
+    except (ValueError, TypeError):
+        return None
+    return parsed.year * 10000 + parsed.month * 100 + parsed.day
+
+
+def parse_month(value: Optional[str]) -> Optional[int]:
+    """convierte "yyyy-mm" en el entero yyyymm; lanza valueerror si el formato no es valido."""
+    if value is None or value == "":
+        return None
+    match = MONTH_PATTERN.match(value.strip())
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        raise ValueError(f"mes invalido: {value} (se espera yyyy-mm)")
+    return int(match.group(1)) * 100 + int(match.group(2))
+
+
+def normalize_key(text: str) -> str:
+    """clave de agrupacion: sin tildes, en minusculas y con los espacios colapsados."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(without_accents.casefold().split())
+
+
+def _month_range(start_month: Optional[str], end_month: Optional[str]):
+    first = parse_month(start_month)
+    last = parse_month(end_month)
+    return (first if first is not None else 0), (last if last is not None else 999999)
+
+
+def _format_month(month: int) -> str:
+    return f"{month // 100:04d}-{month % 100:02d}"
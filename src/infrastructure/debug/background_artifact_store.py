@@ -0,0 +1,140 @@
+# background_artifact_store.py guarda los artefactos de depuracion de cada recibo desde un hilo propio
+
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict
+from ...application.ports.debug_artifact_store import DebugArtifactStore
+
+
+class BackgroundArtifactStore(DebugArtifactStore):
+    """
+    Implementacion de DebugArtifactStore que escribe en `base_dir/<receipt_id>/<nombre>.gz`.
+    La peticion solo encola el artefacto; la serializacion, la compresion y la escritura
+    ocurren en un hilo aparte. Si la cola esta llena el artefacto se descarta.
+    Se muestrea una fraccion de los recibos y se conservan como mucho `max_receipts`
+    carpetas, ninguna mas antigua que `max_age_seconds`.
+    """
+    def __init__(
+        self,
+        base_dir: str = "receipt_debug",
+        sample_rate: float = 1.0,
+        max_receipts: int = 500,
+        max_age_seconds: float = 72 * 3600,
+        queue_size: int = 1000
+    ):
+        """
+        Args:
+            base_dir: Carpeta donde se crea una subcarpeta por recibo.
+            sample_rate: Fracción de recibos que se guardan (0 a 1).
+            max_receipts: Número máximo de recibos conservados; se borran los más antiguos.
+            max_age_seconds: Antigüedad máxima de un recibo guardado (None sin límite).
+            queue_size: Artefactos pendientes como máximo antes de empezar a descartar.
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.max_receipts = max_receipts
+        self.max_age_seconds = max_age_seconds
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {"written": 0, "dropped": 0, "failed": 0, "sampled_out": 0, "deleted_receipts": 0}
+        # carpetas de recibos en orden de creacion, para aplicar la retencion sin recorrer el disco
+        self._receipts = deque(self._existing_receipts())
+        self._known = set(path.name for path in self._receipts)
+        self._writer = threading.Thread(target=self._write_loop, name="debug-artifacts", daemon=True)
+        self._writer.start()
+
+    def should_capture(self, receipt_id: str) -> bool:
+        # decision determinista por id: todos los artefactos de un recibo se guardan o ninguno
+        if self.sample_rate >= 1:
+            return True
+        bucket = int(hashlib.sha1(receipt_id.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        if bucket < self.sample_rate:
+            return True
+        self._count("sampled_out")
+        return False
+
+    def save(self, receipt_id: str, name: str, content: Any):
+        try:
+            self._queue.put_nowait((receipt_id, name, content))
+        except queue.Full:
+            self._count("dropped")
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve los artefactos escritos, descartados y fallidos y los recibos borrados por retencion."""
+        with self._lock:
+            return dict(self._stats, pending=self._queue.qsize(), receipts=len(self._receipts))
+
+    def flush(self, timeout: float = 5.0):
+        """espera a que se escriban los artefactos encolados (como mucho `timeout` segundos)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _write_loop(self):
+        while True:
+            receipt_id, name, content = self._queue.get()
+            try:
+                self._write(receipt_id, name, content)
+                self._count("written")
+            except Exception as e:
+                print(f"⚠️ Error guardando el artefacto {name} de {receipt_id}: {e}")
+                self._count("failed")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, receipt_id: str, name: str, content: Any):
+        folder = self.base_dir / _safe_name(receipt_id)
+        if folder.name not in self._known:
+            folder.mkdir(parents=True, exist_ok=True)
+            self._known.add(folder.name)
+            self._receipts.append(folder)
+            self._apply_retention()
+
+        if isinstance(content, str):
+            data = content
+        else:
+            data = json.dumps(content, indent=2, ensure_ascii=False, default=str)
+        with gzip.open(folder / f"{_safe_name(name)}.gz", "wt", encoding="utf-8") as artifact:
+            artifact.write(data)
+
+    def _apply_retention(self):
+        now = time.time()
+        while self._receipts:
+            oldest = self._receipts[0]
+            too_many = len(self._receipts) > self.max_receipts
+            too_old = self.max_age_seconds is not None and _mtime(oldest) < now - self.max_age_seconds
+            if not (too_many or too_old):
+                break
+            self._receipts.popleft()
+            self._known.discard(oldest.name)
+            shutil.rmtree(oldest, ignore_errors=True)
+            self._count("deleted_receipts")
+
+    def _existing_receipts(self):
+        folders = [path for path in self.base_dir.iterdir() if path.is_dir()]
+        return sorted(folders, key=_mtime)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def _safe_name(name: str) -> str:
+    # los ids y nombres vienen del propio servidor, pero se evita cualquier separador de ruta
+    return name.replace(os.sep, "_").replace("/", "_").replace("..", "_")
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
@@ -0,0 +1,143 @@
+# multi_index_duplicate_index.py detecta fotos repetidas del mismo recibo comparando huellas perceptuales
+
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ...application.ports.duplicate_index import DuplicateIndex
+from ...application.usecases.receipt_processing_result import ReceiptProcessingResult
+
+# importes, fechas, horas y numeros de ticket: lo que cambia entre dos recibos con el mismo formato
+NUMBER = re.compile(r"\d+(?:[.,:/-]\d+)*")
+
+
+class MultiIndexHashTable:
+    """
+    Búsqueda por distancia de Hamming con varias tablas hash (multi-index hashing).
+    La huella se parte en `max_distance + 1` trozos y cada trozo indexa una tabla:
+    dos huellas a `max_distance` bits o menos coinciden por fuerza en algún trozo entero,
+    así solo se comparan las huellas que comparten un trozo en vez de todas.
+    """
+    def __init__(self, hash_bits: int, max_distance: int):
+        self.max_distance = max_distance
+        chunks = max(1, min(max_distance + 1, hash_bits))
+        # (desplazamiento, mascara) de cada trozo; los primeros se llevan los bits sobrantes
+        self._chunks = []
+        offset = 0
+        for index in range(chunks):
+            width = hash_bits // chunks + (1 if index < hash_bits % chunks else 0)
+            self._chunks.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables: List[Dict[int, list]] = [{} for _ in self._chunks]
+
+    def add(self, key: int, value: Any) -> tuple:
+        """guarda la huella y devuelve la entrada, necesaria para quitarla despues."""
+        entry = (key, value)
+        for table, (offset, mask) in zip(self._tables, self._chunks):
+            table.setdefault((key >> offset) & mask, []).append(entry)
+        return entry
+
+    def remove(self, entry: tuple):
+        key = entry[0]
+        for table, (offset, mask) in zip(self._tables, self._chunks):
+            chunk = (key >> offset) & mask
+            bucket = table.get(chunk)
+            if bucket is None:
+                continue
+            # se compara por identidad: dos fotos identicas dan entradas iguales pero distintas
+            bucket[:] = [other for other in bucket if other is not entry]
+            if not bucket:
+                del table[chunk]
+
+    def within(self, key: int) -> List[Tuple[int, Any]]:
+        """devuelve (distancia, valor) de todas las huellas dentro del radio, de la mas cercana a la mas lejana."""
+        found = {}
+        for table, (offset, mask) in zip(self._tables, self._chunks):
+            for entry in table.get((key >> offset) & mask, ()):
+                distance = (key ^ entry[0]).bit_count()
+                if distance <= self.max_distance:
+                    # una entrada aparece en varias tablas si comparte varios trozos
+                    found[id(entry)] = (distance, entry[1])
+        return sorted(found.values(), key=lambda match: match[0])
+
+
+class MultiIndexDuplicateIndex(DuplicateIndex):
+    """
+    Implementación de DuplicateIndex en memoria con una tabla multi-índice por usuario.
+    La huella la calcula `hasher` (por ejemplo perceptual_hash.dhash); una foto es
+    candidata a copia si su huella queda a `max_distance` bits o menos de otra ya guardada,
+    y solo es copia si además su texto tiene los mismos números (importes, fecha, hora,
+    número de ticket), al menos `min_numbers`. Ante la duda el recibo se procesa otra vez.
+    Se conservan las últimas `max_entries_per_user` huellas de cada usuario.
+    """
+    def __init__(
+        self,
+        hasher: Callable[[bytes], Optional[int]],
+        hash_bits: int = 128,
+        max_distance: int = 3,
+        max_entries_per_user: int = 5000,
+        min_numbers: int = 3
+    ):
+        """
+        Args:
+            hasher: Función que devuelve la huella de una imagen, o None si no es legible.
+            hash_bits: Número de bits de las huellas de `hasher`.
+            max_distance: Bits distintos como máximo para considerar dos fotos el mismo recibo.
+            max_entries_per_user: Huellas guardadas por usuario; se olvidan las más antiguas.
+            min_numbers: Números mínimos en el texto para poder confirmar una copia.
+        """
+        self.hasher = hasher
+        self.hash_bits = hash_bits
+        self.max_distance = max_distance
+        self.max_entries_per_user = max_entries_per_user
+        self.min_numbers = min_numbers
+        self._tables: Dict[str, MultiIndexHashTable] = {}
+        # entradas de cada usuario en orden de llegada, para olvidar las mas antiguas
+        self._entries: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "candidates": 0, "duplicates": 0, "rejected": 0, "unreadable": 0, "stored": 0}
+
+    def lookup(self, user_email: str, content: bytes, text: str) -> Tuple[Optional[int], Optional[Tuple[str, ReceiptProcessingResult]]]:
+        # la huella se calcula fuera del lock, es la parte cara
+        fingerprint = self.hasher(content)
+        numbers = _numbers(text)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if fingerprint is None:
+                self._stats["unreadable"] += 1
+                return None, None
+            table = self._tables.get(user_email)
+            candidates = table.within(fingerprint) if table is not None else []
+            if not candidates:
+                return fingerprint, None
+            self._stats["candidates"] += 1
+            if len(numbers) >= self.min_numbers:
+                for _, (receipt_id, result, stored_numbers) in candidates:
+                    if stored_numbers == numbers:
+                        self._stats["duplicates"] += 1
+                        return fingerprint, (receipt_id, result)
+            # mismo aspecto pero otros numeros: es otro recibo del mismo comercio
+            self._stats["rejected"] += 1
+            return fingerprint, None
+
+    def store(self, user_email: str, fingerprint: int, text: str, receipt_id: str, result: ReceiptProcessingResult):
+        with self._lock:
+            table = self._tables.get(user_email)
+            if table is None:
+                table = self._tables[user_email] = MultiIndexHashTable(self.hash_bits, self.max_distance)
+                self._entries[user_email] = deque()
+            entries = self._entries[user_email]
+            entries.append(table.add(fingerprint, (receipt_id, result, _numbers(text))))
+            self._stats["stored"] += 1
+            while len(entries) > self.max_entries_per_user:
+                table.remove(entries.popleft())
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve las busquedas, las candidatas, los duplicados confirmados y rechazados, las imagenes ilegibles y las huellas guardadas."""
+        with self._lock:
+            return dict(self._stats)
+
+
+def _numbers(text: str) -> tuple:
+    # dos lecturas del mismo recibo pueden diferir en letras, pero los numeros tienen que ser los mismos
+    return tuple(NUMBER.findall(text or ""))
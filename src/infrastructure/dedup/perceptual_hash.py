@@ -0,0 +1,39 @@
+# perceptual_hash.py calcula una huella de la imagen que cambia poco entre dos fotos del mismo recibo
+
+import io
+from typing import Optional
+
+
+def dhash(content: bytes, hash_size: int = 8) -> Optional[int]:
+    """
+    Devuelve el hash de diferencias (dHash) de la imagen como un entero de
+    2 * hash_size * hash_size bits: un bit por cada par de píxeles vecinos en
+    horizontal y otro por cada par en vertical de la imagen reducida a grises.
+    Sobrevive a la recompresión, al cambio de resolución y a diferencias de luz;
+    dos fotos parecidas dan huellas a poca distancia de Hamming.
+    Devuelve None si los bytes no son una imagen legible.
+    """
+    try:
+        # pillow se carga en el primer uso, no al importar la aplicacion
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(content)) as image:
+            # en jpeg se decodifica directamente a escala reducida, sin pasar por la foto completa
+            image.draft("L", (hash_size * 16, hash_size * 16))
+            # los telefonos guardan la orientacion en exif en vez de rotar los pixeles
+            image = ImageOps.exif_transpose(image)
+            # el contraste se normaliza para que una foto mas oscura de la misma huella
+            gray = ImageOps.autocontrast(image.convert("L"), cutoff=1)
+            wide = gray.resize((hash_size + 1, hash_size), Image.LANCZOS).tobytes()
+            tall = gray.resize((hash_size, hash_size + 1), Image.LANCZOS).tobytes()
+    except Exception:
+        return None
+
+    bits = 0
+    for y in range(hash_size):
+        row = y * (hash_size + 1)
+        for x in range(hash_size):
+            bits = (bits << 1) | (wide[row + x] > wide[row + x + 1])
+    for y in range(hash_size):
+        for x in range(hash_size):
+            bits = (bits << 1) | (tall[y * hash_size + x] > tall[(y + 1) * hash_size + x])
+    return bits
@@ -0,0 +1,113 @@
+# src/infrastructure/gemini/cached_gemini_service.py
+
+import hashlib
+import json
+import re
+import threading
+from typing import Dict, Any, Optional
+from ...application.ports.gemini_interface import GeminiInterface
+from ...application.ports.async_gemini_interface import AsyncGeminiInterface
+from ..cache.tiered_cache import LRUCache, SQLiteCacheStore
+
+class CachedGeminiService(GeminiInterface):
+    """
+    Decorador de GeminiInterface que guarda el JSON estructurado por el texto
+    normalizado del recibo, para no repetir la llamada al modelo con el mismo ticket.
+    """
+    def __init__(
+        self,
+        gemini_service: GeminiInterface,
+        version: str = "",
+        max_entries: int = 512,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        db_path: Optional[str] = None
+    ):
+        """
+        Args:
+            gemini_service: El servicio real al que se delegan los fallos de cache.
+            version: Versión de modelo/prompt incluida en la clave; al cambiarla se invalida el cache.
+            max_entries: Número máximo de resultados en memoria.
+            ttl_seconds: Tiempo de vida de cada resultado (None para no expirar).
+            db_path: Ruta de un archivo SQLite opcional para persistir el cache.
+        """
+        self.gemini_service = gemini_service
+        self.version = version
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = SQLiteCacheStore(db_path, table="gemini_cache", ttl_seconds=ttl_seconds) if db_path else None
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        key, data = self.lookup(receipt_text)
+        if data is not None:
+            return data
+
+        data = self.gemini_service.process_text_from_receipt(receipt_text)
+        self.store(key, data)
+        return data
+
+    def lookup(self, receipt_text: str):
+        """devuelve (clave, copia del json) buscando en memoria y en disco; el json es None si no esta."""
+        key = self._cache_key(receipt_text)
+
+        data = self.memory.get(key)
+        if data is not None:
+            self._count("memory_hits")
+            return key, self._copy(data)
+
+        if self.disk is not None:
+            stored = self.disk.get(key)
+            if stored is not None:
+                self._count("disk_hits")
+                data = json.loads(stored)
+                self.memory.set(key, data)
+                return key, self._copy(data)
+
+        self._count("misses")
+        return key, None
+
+    def store(self, key: str, data: Dict[str, Any]):
+        """guarda el json de un texto bajo la clave que devolvio `lookup`."""
+        # solo se guardan resultados con productos: asi nunca se guarda el
+        # diccionario de respaldo (fecha de hoy, sin productos) que devuelve un error
+        if isinstance(data, dict) and data.get("productos"):
+            self.memory.set(key, self._copy(data))
+            if self.disk is not None:
+                self.disk.set(key, json.dumps(data, ensure_ascii=False))
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve los contadores de aciertos y fallos del cache."""
+        with self._lock:
+            return dict(self._stats, entries=len(self.memory))
+
+    def _cache_key(self, receipt_text: str) -> str:
+        # se colapsan los espacios y se ignoran mayusculas para que variaciones menores compartan clave
+        normalized = re.sub(r"\s+", " ", receipt_text or "").strip().casefold()
+        return hashlib.sha256(f"{self.version}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _copy(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # copia profunda para que quien llama no modifique la entrada del cache
+        return json.loads(json.dumps(data))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+class AsyncCachedGeminiService(AsyncGeminiInterface):
+    """
+    Versión asíncrona del cache de Gemini: usa el mismo almacenamiento que un
+    CachedGeminiService, así los dos caminos comparten aciertos y estadísticas.
+    """
+    def __init__(self, gemini_service: AsyncGeminiInterface, cache: CachedGeminiService):
+        self.gemini_service = gemini_service
+        self.cache = cache
+
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        key, data = self.cache.lookup(receipt_text)
+        if data is not None:
+            return data
+
+        data = await self.gemini_service.process_text_from_receipt(receipt_text)
+        self.cache.store(key, data)
+        return data
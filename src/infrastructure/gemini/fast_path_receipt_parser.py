@@ -0,0 +1,159 @@
+# src/infrastructure/gemini/fast_path_receipt_parser.py
+
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from ...application.ports.gemini_interface import GeminiInterface
+from ...application.ports.async_gemini_interface import AsyncGeminiInterface
+from .receipt_text_compactor import BOILERPLATE_PATTERN
+
+AMOUNT = r"(\d+[.,]\d{2})"
+DATE_PATTERN = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})\b")
+TOTAL_PATTERN = re.compile(r"^\s*(?:importe\s+)?total\b(?!\s*(?:iva|impuestos?|art))\D*" + AMOUNT, re.IGNORECASE)
+# "2 x LECHE 1,25 2,50" o "2 LECHE 1,25 2,50": cantidad, nombre, precio unitario, importe
+QTY_ITEM_PATTERN = re.compile(r"^\s*(\d{1,3})\s*(?:[xX*]\s*)?([^\d\s].*?)\s+" + AMOUNT + r"\s+" + AMOUNT + r"\s*$")
+# "PAN 1,20": nombre y precio, cantidad 1
+SINGLE_ITEM_PATTERN = re.compile(r"^\s*([^\d\s].*?)\s+" + AMOUNT + r"\s*$")
+# lineas con importes que no son productos
+NON_ITEM_WORDS = re.compile(
+    r"\b(subtotal|total|iva|base|imponible|cambio|efectivo|tarjeta|entregado|pagado|visa|mastercard|cuota|ahorro)\b",
+    re.IGNORECASE
+)
+
+class FastPathReceiptParser(GeminiInterface):
+    """
+    Implementación local y determinista de GeminiInterface para recibos bien formados.
+    Extrae fecha, productos y total del texto OCR y comprueba que los productos sumen
+    el total; si algo no cuadra, delega en el servicio de Gemini.
+    """
+    def __init__(self, fallback: GeminiInterface, tolerance: float = 0.02):
+        """
+        Args:
+            fallback: Servicio al que se delega cuando el análisis local no es fiable.
+            tolerance: Diferencia máxima admitida entre la suma de productos y el total.
+        """
+        self.fallback = fallback
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._stats = {"fast_path": 0, "fallback": 0}
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        data = self.try_parse(receipt_text)
+        if data is not None:
+            return data
+        return self.fallback.process_text_from_receipt(receipt_text)
+
+    def try_parse(self, receipt_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Igual que `parse` pero cuenta la decisión en las estadísticas: devuelve el
+        resultado local, o None si hay que delegar en Gemini.
+        """
+        data = self.parse(receipt_text)
+        self._count("fast_path" if data is not None else "fallback")
+        return data
+
+    def parse(self, receipt_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Analiza el texto y devuelve el diccionario con el mismo formato que Gemini
+        ("fecha", "comercio", "productos", "total_general"), o None si no supera la verificación.
+        """
+        lines = [line.strip() for line in (receipt_text or "").splitlines() if line.strip()]
+
+        fecha = self._find_date(lines)
+        if fecha is None:
+            return None
+
+        total_index, total = self._find_total(lines)
+        if total is None:
+            return None
+
+        # los productos estan antes de la linea del total
+        productos = self._find_items(lines[:total_index])
+        if not productos:
+            return None
+
+        suma = sum(p["cantidad"] * p["precio_unitario"] for p in productos)
+        if abs(suma - total) > self.tolerance:
+            return None
+
+        return {"fecha": fecha, "comercio": self._find_store(lines), "productos": productos, "total_general": total}
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve cuantos recibos se resolvieron localmente y cuantos se delegaron a Gemini."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _find_date(self, lines: List[str]) -> Optional[str]:
+        for line in lines:
+            for day, month, year in DATE_PATTERN.findall(line):
+                if len(year) == 2:
+                    year = f"20{year}"
+                try:
+                    return datetime(int(year), int(month), int(day)).strftime("%d/%m/%Y")
+                except ValueError:
+                    continue
+        return None
+
+    def _find_store(self, lines: List[str]) -> str:
+        # el nombre del comercio es la primera linea si no es una direccion, un importe o una fecha
+        if not lines:
+            return ""
+        first = lines[0]
+        if BOILERPLATE_PATTERN.search(first) or DATE_PATTERN.search(first) or re.search(AMOUNT, first):
+            return ""
+        if not re.search(r"[^\W\d_]{2}", first):
+            return ""
+        return first
+
+    def _find_total(self, lines: List[str]):
+        for index, line in enumerate(lines):
+            match = TOTAL_PATTERN.match(line)
+            if match:
+                return index, _to_float(match.group(1))
+        return None, None
+
+    def _find_items(self, lines: List[str]) -> List[Dict[str, Any]]:
+        productos = []
+        for line in lines:
+            if NON_ITEM_WORDS.search(line) or DATE_PATTERN.search(line):
+                continue
+
+            match = QTY_ITEM_PATTERN.match(line)
+            if match:
+                cantidad = int(match.group(1))
+                precio = _to_float(match.group(3))
+                importe = _to_float(match.group(4))
+                # la cantidad por el precio debe dar el importe de la linea
+                if cantidad <= 0 or abs(cantidad * precio - importe) > self.tolerance:
+                    return []
+                productos.append({"nombre": match.group(2).strip(), "cantidad": cantidad, "precio_unitario": precio})
+                continue
+
+            match = SINGLE_ITEM_PATTERN.match(line)
+            if match:
+                productos.append({"nombre": match.group(1).strip(), "cantidad": 1, "precio_unitario": _to_float(match.group(2))})
+        return productos
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+def _to_float(amount: str) -> float:
+    return round(float(amount.replace(",", ".")), 2)
+
+
+class AsyncFastPathReceiptParser(AsyncGeminiInterface):
+    """
+    Versión asíncrona del atajo local: analiza con las reglas de un FastPathReceiptParser
+    (y suma en sus estadísticas) y solo espera al servicio asíncrono si no cuadra.
+    """
+    def __init__(self, parser: FastPathReceiptParser, fallback: AsyncGeminiInterface):
+        self.parser = parser
+        self.fallback = fallback
+
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        data = self.parser.try_parse(receipt_text)
+        if data is not None:
+            return data
+        return await self.fallback.process_text_from_receipt(receipt_text)
@@ -2,26 +2,27 @@
 
 import os
 import json
+import hashlib
+import textwrap
+import threading
 from typing import Dict, Any
-from google.generativeai.types import GenerationConfig
-import google.generativeai as genai
-from google.generativeai.types import HarmBlockThreshold, HarmCategory
 from ...application.ports.gemini_interface import GeminiInterface
+from ...application.ports.async_gemini_interface import AsyncGeminiInterface
+from .receipt_text_compactor import ReceiptTextCompactor
 from datetime import datetime
 
 class GeminiServiceImpl(GeminiInterface):
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    MODEL_NAME = 'gemini-1.5-flash'
 
-    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
-        prompt = f"""
+    # se quita la sangria del bloque para no pagar tokens de espacios en cada llamada
+    PROMPT_TEMPLATE = textwrap.dedent("""
         Extrae la información de un recibo y devuélvela en un JSON válido.  
 
         JSON requerido:
 
         {{
             "fecha": "fecha única del recibo en formato dd/mm/yyyy",
+            "comercio": "nombre del comercio o tienda que emite el recibo",
             "productos": [
                 {{
                     "nombre": "nombre del producto",
@@ -37,34 +38,145 @@ class GeminiServiceImpl(GeminiInterface):
         - Si aparece un número tipo Excel (ej: 45901), conviértelo automáticamente a dd/mm/yyyy.
         - Si hay múltiples fechas detectadas en el ticket, determina la más probable como fecha principal y úsala para todos los productos.
         - No uses valores por defecto como "01/09/2025"; si no se puede determinar, deja el campo "fecha" vacío.
+        - El campo "comercio" es el nombre comercial (sin dirección ni NIF); si no aparece, déjalo vacío.
         - El campo "cantidad" debe ser int; si falta, asumir 1.
         - El campo "precio_unitario" debe ser float con 2 decimales.
         - El campo "total_general" debe reflejar la suma real de todos los productos.
 
         Texto del recibo:
         {receipt_text}
-        """
+        """).strip()
+
+    def __init__(self, api_key: str, compactor: ReceiptTextCompactor = None, timeout: float = None, raise_errors: bool = False):
+        # la libreria de gemini y el modelo se cargan en la primera llamada o en warm_up
+        self.api_key = api_key
+        self._model = None
+        self._model_lock = threading.Lock()
+        # compactador opcional del texto OCR antes de armar el prompt
+        self.compactor = compactor
+        # segundos maximos por llamada al modelo (None sin limite)
+        self.timeout = timeout
+        # si los errores se lanzan (para reintentarlos fuera) en vez de devolver el diccionario de respaldo
+        self.raise_errors = raise_errors
+        self._usage_lock = threading.Lock()
+        self._usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "chars_in": 0, "chars_sent": 0}
+
+    @property
+    def model(self):
+        """modelo de gemini, configurado una sola vez aunque lo pidan varios hilos a la vez."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.MODEL_NAME)
+        return self._model
+
+    def warm_up(self):
+        """carga la libreria y el modelo ahora, para que la primera peticion no lo pague."""
+        return self.model
+
+    @property
+    def cache_version(self) -> str:
+        """identifica el modelo y el prompt; cambia cuando cualquiera de los dos cambia."""
+        prompt_hash = hashlib.sha256(self.PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+        compaction = f":c{self.compactor.VERSION}" if self.compactor is not None else ""
+        return f"{self.MODEL_NAME}:{prompt_hash}{compaction}"
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """devuelve los tokens acumulados de entrada/salida y los caracteres ahorrados por la compactacion."""
+        with self._usage_lock:
+            usage = dict(self._usage)
+        calls = usage["calls"] or 1
+        usage["mean_prompt_tokens"] = round(usage["prompt_tokens"] / calls, 1)
+        usage["mean_output_tokens"] = round(usage["output_tokens"] / calls, 1)
+        usage["chars_saved"] = usage["chars_in"] - usage["chars_sent"]
+        return usage
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        text, prompt = self.build_prompt(receipt_text)
 
         try:
-            generation_config = GenerationConfig(
-                response_mime_type="application/json"
-            )
-
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings={
-                    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                }
-            )
+            response = self.model.generate_content(prompt, **self.generation_options())
+            self.record_usage(response, len(receipt_text or ""), len(text or ""))
 
             json_data = json.loads(response.text)
             return json_data
 
         except Exception as e:
-            print(f"⚠️ Error al procesar el texto con Gemini: {e}")
-            fecha_actual = datetime.now().strftime("%d/%m/%Y")
-            return {"fecha": fecha_actual, "productos": [], "total_general": 0.0}
+            if self.raise_errors:
+                raise
+            return self.fallback_result(e)
+
+    # lo que sigue lo comparte AsyncGeminiServiceImpl, que solo cambia la llamada al modelo
+
+    def build_prompt(self, receipt_text: str):
+        """devuelve el texto que se envia (compactado o no) y el prompt completo."""
+        text = self.compactor.compact(receipt_text) if self.compactor is not None else receipt_text
+        return text, self.PROMPT_TEMPLATE.format(receipt_text=text)
+
+    def generation_options(self) -> Dict[str, Any]:
+        """opciones comunes a generate_content y generate_content_async."""
+        from google.generativeai.types import GenerationConfig, HarmBlockThreshold, HarmCategory
+        return {
+            "generation_config": GenerationConfig(
+                response_mime_type="application/json"
+            ),
+            "safety_settings": {
+                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            },
+            "request_options": {"timeout": self.timeout} if self.timeout else None
+        }
+
+    def fallback_result(self, error: Exception) -> Dict[str, Any]:
+        """diccionario de respaldo cuando gemini falla y los errores no se lanzan."""
+        print(f"⚠️ Error al procesar el texto con Gemini: {error}")
+        fecha_actual = datetime.now().strftime("%d/%m/%Y")
+        return {"fecha": fecha_actual, "productos": [], "total_general": 0.0}
+
+    def record_usage(self, response, chars_in: int, chars_sent: int):
+        """suma los tokens de la respuesta y los caracteres del texto antes y despues de compactarlo."""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        with self._usage_lock:
+            self._usage["calls"] += 1
+            self._usage["prompt_tokens"] += prompt_tokens
+            self._usage["output_tokens"] += output_tokens
+            self._usage["chars_in"] += chars_in
+            self._usage["chars_sent"] += chars_sent
+        print(f"🔹 Gemini tokens: entrada {prompt_tokens}, salida {output_tokens} (texto {chars_in} -> {chars_sent} caracteres)")
+
+
+class AsyncGeminiServiceImpl(AsyncGeminiInterface):
+    """
+    Versión asíncrona de GeminiServiceImpl con `generate_content_async`. Comparte el
+    modelo, el prompt, la compactación y el registro de tokens del servicio síncrono.
+    """
+    def __init__(self, gemini_service: GeminiServiceImpl):
+        self.gemini_service = gemini_service
+
+    def warm_up(self):
+        """el modelo es el del servicio sincrono: se calienta ese."""
+        return self.gemini_service.warm_up()
+
+    @property
+    def cache_version(self) -> str:
+        return self.gemini_service.cache_version
+
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        service = self.gemini_service
+        text, prompt = service.build_prompt(receipt_text)
+
+        try:
+            response = await service.model.generate_content_async(prompt, **service.generation_options())
+            service.record_usage(response, len(receipt_text or ""), len(text or ""))
+            return json.loads(response.text)
+
+        except Exception as e:
+            if service.raise_errors:
+                raise
+            return service.fallback_result(e)
@@ -0,0 +1,60 @@
+# src/infrastructure/gemini/receipt_text_compactor.py
+
+import re
+from typing import List
+
+AMOUNT_PATTERN = re.compile(r"\d+[.,]\d{2}")
+DATE_PATTERN = re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b")
+# lineas de cabecera y pie que nunca son productos ni la fecha o el total
+BOILERPLATE_PATTERN = re.compile(
+    r"\b(c\.?i\.?f|n\.?i\.?f|nif|cif|tel[eé]?f?(ono)?|tlf|fax|www|http|e-?mail|"
+    r"gracias|vuelva|conserve|devoluci[oó]n|devoluciones|cambios|horario|atendido|"
+    r"factura simplificada|calle|avda|avenida|plaza|pol[ií]gono)\b"
+    r"|\bc/|@|\b\d{5}\b",
+    re.IGNORECASE
+)
+
+# separadores sin letras ni numeros ("-----", "=====", "*****")
+SEPARATOR_PATTERN = re.compile(r"^[\W_]+$")
+
+class ReceiptTextCompactor:
+    """
+    Reduce el texto OCR antes de enviarlo a Gemini: colapsa espacios y, solo en la
+    cabecera (antes del primer importe o fecha) y en el pie (después del último),
+    quita líneas de dirección, CIF, teléfono o despedidas y las líneas repetidas.
+    Entre el primer y el último importe están los productos: ahí no se quita nada
+    salvo separadores repetidos, porque dos compras iguales dan líneas iguales y el
+    nombre de un producto puede ir en una línea y su precio en la siguiente.
+    """
+    VERSION = "2"
+
+    def compact(self, receipt_text: str) -> str:
+        lines = [re.sub(r"\s+", " ", raw_line).strip() for raw_line in (receipt_text or "").splitlines()]
+        lines = [line for line in lines if line]
+        important = [i for i, line in enumerate(lines) if AMOUNT_PATTERN.search(line) or DATE_PATTERN.search(line)]
+        # sin importes ni fechas todo el texto se trata como cabecera
+        body_start, body_end = (important[0], important[-1]) if important else (len(lines), -1)
+
+        kept: List[str] = []
+        seen = set()
+        for index, line in enumerate(lines):
+            if index in (body_start, body_end) or body_start < index < body_end:
+                # cuerpo del recibo: solo se quitan los separadores repetidos
+                if SEPARATOR_PATTERN.match(line):
+                    if line in seen:
+                        continue
+                    seen.add(line)
+                kept.append(line)
+                continue
+
+            if AMOUNT_PATTERN.search(line) or DATE_PATTERN.search(line):
+                kept.append(line)
+                continue
+            if BOILERPLATE_PATTERN.search(line):
+                continue
+            # en cabecera y pie las lineas repetidas (nombre del comercio, avisos) se dejan una vez
+            if line.casefold() in seen:
+                continue
+            seen.add(line.casefold())
+            kept.append(line)
+        return "\n".join(kept)
@@ -0,0 +1,192 @@
+# job_manager.py esta clase se encarga de ejecutar trabajos en segundo plano y rastrear su estado
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class JobManager:
+    """
+    Ejecuta trabajos en un pool acotado de hilos y guarda el estado de cada uno.
+    Los trabajos terminados expiran despues de `ttl_seconds`.
+    Cada trabajo guarda una lista de eventos con los milisegundos transcurridos
+    desde que se recibio, para poder emitir el progreso a los clientes.
+    """
+    def __init__(self, max_workers: int = 4, ttl_seconds: int = 600):
+        # pool de hilos acotado para no saturar los backends
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="receipt-job")
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # se notifica a quienes esperan eventos cada vez que un trabajo cambia
+        self._changed = threading.Condition(self._lock)
+
+    def create_job(self) -> str:
+        """registra un nuevo trabajo en estado pending y devuelve su id."""
+        process_id = str(uuid.uuid4())
+        with self._lock:
+            self._purge_expired()
+            self._jobs[process_id] = {
+                "status": "pending",
+                "stage": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "deferred": False,
+                "completion": None,
+                "failure": None,
+                "events": []
+            }
+            self._append_event(self._jobs[process_id], "received")
+        return process_id
+
+    def submit(self, process_id: str, fn: Callable, *args, **kwargs):
+        """
+        encola la funcion en el pool. la funcion recibe el process_id como primer argumento
+        y su valor de retorno se guarda como resultado del trabajo.
+        """
+        self.executor.submit(self._run, process_id, fn, *args, **kwargs)
+
+    def set_stage(self, process_id: str, stage: str):
+        """actualiza la etapa actual de un trabajo en curso y registra un evento 'stage'."""
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is not None:
+                job["stage"] = stage
+                self._append_event(job, "stage", {"stage": stage})
+
+    def add_event(self, process_id: str, name: str, data: Any = None):
+        """registra un evento con nombre y datos opcionales en un trabajo."""
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is not None:
+                self._append_event(job, name, data)
+
+    def defer(self, process_id: str):
+        """
+        marca el trabajo como pendiente de un paso externo (por ejemplo la escritura en sheets):
+        al volver la funcion su resultado se guarda pero el trabajo sigue en processing
+        hasta que se llame a `complete`.
+        """
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is not None:
+                job["deferred"] = True
+
+    def complete(self, process_id: str, updates: Dict[str, Any] = None):
+        """termina un trabajo diferido anadiendo `updates` a su resultado (puede llegar antes de que vuelva la funcion)."""
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is None or job["finished_at"] is not None:
+                return
+            job["completion"] = dict(updates or {})
+            if job["result"] is None:
+                # la funcion aun no ha vuelto; _run termina el trabajo
+                return
+            result = dict(job["result"], **job["completion"])
+        self._finish(process_id, status="completed", result=result)
+
+    def fail(self, process_id: str, error: str, updates: Dict[str, Any] = None):
+        """
+        termina como failed un trabajo diferido cuyo paso externo no se pudo hacer, anadiendo
+        `updates` a su resultado parcial (puede llegar antes de que vuelva la funcion).
+        """
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is None or job["finished_at"] is not None:
+                return
+            job["failure"] = error
+            job["completion"] = dict(updates or {})
+            if job["result"] is None:
+                # la funcion aun no ha vuelto; _run termina el trabajo
+                return
+            result = dict(job["result"], **job["completion"])
+        self._finish(process_id, status="failed", result=result, error=error)
+
+    def wait_events(self, process_id: str, start: int, timeout: float) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        espera hasta `timeout` segundos a que haya eventos a partir de la posicion `start`.
+        devuelve (eventos nuevos, terminado) o none si el trabajo no existe.
+        """
+        with self._changed:
+            job = self._jobs.get(process_id)
+            if job is not None and len(job["events"]) <= start and job["finished_at"] is None:
+                self._changed.wait(timeout=timeout)
+                job = self._jobs.get(process_id)
+            if job is None:
+                return None
+            return list(job["events"][start:]), job["finished_at"] is not None
+
+    def get_job(self, process_id: str) -> Optional[Dict[str, Any]]:
+        """devuelve una copia del estado del trabajo o none si no existe o expiro."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(process_id)
+            if job is None:
+                return None
+            job = dict(job)
+            job["events"] = list(job["events"])
+            return job
+
+    def shutdown(self, wait: bool = True):
+        """detiene el pool esperando a los trabajos en curso."""
+        self.executor.shutdown(wait=wait)
+
+    def _run(self, process_id: str, fn: Callable, *args, **kwargs):
+        with self._lock:
+            if process_id in self._jobs:
+                self._jobs[process_id]["status"] = "processing"
+        try:
+            result = fn(process_id, *args, **kwargs)
+            failure = None
+            with self._lock:
+                job = self._jobs.get(process_id)
+                waiting = job is not None and job["deferred"] and job["completion"] is None and job["failure"] is None
+                if job is not None:
+                    failure = job["failure"]
+                    if waiting:
+                        # el resultado parcial se puede consultar mientras se espera
+                        job["result"] = result
+                    elif job["completion"]:
+                        result = dict(result, **job["completion"])
+            if failure is not None:
+                self._finish(process_id, status="failed", result=result, error=failure)
+            elif not waiting:
+                self._finish(process_id, status="completed", result=result)
+        except Exception as e:
+            print(f"⚠️ Error en el trabajo {process_id}: {e}")
+            self._finish(process_id, status="failed", error=str(e))
+
+    def _finish(self, process_id: str, status: str, result: Any = None, error: str = None):
+        with self._lock:
+            job = self._jobs.get(process_id)
+            if job is None:
+                return
+            job["status"] = status
+            job["stage"] = "done"
+            job["result"] = result
+            job["error"] = error
+            job["finished_at"] = time.time()
+            if status == "completed":
+                self._append_event(job, "completed", result)
+            else:
+                self._append_event(job, "failed", {"error": error})
+
+    def _append_event(self, job: Dict[str, Any], name: str, data: Any = None):
+        # se llama con el lock tomado
+        elapsed_ms = int((time.time() - job["created_at"]) * 1000)
+        job["events"].append({"event": name, "elapsed_ms": elapsed_ms, "data": data})
+        self._changed.notify_all()
+
+    def _purge_expired(self):
+        # se eliminan los trabajos terminados cuyo ttl ya vencio (se llama con el lock tomado)
+        now = time.time()
+        expired = [
+            pid for pid, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds
+        ]
+        for pid in expired:
+            del self._jobs[pid]
@@ -0,0 +1,121 @@
+# prometheus_metrics.py esta clase acumula histogramas y contadores y los expone en formato de texto de prometheus
+
+import bisect
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Tuple
+from ...application.ports.metrics_recorder import MetricsRecorder
+
+# limites de los buckets en segundos, desde consultas sqlite hasta llamadas lentas a gemini
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "receipt_requests_total": "Peticiones recibidas por endpoint.",
+    "receipt_failures_total": "Fallos por etapa del procesamiento.",
+    "cache_events_total": "Aciertos y fallos de los caches.",
+    "ocr_engine_requests_total": "Recibos servidos por cada motor OCR en modo hibrido.",
+    "external_call_events_total": "Reintentos, duplicados, timeouts, intentos abandonados y cortes del circuito por backend externo.",
+    "debug_artifacts_total": "Artefactos de depuracion escritos, descartados o fuera del muestreo.",
+    "duplicate_index_events_total": "Busquedas de fotos repetidas, duplicados encontrados e imagenes ilegibles.",
+    "credential_refresh_total": "Refrescos de tokens de google en segundo plano o dentro de una peticion.",
+    "ocr_tiling_total": "Imagenes recibidas, tickets largos partidos, franjas leidas y fallos al partir.",
+    "gemini_calls_total": "Llamadas a gemini con respuesta.",
+    "gemini_tokens_total": "Tokens de entrada (prompt) y de salida (output) de las llamadas a gemini.",
+    "gemini_receipt_chars_total": "Caracteres del texto OCR antes (original) y despues (compacted) de compactarlo."
+}
+
+
+class PrometheusMetrics(MetricsRecorder):
+    """
+    Implementacion de MetricsRecorder en memoria: un histograma de duracion por etapa,
+    cuantiles p50/p95/p99 sobre las ultimas `window` observaciones y contadores con etiquetas.
+    """
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._lock = threading.Lock()
+        # stage -> {"counts": [...], "sum": float, "count": int, "recent": deque}
+        self._histograms: Dict[str, Dict] = {}
+        # nombre -> {etiquetas ordenadas -> valor}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        # contadores que se leen al exportar, de servicios que ya llevan sus propias estadisticas
+        self._collectors: List[Tuple[str, Callable[[], Dict[Tuple, float]]]] = []
+
+    def observe_duration(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0, "recent": deque(maxlen=self.window)}
+                self._histograms[stage] = histogram
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram["counts"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+            histogram["recent"].append(seconds)
+
+    def increment(self, counter: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._counters.setdefault(counter, {})
+            values[key] = values.get(key, 0) + amount
+
+    def register_collector(self, counter: str, collect: Callable[[], Dict[Tuple, float]]):
+        """
+        registra una funcion que devuelve {etiquetas: valor} y se consulta en cada exportacion.
+        las etiquetas son tuplas de pares (nombre, valor).
+        """
+        with self._lock:
+            self._collectors.append((counter, collect))
+
+    def quantiles(self, stage: str) -> Dict[float, float]:
+        """devuelve p50/p95/p99 de las observaciones recientes de una etapa."""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            recent = sorted(histogram["recent"]) if histogram else []
+        if not recent:
+            return {}
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+    def render(self) -> str:
+        """devuelve todas las metricas en formato de exposicion de texto de prometheus."""
+        lines = []
+        with self._lock:
+            histograms = {stage: dict(h, counts=list(h["counts"])) for stage, h in self._histograms.items()}
+            counters = {name: dict(values) for name, values in self._counters.items()}
+            collectors = list(self._collectors)
+
+        for name, collect in collectors:
+            try:
+                for key, value in collect().items():
+                    counters.setdefault(name, {})[tuple(sorted(key))] = value
+            except Exception as e:
+                print(f"⚠️ Error leyendo metricas de {name}: {e}")
+
+        if histograms:
+            lines.append("# HELP receipt_stage_duration_seconds Duracion de cada etapa del procesamiento.")
+            lines.append("# TYPE receipt_stage_duration_seconds histogram")
+            for stage, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["counts"]):
+                    cumulative += count
+                    lines.append(f'receipt_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'receipt_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'receipt_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+                lines.append(f'receipt_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+            lines.append(f"# HELP receipt_stage_duration_recent_seconds Cuantiles de las ultimas {self.window} observaciones por etapa.")
+            lines.append("# TYPE receipt_stage_duration_recent_seconds summary")
+            for stage in sorted(histograms):
+                for q, value in self.quantiles(stage).items():
+                    lines.append(f'receipt_stage_duration_recent_seconds{{stage="{stage}",quantile="{q}"}} {value}')
+
+        for name, values in sorted(counters.items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                labels = ",".join(f'{label}="{label_value}"' for label, label_value in key)
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+from ...application.ports.ocr_service import ImageSource, read_image_bytes
+from ...application.ports.async_ocr_service import AsyncOCRService
+from .cloud_vision_ocr import text_from_response
+
+class AsyncCloudVisionOCR(AsyncOCRService):
+    """
+    Implementación de AsyncOCRService con el cliente asíncrono de Cloud Vision
+    (ImageAnnotatorAsyncClient): la espera de la respuesta no ocupa ningún hilo.
+    """
+    def __init__(self, credentials_path: str, client=None, timeout: float = None, raise_errors: bool = False):
+        """
+        Args:
+            credentials_path: Ruta al archivo JSON de credenciales de la cuenta de servicio.
+            client: Cliente ImageAnnotatorAsyncClient ya construido (opcional, útil para pruebas).
+            timeout: Segundos máximos por llamada a la API (None usa el del cliente).
+            raise_errors: Si los errores se lanzan (para reintentarlos fuera) en vez de devolver "".
+        """
+        self.credentials_path = credentials_path
+        self.timeout = timeout
+        self.raise_errors = raise_errors
+        self.client = client
+
+    def _get_client(self):
+        # el cliente grpc asincrono queda ligado al bucle de eventos, se crea en la primera llamada
+        if self.client is None:
+            from google.cloud import vision
+            from google.oauth2 import service_account
+            credentials = service_account.Credentials.from_service_account_file(self.credentials_path)
+            self.client = vision.ImageAnnotatorAsyncClient(credentials=credentials)
+        return self.client
+
+    async def extract_text(self, image: ImageSource) -> str:
+        """
+        Extrae texto de una imagen usando Cloud Vision.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        try:
+            from google.cloud import vision
+            content = read_image_bytes(image)
+            # el cliente asincrono no tiene text_detection, se pide la misma anotacion en un lote de una imagen
+            request = vision.AnnotateImageRequest(
+                image=vision.Image(content=content),
+                features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+            )
+            options = {"timeout": self.timeout} if self.timeout else {}
+            response = await self._get_client().batch_annotate_images(requests=[request], **options)
+            annotation = response.responses[0]
+            if self.raise_errors and annotation.error.message:
+                raise RuntimeError(f"Cloud Vision: {annotation.error.message}")
+            return text_from_response(annotation)
+
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"⚠️ Error en AsyncCloudVisionOCR: {e}")
+            return ""
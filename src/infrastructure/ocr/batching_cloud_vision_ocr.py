@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from ...application.ports.ocr_service import ImageSource, read_image_bytes
+from ..resilience.deadline import DeadlineExceededError, current_deadline
+from .cloud_vision_ocr import CloudVisionOCR
+
+class BatchingCloudVisionOCR(CloudVisionOCR):
+    """
+    Variante de CloudVisionOCR que agrupa las llamadas concurrentes a `extract_text`
+    en una sola petición `batch_annotate_images` y reparte cada anotación a quien la pidió.
+    Un lote se cierra antes de tiempo si la siguiente imagen haría pasar la petición de
+    `max_batch_bytes`, porque Cloud Vision rechaza entera una petición demasiado grande.
+    """
+    def __init__(
+        self,
+        credentials_path: str,
+        client=None,
+        window_seconds: float = 0.05,
+        max_batch_size: int = 16,
+        max_batch_bytes: int = 8 * 1024 * 1024,
+        timeout: float = None,
+        raise_errors: bool = False
+    ):
+        """
+        Inicializa el hilo que envía los lotes; el cliente se construye como en CloudVisionOCR.
+
+        Args:
+            credentials_path: Ruta al archivo JSON de credenciales de la cuenta de servicio.
+            client: Cliente ImageAnnotatorClient ya construido (opcional, útil para pruebas).
+            window_seconds: Tiempo máximo que se espera a juntar imágenes antes de enviar el lote.
+            max_batch_size: Número máximo de imágenes por petición (Cloud Vision admite hasta 16).
+            max_batch_bytes: Bytes máximos de imagen por petición (Cloud Vision admite unos 10 MB);
+                una imagen más grande se envía sola.
+            timeout: Segundos máximos por petición de lote (None usa el del cliente).
+            raise_errors: Si los errores se lanzan a quien espera en vez de devolver "".
+        """
+        super().__init__(credentials_path, client=client, timeout=timeout, raise_errors=raise_errors)
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self._pending: "queue.Queue[tuple]" = queue.Queue()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="vision-batcher", daemon=True)
+        self._dispatcher.start()
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Encola la imagen para el próximo lote y espera su texto, como mucho lo que
+        quede del plazo de la petición.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        try:
+            content = read_image_bytes(image)
+        except Exception as e:
+            if self.raise_errors:
+                raise
+            print(f"⚠️ Error en BatchingCloudVisionOCR: {e}")
+            return ""
+
+        future: Future = Future()
+        self._pending.put((content, future))
+        deadline = current_deadline()
+        try:
+            return future.result(timeout=deadline.remaining() if deadline is not None else None)
+        except FutureTimeoutError:
+            # si el lote aun no ha salido, la imagen ya no se envia
+            future.cancel()
+            error = DeadlineExceededError("se agoto el plazo esperando el lote de Cloud Vision")
+            if self.raise_errors:
+                raise error from None
+            print(f"⚠️ Error en BatchingCloudVisionOCR: {error}")
+            return ""
+
+    def _dispatch_loop(self):
+        carry = None
+        while True:
+            # se espera la primera imagen y luego se juntan mas hasta la ventana o el tamano maximo
+            batch = [carry if carry is not None else self._pending.get()]
+            carry = None
+            size = len(batch[0][0])
+            window_end = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(item[0]) > self.max_batch_bytes:
+                    # la imagen no cabe en esta peticion: abre el siguiente lote
+                    carry = item
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        # las llamadas que ya se rindieron por el plazo no se envian
+        batch = [(content, future) for content, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            from google.cloud import vision
+            requests = [
+                vision.AnnotateImageRequest(
+                    image=vision.Image(content=content),
+                    features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+                )
+                for content, _ in batch
+            ]
+            response = self._get_client().batch_annotate_images(requests=requests, **self._call_options())
+            for (_, future), annotation in zip(batch, response.responses):
+                if self.raise_errors and annotation.error.message:
+                    future.set_exception(RuntimeError(f"Cloud Vision: {annotation.error.message}"))
+                else:
+                    future.set_result(self._text_from_response(annotation))
+        except Exception as e:
+            print(f"⚠️ Error en BatchingCloudVisionOCR: {e}")
+            if self.raise_errors:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        # ninguna llamada queda esperando aunque falte su anotacion
+        for _, future in batch:
+            if not future.done():
+                future.set_result("")
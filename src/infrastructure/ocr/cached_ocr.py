@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Optional, Tuple
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from ...application.ports.async_ocr_service import AsyncOCRService
+from ..cache.tiered_cache import LRUCache, SQLiteCacheStore
+from ..resilience.deadline import DeadlineExceededError, current_deadline
+
+class CachedOCRService(OCRService):
+    """
+    Decorador de OCRService que guarda el texto extraído por el hash SHA-256
+    de los bytes de la imagen, para no llamar dos veces al OCR con la misma foto.
+    Si la misma imagen llega varias veces a la vez, solo la primera llama al OCR
+    y las demás esperan su resultado, como mucho `wait_timeout` segundos o lo que
+    quede del plazo de la petición.
+    """
+    def __init__(
+        self,
+        ocr_service: OCRService,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        db_path: Optional[str] = None,
+        wait_timeout: float = 60.0
+    ):
+        """
+        Args:
+            ocr_service: El servicio OCR real al que se delegan los fallos de cache.
+            max_entries: Número máximo de textos en memoria.
+            max_bytes: Tamaño máximo en bytes de los textos en memoria.
+            db_path: Ruta de un archivo SQLite opcional para persistir el cache.
+            wait_timeout: Segundos máximos que se espera la llamada en curso de la misma imagen.
+        """
+        self.ocr_service = ocr_service
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.disk = SQLiteCacheStore(db_path, table="ocr_cache") if db_path else None
+        self._lock = threading.Lock()
+        # clave -> future de la llamada al ocr en curso para esa imagen
+        self._in_flight: Dict[str, Future] = {}
+        self.wait_timeout = wait_timeout
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "store_errors": 0}
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Devuelve el texto del cache si la imagen ya se procesó; si no, llama
+        al servicio OCR real y guarda el resultado.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        # se leen los bytes una sola vez y se pasan al OCR real para que no vuelva a leerlos
+        content = read_image_bytes(image)
+        key, text = self.lookup(content)
+        if text is not None:
+            return text
+
+        future, leader = self.begin(key)
+        if not leader:
+            timeout, exceeded = self.wait_limit()
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise exceeded from None
+        try:
+            text = self.ocr_service.extract_text(content)
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        try:
+            self.store(key, text)
+        finally:
+            # pase lo que pase al guardar, los que esperan la misma imagen reciben el texto
+            self.finish(key, future, text)
+        return text
+
+    def wait_limit(self) -> Tuple[float, TimeoutError]:
+        """devuelve (segundos, error) para esperar la llamada en curso: el menor entre `wait_timeout` y el plazo."""
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() < self.wait_timeout:
+            return deadline.remaining(), DeadlineExceededError("se agoto el plazo esperando el ocr de la misma imagen")
+        return self.wait_timeout, TimeoutError(f"el ocr de la misma imagen no termino en {self.wait_timeout:.1f}s")
+
+    def begin(self, key: str) -> Tuple[Future, bool]:
+        """
+        Registra una llamada al OCR para la clave. Devuelve (future, lider): el
+        líder hace la llamada y la cierra con `finish`; el resto espera el future.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            # la llamada anterior pudo terminar entre lookup y begin
+            text = self.memory.get(key)
+            if text is not None:
+                future.set_result(text)
+                return future, False
+            self._in_flight[key] = future
+            return future, True
+
+    def finish(self, key: str, future: Future, text: Optional[str] = None, error: Optional[BaseException] = None):
+        """entrega el resultado (o el error) del lider a los que esperan la misma imagen."""
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is None:
+            future.set_result(text)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # una cancelacion del lider no es un error de la imagen
+            future.set_exception(RuntimeError("la llamada al ocr de la misma imagen se cancelo"))
+
+    def lookup(self, content: bytes):
+        """devuelve (clave, texto) buscando en memoria y en disco; el texto es None si no esta."""
+        key = hashlib.sha256(content).hexdigest()
+
+        text = self.memory.get(key)
+        if text is not None:
+            self._count("memory_hits")
+            return key, text
+
+        if self.disk is not None:
+            text = self.disk.get(key)
+            if text is not None:
+                self._count("disk_hits")
+                self.memory.set(key, text, size=len(text.encode("utf-8")))
+                return key, text
+
+        self._count("misses")
+        return key, None
+
+    def store(self, key: str, text: str):
+        """guarda el texto de una imagen bajo la clave que devolvio `lookup`."""
+        # los OCR devuelven "" cuando fallan, eso no se guarda
+        if not text:
+            return
+        self.memory.set(key, text, size=len(text.encode("utf-8")))
+        if self.disk is None:
+            return
+        try:
+            self.disk.set(key, text)
+        except Exception as e:
+            # un disco lleno o bloqueado no debe romper la peticion: el texto ya esta en memoria
+            self._count("store_errors")
+            print(f"⚠️ No se pudo guardar el texto en el cache de OCR en disco: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve los contadores de aciertos y fallos del cache."""
+        with self._lock:
+            return dict(self._stats, entries=len(self.memory))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+
+class AsyncCachedOCRService(AsyncOCRService):
+    """
+    Versión asíncrona del cache de OCR: usa el mismo almacenamiento que un
+    CachedOCRService, así los dos caminos comparten aciertos y estadísticas.
+    """
+    def __init__(self, ocr_service: AsyncOCRService, cache: CachedOCRService):
+        self.ocr_service = ocr_service
+        self.cache = cache
+
+    async def extract_text(self, image: ImageSource) -> str:
+        content = read_image_bytes(image)
+        key, text = self.cache.lookup(content)
+        if text is not None:
+            return text
+
+        # se comparte la llamada en curso con el camino sincrono y con otras corrutinas
+        future, leader = self.cache.begin(key)
+        if not leader:
+            timeout, exceeded = self.cache.wait_limit()
+            try:
+                # shield: cancelar esta espera no debe cancelar el future compartido
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except asyncio.TimeoutError:
+                raise exceeded from None
+        try:
+            text = await self.ocr_service.extract_text(content)
+        except BaseException as e:
+            self.cache.finish(key, future, error=e)
+            raise
+        try:
+            self.cache.store(key, text)
+        finally:
+            self.cache.finish(key, future, text)
+        return text
@@ -1,49 +1,89 @@
-import io
-from google.cloud import vision
-from google.oauth2 import service_account
-from ...application.ports.ocr_service import OCRService
+import threading
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
 
 class CloudVisionOCR(OCRService):
     """
     Implementación de OCRService que utiliza la API de Google Cloud Vision.
+    El cliente (y la librería de Cloud Vision) se cargan en la primera llamada
+    o en `warm_up`, no al construir el servicio.
     """
-    def __init__(self, credentials_path: str):
+    def __init__(self, credentials_path: str, client=None, timeout: float = None, raise_errors: bool = False):
         """
-        Inicializa el cliente de Cloud Vision.
+        Prepara el servicio de Cloud Vision sin abrir todavía el canal gRPC.
 
         Args:
             credentials_path: Ruta al archivo JSON de credenciales de la cuenta de servicio.
+            client: Cliente ImageAnnotatorClient ya construido (opcional, útil para pruebas).
+            timeout: Segundos máximos por llamada a la API (None usa el del cliente).
+            raise_errors: Si los errores se lanzan (para reintentarlos fuera) en vez de devolver "".
         """
-        # Cargar las credenciales desde el archivo
-        self.credentials = service_account.Credentials.from_service_account_file(credentials_path)
-        self.client = vision.ImageAnnotatorClient(credentials=self.credentials)
+        self.credentials_path = credentials_path
+        self.timeout = timeout
+        self.raise_errors = raise_errors
+        self.credentials = None
+        self.client = client
+        self._client_lock = threading.Lock()
 
-    def extract_text(self, image_path: str) -> str:
+    def warm_up(self):
+        """construye el cliente ahora, para que la primera peticion no pague la conexion."""
+        self._get_client()
+
+    def _get_client(self):
+        # doble comprobacion: solo el primer hilo construye el cliente, el resto lo reutiliza
+        if self.client is None:
+            with self._client_lock:
+                if self.client is None:
+                    from google.cloud import vision
+                    from google.oauth2 import service_account
+                    # Cargar las credenciales desde el archivo
+                    self.credentials = service_account.Credentials.from_service_account_file(self.credentials_path)
+                    self.client = vision.ImageAnnotatorClient(credentials=self.credentials)
+        return self.client
+
+    def extract_text(self, image: ImageSource) -> str:
         """
         Extrae texto de una imagen usando Cloud Vision.
 
         Args:
-            image_path: La ruta al archivo de imagen.
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
 
         Returns:
             El texto extraído de la imagen.
         """
         try:
-            with io.open(image_path, 'rb') as image_file:
-                content = image_file.read()
-            
-            image = vision.Image(content=content)
-            response = self.client.text_detection(image=image)
-            texts = response.text_annotations
-            
-            if texts:
-                return texts[0].description
+            from google.cloud import vision
+            content = read_image_bytes(image)
             
-            if response.error.message:
-                print(f"⚠️ Error en Cloud Vision OCR: {response.error.message}")
-            
-            return ""
+            vision_image = vision.Image(content=content)
+            response = self._get_client().text_detection(image=vision_image, **self._call_options())
+            if self.raise_errors and response.error.message:
+                raise RuntimeError(f"Cloud Vision: {response.error.message}")
+            return self._text_from_response(response)
         
         except Exception as e:
+            if self.raise_errors:
+                raise
             print(f"⚠️ Error en CloudVisionOCR: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    def _call_options(self) -> dict:
+        # solo se pasa el timeout si se configuro, para no anular el valor por defecto del cliente
+        return {"timeout": self.timeout} if self.timeout else {}
+
+    def _text_from_response(self, response) -> str:
+        return text_from_response(response)
+
+
+def text_from_response(response) -> str:
+    """
+    Obtiene el texto completo de una respuesta de anotación de Cloud Vision.
+    """
+    texts = response.text_annotations
+    
+    if texts:
+        return texts[0].description
+    
+    if response.error.message:
+        print(f"⚠️ Error en Cloud Vision OCR: {response.error.message}")
+    
+    return ""
\ No newline at end of file
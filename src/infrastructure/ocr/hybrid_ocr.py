@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from .tesseract_ocr import TesseractOCR
+
+# importes tipo 1,25 o 12.50 y fechas tipo 01/09/2025
+PRICE_PATTERN = re.compile(r"\b\d+[.,]\d{2}\b")
+DATE_PATTERN = re.compile(r"\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b")
+
+class HybridOCRService(OCRService):
+    """
+    Implementación de OCRService que prueba primero Tesseract en local y solo
+    recurre a un OCR remoto (Cloud Vision) cuando el resultado local no es fiable:
+    confianza media baja, pocos importes o ninguna fecha reconocida.
+    """
+    def __init__(
+        self,
+        local_ocr: TesseractOCR,
+        remote_ocr: OCRService,
+        min_confidence: float = 70.0,
+        min_price_tokens: int = 2,
+        require_date: bool = True,
+        history_size: int = 500
+    ):
+        """
+        Args:
+            local_ocr: Motor Tesseract local (debe ofrecer `extract_text_with_confidence`).
+            remote_ocr: Motor al que se escala cuando el resultado local no alcanza los umbrales.
+            min_confidence: Confianza media mínima por palabra (0 a 100).
+            min_price_tokens: Número mínimo de importes detectados.
+            require_date: Si se exige que aparezca al menos una fecha.
+            history_size: Número de decisiones recientes que se conservan para ajustar los umbrales.
+        """
+        self.local_ocr = local_ocr
+        self.remote_ocr = remote_ocr
+        self.min_confidence = min_confidence
+        self.min_price_tokens = min_price_tokens
+        self.require_date = require_date
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._stats = {
+            "local": {"requests": 0, "seconds": 0.0},
+            "remote": {"requests": 0, "seconds": 0.0}
+        }
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Extrae texto con Tesseract y escala a Cloud Vision si hace falta.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        # los bytes se leen una vez porque la imagen puede necesitar dos motores
+        content = read_image_bytes(image)
+
+        start = time.perf_counter()
+        text, confidence = self.local_ocr.extract_text_with_confidence(content)
+        local_seconds = time.perf_counter() - start
+
+        prices = len(PRICE_PATTERN.findall(text))
+        has_date = DATE_PATTERN.search(text) is not None
+        accepted = (
+            confidence >= self.min_confidence
+            and prices >= self.min_price_tokens
+            and (has_date or not self.require_date)
+        )
+
+        # la etiqueta dice que motor produjo el texto que se devuelve, no cual se intento
+        engine = "local"
+        remote_seconds = None
+        if not accepted:
+            start = time.perf_counter()
+            try:
+                remote_text = self.remote_ocr.extract_text(content)
+            except TimeoutError:
+                # el plazo de la peticion se agoto: seguir con el texto local solo llevaria a gemini sin tiempo
+                raise
+            except Exception as e:
+                # si el motor remoto falla se usa el texto local, aunque sea menos fiable
+                print(f"⚠️ OCR remoto no disponible, se usa Tesseract: {e}")
+                remote_text = None
+            remote_seconds = time.perf_counter() - start
+            if remote_text and remote_text.strip():
+                text = remote_text
+                engine = "remote"
+            elif remote_text is not None:
+                # un resultado remoto vacio no sustituye al texto local
+                print("⚠️ OCR remoto sin texto, se usa Tesseract")
+
+        self._record({
+            "engine": engine,
+            "escalated": not accepted,
+            "confidence": round(confidence, 1),
+            "price_tokens": prices,
+            "has_date": has_date,
+            "local_ms": round(local_seconds * 1000, 1),
+            "remote_ms": round(remote_seconds * 1000, 1) if remote_seconds is not None else None
+        }, local_seconds + (remote_seconds or 0.0))
+        print(f"🔹 OCR servido por {engine} (confianza {confidence:.1f}, importes {prices}, fecha {has_date})")
+        return text
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """devuelve cuantas peticiones sirvio cada motor y su latencia media en milisegundos."""
+        with self._lock:
+            return {
+                engine: {
+                    "requests": values["requests"],
+                    "mean_ms": round(1000 * values["seconds"] / values["requests"], 1) if values["requests"] else 0.0
+                }
+                for engine, values in self._stats.items()
+            }
+
+    def recent_decisions(self) -> List[Dict]:
+        """devuelve las decisiones recientes (motor que sirvio el texto, si se escalo, confianza, tokens y latencias)."""
+        with self._lock:
+            return list(self._history)
+
+    def _record(self, decision: Dict, total_seconds: float):
+        with self._lock:
+            self._history.append(decision)
+            engine_stats = self._stats[decision["engine"]]
+            engine_stats["requests"] += 1
+            engine_stats["seconds"] += total_seconds
@@ -0,0 +1,138 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+from ...application.ports.ocr_service import ImageSource, read_image_bytes
+from .tesseract_ocr import TesseractOCR, text_and_confidence_from_data
+
+def _available_cores() -> int:
+    # en linux se respetan los nucleos asignados al proceso (contenedores, taskset)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _init_worker():
+    # cada proceso ya ocupa un nucleo; se evita que tesseract abra hilos propios y compita por cpu
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def _warm_worker() -> int:
+    # carga pytesseract y pillow en el proceso para que el primer recibo no pague el import
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+    return os.getpid()
+
+def _ocr_worker(content: bytes, language: str, config: str) -> str:
+    # se ejecuta dentro de un proceso del pool, por eso recibe bytes y no objetos PIL
+    try:
+        import pytesseract
+        from PIL import Image
+        image = Image.open(io.BytesIO(content))
+        return pytesseract.image_to_string(image, lang=language, config=config)
+    except Exception as e:
+        print(f"⚠️ Error en ParallelTesseractOCR: {e}")
+        return ""
+
+def _ocr_data_worker(content: bytes, language: str, config: str) -> Tuple[str, float]:
+    try:
+        import pytesseract
+        from PIL import Image
+        image = Image.open(io.BytesIO(content))
+        data = pytesseract.image_to_data(image, lang=language, config=config, output_type=pytesseract.Output.DICT)
+        return text_and_confidence_from_data(data)
+    except Exception as e:
+        print(f"⚠️ Error en ParallelTesseractOCR: {e}")
+        return "", 0.0
+
+class ParallelTesseractOCR(TesseractOCR):
+    """
+    Variante de TesseractOCR que ejecuta el OCR en un pool persistente de procesos,
+    uno por núcleo disponible, y permite procesar lotes de imágenes.
+    """
+    def __init__(self, tessdata_path: str, language: str = 'spa', max_workers: int = None):
+        """
+        Inicializa la configuración de Tesseract y el pool de procesos.
+
+        Args:
+            tessdata_path: Ruta al directorio que contiene la carpeta 'tessdata'.
+            language: Código del idioma a usar (por defecto 'spa' para español).
+            max_workers: Número de procesos (por defecto, los núcleos disponibles).
+        """
+        super().__init__(tessdata_path, language)
+        self.max_workers = max_workers or _available_cores()
+        # la aplicacion ya tiene hilos en marcha (trabajos, buffer de sheets, refresco de tokens):
+        # un fork copiaria locks tomados por ellos, asi que los procesos salen de un forkserver limpio
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            mp_context=multiprocessing.get_context(start_method)
+        )
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Extrae texto de una imagen en un proceso del pool.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        try:
+            content = read_image_bytes(image)
+            return self.executor.submit(_ocr_worker, content, self.language, self.tesseract_config).result()
+        except Exception as e:
+            print(f"⚠️ Error en ParallelTesseractOCR: {e}")
+            return ""
+
+    def extract_text_with_confidence(self, image: ImageSource) -> Tuple[str, float]:
+        """
+        Extrae texto y confianza media por palabra en un proceso del pool.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            Una tupla (texto, confianza media de 0 a 100).
+        """
+        try:
+            content = read_image_bytes(image)
+            return self.executor.submit(_ocr_data_worker, content, self.language, self.tesseract_config).result()
+        except Exception as e:
+            print(f"⚠️ Error en ParallelTesseractOCR: {e}")
+            return "", 0.0
+
+    def extract_texts(self, images: List[ImageSource]) -> List[str]:
+        """
+        Extrae el texto de varias imágenes repartiéndolas entre todos los procesos.
+
+        Args:
+            images: Lista de rutas, bytes o streams de imagen.
+
+        Returns:
+            Los textos extraídos, en el mismo orden que las imágenes.
+        """
+        contents = [read_image_bytes(image) for image in images]
+        futures = [
+            self.executor.submit(_ocr_worker, content, self.language, self.tesseract_config)
+            for content in contents
+        ]
+        texts = []
+        for future in futures:
+            try:
+                texts.append(future.result())
+            except Exception as e:
+                print(f"⚠️ Error en ParallelTesseractOCR: {e}")
+                texts.append("")
+        return texts
+
+    def warm_up(self):
+        """arranca los procesos del pool y carga en ellos las librerias de ocr."""
+        futures = [self.executor.submit(_warm_worker) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        """detiene el pool de procesos."""
+        self.executor.shutdown(wait=True)
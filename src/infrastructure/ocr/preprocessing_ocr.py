@@ -0,0 +1,114 @@
+import asyncio
+import io
+import threading
+import time
+from typing import Dict
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from ...application.ports.async_ocr_service import AsyncOCRService
+
+class ImagePreprocessor:
+    """
+    Prepara la foto de un recibo para el OCR: corrige la rotación EXIF, reduce
+    la resolución, pasa a escala de grises, normaliza el contraste y la recodifica.
+    """
+    def __init__(self, max_long_edge: int = 2000, grayscale: bool = True, autocontrast: bool = True, jpeg_quality: int = 85):
+        """
+        Args:
+            max_long_edge: Longitud máxima en píxeles del lado más largo (0 para no reducir).
+            grayscale: Si se convierte la imagen a escala de grises.
+            autocontrast: Si se normaliza el contraste.
+            jpeg_quality: Calidad JPEG de la imagen recodificada.
+        """
+        self.max_long_edge = max_long_edge
+        self.grayscale = grayscale
+        self.autocontrast = autocontrast
+        self.jpeg_quality = jpeg_quality
+
+    def process(self, content: bytes) -> bytes:
+        """
+        Devuelve la imagen procesada como JPEG. Si el resultado ocupa más que el
+        original, se devuelve el original sin cambios.
+        """
+        # pillow se carga en el primer uso, no al importar la aplicacion
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(content)) as image:
+            # los telefonos guardan la orientacion en exif en vez de rotar los pixeles
+            image = ImageOps.exif_transpose(image)
+
+            if self.max_long_edge and max(image.size) > self.max_long_edge:
+                image.thumbnail((self.max_long_edge, self.max_long_edge), Image.LANCZOS)
+
+            image = image.convert("L") if self.grayscale else image.convert("RGB")
+
+            if self.autocontrast:
+                # se recorta el 1% de los extremos para ignorar sombras y brillos
+                image = ImageOps.autocontrast(image, cutoff=1)
+
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=self.jpeg_quality, optimize=True)
+
+        processed = output.getvalue()
+        return processed if len(processed) < len(content) else content
+
+
+class PreprocessingOCRService(OCRService):
+    """
+    Decorador de OCRService que preprocesa la imagen antes de pasarla al OCR real
+    y registra los bytes ahorrados y el tiempo empleado.
+    """
+    def __init__(self, ocr_service: OCRService, preprocessor: ImagePreprocessor = None):
+        self.ocr_service = ocr_service
+        self.preprocessor = preprocessor or ImagePreprocessor()
+        self._lock = threading.Lock()
+        self._stats = {"images": 0, "failures": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Preprocesa la imagen y extrae su texto con el servicio OCR real.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        return self.ocr_service.extract_text(self.preprocess(read_image_bytes(image)))
+
+    def preprocess(self, content: bytes) -> bytes:
+        """devuelve la imagen preprocesada, o la original si no se puede procesar."""
+        start = time.perf_counter()
+        try:
+            processed = self.preprocessor.process(content)
+        except Exception as e:
+            # si la imagen no se puede procesar se envia tal cual
+            print(f"⚠️ Error en el preprocesamiento de imagen: {e}")
+            with self._lock:
+                self._stats["failures"] += 1
+            return content
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["images"] += 1
+            self._stats["bytes_in"] += len(content)
+            self._stats["bytes_out"] += len(processed)
+            self._stats["seconds"] += elapsed
+        return processed
+
+    def stats(self) -> Dict[str, float]:
+        """devuelve los bytes de entrada/salida, los bytes ahorrados y el tiempo total de preprocesamiento."""
+        with self._lock:
+            return dict(self._stats, bytes_saved=self._stats["bytes_in"] - self._stats["bytes_out"])
+
+
+class AsyncPreprocessingOCRService(AsyncOCRService):
+    """
+    Versión asíncrona del preprocesamiento: la imagen se procesa en un hilo para no
+    bloquear el bucle de eventos y las estadísticas se suman al PreprocessingOCRService.
+    """
+    def __init__(self, ocr_service: AsyncOCRService, preprocessing: PreprocessingOCRService):
+        self.ocr_service = ocr_service
+        self.preprocessing = preprocessing
+
+    async def extract_text(self, image: ImageSource) -> str:
+        processed = await asyncio.to_thread(self.preprocessing.preprocess, read_image_bytes(image))
+        return await self.ocr_service.extract_text(processed)
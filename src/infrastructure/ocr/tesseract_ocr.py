@@ -1,6 +1,24 @@
-from ...application.ports.ocr_service import OCRService
-import pytesseract
-from PIL import Image
+import io
+from typing import Dict, Tuple
+from ...application.ports.ocr_service import OCRService, ImageSource
+
+def text_and_confidence_from_data(data: Dict) -> Tuple[str, float]:
+    """
+    Reconstruye el texto por líneas a partir de la salida de `image_to_data`
+    y calcula la confianza media de las palabras reconocidas (0 a 100).
+    """
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if not word.strip() or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean_conf = sum(confidences) / len(confidences) if confidences else 0.0
+    return text, mean_conf
 
 class TesseractOCR(OCRService):
     """
@@ -14,26 +32,56 @@ class TesseractOCR(OCRService):
             tessdata_path: Ruta al directorio que contiene la carpeta 'tessdata'.
             language: Código del idioma a usar (por defecto 'spa' para español).
         """
+        # pytesseract y pillow solo se cargan si se usa el motor local
+        import pytesseract
         self.tesseract = pytesseract
         self.tesseract.tesseract_cmd = 'tesseract'  # Asegúrate de que Tesseract esté en el PATH
         self.tesseract_config = f'--tessdata-dir "{tessdata_path}"'
         self.language = language
 
-    def extract_text(self, image_path: str) -> str:
+    def extract_text(self, image: ImageSource) -> str:
         """
         Extrae texto de una imagen usando Tesseract.
 
         Args:
-            image_path: La ruta al archivo de imagen.
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
 
         Returns:
             El texto extraído de la imagen.
         """
         try:
-            image = Image.open(image_path)
+            from PIL import Image
+            # PIL abre rutas y streams; los bytes se envuelven sin escribir a disco
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                image = io.BytesIO(image)
+            pil_image = Image.open(image)
             # Usa el método `image_to_string` para procesar la imagen
-            text = self.tesseract.image_to_string(image, lang=self.language, config=self.tesseract_config)
+            text = self.tesseract.image_to_string(pil_image, lang=self.language, config=self.tesseract_config)
             return text
         except Exception as e:
             print(f"⚠️ Error en TesseractOCR: {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    def extract_text_with_confidence(self, image: ImageSource) -> Tuple[str, float]:
+        """
+        Extrae texto de una imagen junto con la confianza media por palabra.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            Una tupla (texto, confianza media de 0 a 100).
+        """
+        try:
+            from PIL import Image
+            if isinstance(image, (bytes, bytearray, memoryview)):
+                image = io.BytesIO(image)
+            pil_image = Image.open(image)
+            data = self.tesseract.image_to_data(
+                pil_image, lang=self.language, config=self.tesseract_config,
+                output_type=self.tesseract.Output.DICT
+            )
+            return text_and_confidence_from_data(data)
+        except Exception as e:
+            print(f"⚠️ Error en TesseractOCR: {e}")
+            return "", 0.0
\ No newline at end of file
@@ -0,0 +1,193 @@
+import contextvars
+import difflib
+import io
+import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+
+# orientaciones exif que giran la imagen 90 grados (el ancho y el alto se intercambian)
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+WHITESPACE = re.compile(r"\s+")
+
+class ImageTiler:
+    """
+    Parte las fotos muy altas (tickets largos de supermercado) en franjas horizontales
+    que se solapan `overlap` píxeles, para que cada línea quede entera en alguna franja.
+    Las imágenes que no son altas se devuelven sin tocar y sin decodificar.
+    """
+    def __init__(
+        self,
+        tile_height: int = 1600,
+        overlap: int = 200,
+        min_height: int = 3000,
+        min_aspect: float = 2.0,
+        max_tiles: int = 12,
+        jpeg_quality: int = 90
+    ):
+        """
+        Args:
+            tile_height: Alto aproximado de cada franja en píxeles.
+            overlap: Píxeles que comparten dos franjas seguidas (más que el alto de dos líneas).
+            min_height: Alto mínimo para partir la imagen.
+            min_aspect: Proporción alto/ancho mínima para partir la imagen.
+            max_tiles: Número máximo de franjas; si hacen falta más, se agrandan.
+            jpeg_quality: Calidad JPEG de cada franja.
+        """
+        self.tile_height = tile_height
+        self.overlap = overlap
+        self.min_height = min_height
+        self.min_aspect = min_aspect
+        self.max_tiles = max_tiles
+        self.jpeg_quality = jpeg_quality
+
+    def bounds(self, height: int) -> List[Tuple[int, int]]:
+        """devuelve (arriba, abajo) de cada franja para una imagen de `height` pixeles."""
+        step = self.tile_height - self.overlap
+        count = min(self.max_tiles, max(1, math.ceil((height - self.overlap) / step)))
+        # las franjas se reparten por igual para que la ultima no quede diminuta
+        step = (height - self.overlap) / count
+        return [(round(i * step), min(height, round((i + 1) * step + self.overlap))) for i in range(count)]
+
+    def split(self, content: bytes) -> List[bytes]:
+        """devuelve las franjas de la imagen como jpeg, o [content] si no hace falta partirla."""
+        # pillow se carga en el primer uso, no al importar la aplicacion
+        from PIL import Image, ImageOps
+        with Image.open(io.BytesIO(content)) as image:
+            # el tamano y la orientacion se leen de la cabecera, sin decodificar los pixeles
+            width, height = image.size
+            if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+            if height < self.min_height or height < width * self.min_aspect:
+                return [content]
+
+            # las franjas no llevan exif, asi que la rotacion se aplica antes de cortar
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            tiles = []
+            for top, bottom in self.bounds(height):
+                output = io.BytesIO()
+                image.crop((0, top, width, bottom)).save(output, format="JPEG", quality=self.jpeg_quality)
+                tiles.append(output.getvalue())
+        return tiles
+
+
+class TiledOCRService(OCRService):
+    """
+    Decorador de OCRService para tickets largos: parte las imágenes altas con ImageTiler,
+    pasa las franjas en paralelo por el OCR real y une los textos quitando las líneas
+    repetidas en los solapes. Las imágenes normales van directas al OCR real.
+    """
+    def __init__(self, ocr_service: OCRService, tiler: ImageTiler = None, max_workers: int = 4):
+        """
+        Args:
+            ocr_service: OCR real al que se envía cada franja (cualquier OCRService).
+            tiler: Configuración del corte (por defecto ImageTiler()).
+            max_workers: Franjas de una misma imagen que se procesan a la vez.
+        """
+        self.ocr_service = ocr_service
+        self.tiler = tiler or ImageTiler()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-tile")
+        self._lock = threading.Lock()
+        self._stats = {"images": 0, "tiled": 0, "tiles": 0, "failures": 0}
+
+    def extract_text(self, image: ImageSource) -> str:
+        """
+        Extrae el texto de la imagen, por franjas en paralelo si es un ticket largo.
+
+        Args:
+            image: La ruta al archivo de imagen, sus bytes o un stream binario.
+
+        Returns:
+            El texto extraído de la imagen.
+        """
+        content = read_image_bytes(image)
+        try:
+            tiles = self.tiler.split(content)
+        except Exception as e:
+            # si la imagen no se puede partir se envia entera
+            print(f"⚠️ Error al partir la imagen en franjas: {e}")
+            tiles = [content]
+            with self._lock:
+                self._stats["failures"] += 1
+
+        with self._lock:
+            self._stats["images"] += 1
+            if len(tiles) > 1:
+                self._stats["tiled"] += 1
+                self._stats["tiles"] += len(tiles)
+        if len(tiles) == 1:
+            return self.ocr_service.extract_text(tiles[0])
+
+        # cada franja lleva su copia del contexto, asi respeta el plazo de la peticion
+        futures = [
+            self.executor.submit(contextvars.copy_context().run, self.ocr_service.extract_text, tile)
+            for tile in tiles
+        ]
+        return stitch_tiles([future.result() for future in futures])
+
+    def stats(self) -> Dict[str, int]:
+        """devuelve las imagenes recibidas, las partidas, el total de franjas y los fallos al partir."""
+        with self._lock:
+            return dict(self._stats)
+
+
+def stitch_tiles(texts: List[str], max_cut_lines: int = 2, min_overlap_chars: int = 6) -> str:
+    """
+    Une los textos de franjas consecutivas. En cada unión se busca la racha más larga
+    de líneas que aparece al final de una franja y al principio de la siguiente (el
+    solape); se conserva una sola copia y se descartan hasta `max_cut_lines` líneas
+    a cada lado, que suelen ser líneas cortadas por el borde de la franja.
+
+    Args:
+        texts: Texto de cada franja, de arriba abajo.
+        max_cut_lines: Líneas que se pueden descartar en cada borde del solape.
+        min_overlap_chars: Caracteres mínimos de la racha para darla por solape.
+
+    Returns:
+        El texto completo de la imagen.
+    """
+    merged: List[str] = []
+    for text in texts:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not merged:
+            merged = lines
+            continue
+        end, start = _find_overlap(merged, lines, max_cut_lines, min_overlap_chars)
+        merged = merged[:end] + lines[start:]
+    return "\n".join(merged)
+
+
+def _find_overlap(previous: List[str], following: List[str], max_cut_lines: int, min_chars: int) -> Tuple[int, int]:
+    # devuelve (lineas de previous que se conservan, primera linea de following que se anade)
+    best_chars, best = 0, (len(previous), 0)
+    previous_keys = [_line_key(line) for line in previous]
+    following_keys = [_line_key(line) for line in following]
+    for j in range(min(max_cut_lines + 1, len(following_keys))):
+        # solo el final de la franja anterior puede solapar con esta
+        for i in range(max(0, len(previous_keys) - len(following_keys) - max_cut_lines), len(previous_keys)):
+            run, chars = 0, 0
+            while (i + run < len(previous_keys) and j + run < len(following_keys)
+                   and _same_line(previous_keys[i + run], following_keys[j + run])):
+                chars += len(following_keys[j + run])
+                run += 1
+            # la racha tiene que llegar hasta el final de la franja anterior (salvo lineas cortadas)
+            if run and len(previous_keys) - (i + run) <= max_cut_lines and chars > best_chars:
+                best_chars, best = chars, (i + run, j + run)
+    return best if best_chars >= min_chars else (len(previous), 0)
+
+
+def _line_key(line: str) -> str:
+    return WHITESPACE.sub(" ", line).strip().casefold()
+
+
+def _same_line(a: str, b: str) -> bool:
+    # la misma linea leida en dos franjas puede diferir en algun caracter
+    if a == b:
+        return True
+    if min(len(a), len(b)) < 4:
+        return False
+    return difflib.SequenceMatcher(None, a, b).ratio() >= 0.85
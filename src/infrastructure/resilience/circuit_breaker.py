@@ -0,0 +1,74 @@
+# circuit_breaker.py corta las llamadas a un backend que esta fallando y lo vuelve a probar pasado un tiempo
+
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """se lanza sin llamar al backend mientras el circuito esta abierto."""
+
+
+class CircuitBreaker:
+    """
+    Circuito por backend con tres estados:
+    - closed: las llamadas pasan; tras `failure_threshold` fallos seguidos se abre.
+    - open: las llamadas fallan al momento durante `reset_seconds`.
+    - half_open: pasa una sola llamada de prueba; si sale bien se cierra, si falla se vuelve a abrir.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def before_call(self):
+        """comprueba si la llamada puede pasar; si no, lanza CircuitOpenError."""
+        with self._lock:
+            self._refresh()
+            if self._state == "closed":
+                return
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        raise CircuitOpenError(f"circuito de {self.name} abierto")
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_neutral(self):
+        """anota una llamada que fallo por la peticion y no por el backend: no cuenta como fallo ni como exito."""
+        with self._lock:
+            # si era la llamada de prueba, la siguiente vuelve a probar
+            self._probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """anota un fallo y devuelve true si con el el circuito se abre."""
+        with self._lock:
+            self._failures += 1
+            reopened = self._state == "half_open"
+            if reopened or self._failures >= self.failure_threshold:
+                opening = self._state != "open"
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                return opening
+            return False
+
+    def _refresh(self):
+        # pasado el tiempo de espera se deja pasar una llamada de prueba
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = "half_open"
+            self._probe_in_flight = False
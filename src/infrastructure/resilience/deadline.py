@@ -0,0 +1,53 @@
+# deadline.py guarda el plazo total de la peticion en curso para repartirlo entre las etapas
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class DeadlineExceededError(TimeoutError):
+    """se lanza cuando a la peticion ya no le queda tiempo para una etapa."""
+
+
+class Deadline:
+    """
+    Instante limite de una peticion, en reloj monotono. Cada etapa pide una parte
+    del tiempo que queda, asi una etapa rapida deja mas margen a las siguientes.
+    """
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """segundos que quedan (0 si ya vencio)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, share: float) -> float:
+        """segundos asignados a una etapa que se lleva `share` (0 a 1) de lo que queda."""
+        return self.remaining() * share
+
+
+# plazo de la peticion que se procesa en el hilo actual
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """devuelve el plazo activo en este hilo o none si no hay."""
+    return _current.get()
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]):
+    """activa `deadline` mientras dura el bloque; con none no hace nada."""
+    if deadline is None:
+        yield None
+        return
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
@@ -0,0 +1,284 @@
+# resilient_caller.py ejecuta llamadas a un backend externo con plazo, reintentos, circuito y peticiones de cobertura
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Optional
+from ...application.ports.metrics_recorder import MetricsRecorder
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .deadline import DeadlineExceededError, current_deadline
+
+# codigos http que indican un fallo pasajero (google.api_core los expone en `code`)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """decide si merece la pena repetir una llamada que fallo con `error`."""
+    if isinstance(error, (CircuitOpenError, DeadlineExceededError)):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+class ResilientCaller:
+    """
+    Envuelve las llamadas a un backend:
+    - cada intento tiene un tiempo maximo, recortado por la parte del plazo de la peticion
+      que le toca a la etapa (`stage_share` de lo que queda);
+    - los fallos pasajeros se reintentan hasta `max_retries` veces con espera exponencial y jitter;
+    - un CircuitBreaker corta las llamadas mientras el backend esta caido;
+    - opcionalmente, si un intento tarda mas que el p95 reciente, se lanza un duplicado
+      y se usa la primera respuesta correcta.
+    Los intentos corren en un pool propio; un intento que vence se abandona (no se puede
+    interrumpir) y se cuenta como `abandoned`, por eso conviene que el backend tenga
+    tambien su propio timeout.
+    """
+    def __init__(
+        self,
+        name: str,
+        attempt_timeout: Optional[float] = 30.0,
+        stage_share: float = 1.0,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.2,
+        max_backoff_seconds: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = False,
+        hedge_min_delay: float = 0.2,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        retryable: Callable[[Exception], bool] = is_retryable,
+        metrics: Optional[MetricsRecorder] = None,
+        max_workers: int = 32
+    ):
+        """
+        Args:
+            name: Nombre del backend en los mensajes y en las metricas.
+            attempt_timeout: Segundos maximos por intento (None sin limite propio).
+            stage_share: Parte del plazo restante de la peticion que puede gastar esta etapa.
+            max_retries: Reintentos como maximo despues del primer intento.
+            backoff_seconds: Espera base antes del primer reintento; se duplica en cada uno.
+            max_backoff_seconds: Espera maxima entre reintentos.
+            breaker: Circuito del backend (por defecto uno nuevo con 5 fallos y 30 s).
+            hedge: Si se lanzan peticiones duplicadas cuando un intento va lento.
+            hedge_min_delay: Espera minima antes de lanzar el duplicado.
+            hedge_quantile: Cuantil de las latencias recientes tras el que se lanza el duplicado.
+            hedge_min_samples: Latencias necesarias antes de empezar a duplicar.
+            retryable: Funcion que decide si un error se reintenta.
+            metrics: Registro opcional de reintentos, duplicados, timeouts y aperturas del circuito.
+            max_workers: Hilos del pool donde corren los intentos.
+        """
+        self.name = name
+        self.attempt_timeout = attempt_timeout
+        self.stage_share = stage_share
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+        self._latencies = deque(maxlen=512)
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable[..., Any], *args) -> Any:
+        """ejecuta `fn(*args)` aplicando plazo, reintentos, circuito y duplicados."""
+        stage_end = self._stage_end()
+        attempt = 0
+        while True:
+            timeout = self._before_attempt(stage_end)
+            try:
+                result = self._attempt(fn, args, timeout)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, stage_end)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Igual que `call` para una corrutina `fn(*args)`: los intentos son tareas del bucle
+        de eventos y, al contrario que en `call`, el intento perdedor o vencido se cancela.
+        """
+        stage_end = self._stage_end()
+        attempt = 0
+        while True:
+            timeout = self._before_attempt(stage_end)
+            try:
+                result = await self._attempt_async(fn, args, timeout)
+            except Exception as e:
+                delay = self._after_failure(e, attempt, stage_end)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def hedge_delay(self) -> Optional[float]:
+        """segundos tras los que se lanza el duplicado, o none si aun no hay latencias suficientes."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))
+        return max(self.hedge_min_delay, ordered[index])
+
+    # lo que sigue es comun a call y call_async; solo cambian la espera y la forma de lanzar el intento
+
+    def _stage_end(self) -> Optional[float]:
+        # instante en que se acaba la parte del plazo de la peticion que le toca a esta etapa
+        deadline = current_deadline()
+        return time.monotonic() + deadline.budget(self.stage_share) if deadline is not None else None
+
+    def _before_attempt(self, stage_end: Optional[float]) -> Optional[float]:
+        # comprueba el circuito y el plazo y devuelve el tiempo maximo del intento
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+        timeout = self.attempt_timeout
+        if stage_end is not None:
+            remaining = stage_end - time.monotonic()
+            if remaining <= 0:
+                self._count("deadline_exceeded")
+                raise DeadlineExceededError(f"sin tiempo para llamar a {self.name}")
+            timeout = min(timeout, remaining) if timeout else remaining
+        return timeout
+
+    def _after_failure(self, error: Exception, attempt: int, stage_end: Optional[float]) -> Optional[float]:
+        # registra el fallo en el circuito y devuelve la espera antes del reintento, o none si no se reintenta
+        retryable = self.retryable(error)
+        if not retryable:
+            # un error de la propia peticion (400, imagen invalida) no dice que el backend este caido
+            self.breaker.record_neutral()
+        elif self.breaker.record_failure():
+            self._count("circuit_opened")
+            print(f"⚠️ Circuito de {self.name} abierto tras fallos seguidos")
+        if attempt >= self.max_retries or not retryable:
+            return None
+        delay = self._backoff(attempt)
+        if stage_end is not None and time.monotonic() + delay >= stage_end:
+            return None
+        self._count("retry")
+        print(f"⚠️ Error en {self.name} ({error}); reintento {attempt + 1} en {delay:.2f}s")
+        return delay
+
+    def _wait_timeout(self, start: float, timeout: Optional[float], hedge_at: Optional[float]) -> Optional[float]:
+        # cuanto se espera a los intentos en curso: hasta que venza el intento o toque lanzar el duplicado
+        waits = []
+        if timeout is not None:
+            waits.append(start + timeout - time.monotonic())
+        if hedge_at is not None:
+            waits.append(start + hedge_at - time.monotonic())
+        return max(0.0, min(waits)) if waits else None
+
+    def _on_idle(self, start: float, timeout: Optional[float], hedge_at: Optional[float]) -> bool:
+        # la espera termino sin respuesta: lanza TimeoutError si vencio el intento; si no, toca el duplicado
+        if timeout is not None and time.monotonic() - start >= timeout:
+            self._count("timeout")
+            raise TimeoutError(f"{self.name} no respondio en {timeout:.1f}s")
+        if hedge_at is None:
+            return False
+        # el intento va mas lento que el p95 reciente: se lanza un duplicado
+        self._count("hedge")
+        return True
+
+    def _attempt(self, fn, args, timeout: Optional[float]):
+        start = time.monotonic()
+        pending = {self._executor.submit(self._timed, fn, args)}
+        hedge_at = self.hedge_delay()
+        error = None
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=self._wait_timeout(start, timeout, hedge_at), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+
+                if not done:
+                    if self._on_idle(start, timeout, hedge_at):
+                        hedge_at = None
+                        pending.add(self._executor.submit(self._timed, fn, args))
+                elif not pending:
+                    break
+
+            raise error
+        finally:
+            # un hilo no se puede interrumpir: el intento vencido o el duplicado perdedor sigue
+            # ocupando el pool hasta que vuelva, y se cuenta para poder vigilarlo
+            for future in pending:
+                if not future.cancel():
+                    self._count("abandoned")
+
+    async def _attempt_async(self, fn, args, timeout: Optional[float]):
+        start = time.monotonic()
+        pending = {asyncio.ensure_future(self._timed_async(fn, args))}
+        hedge_at = self.hedge_delay()
+        error = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=self._wait_timeout(start, timeout, hedge_at), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if not done:
+                    if self._on_idle(start, timeout, hedge_at):
+                        hedge_at = None
+                        pending.add(asyncio.ensure_future(self._timed_async(fn, args)))
+                elif not pending:
+                    break
+
+            raise error
+        finally:
+            # en asyncio si se puede cancelar el duplicado perdedor o el intento vencido
+            for task in pending:
+                task.cancel()
+
+    async def _timed_async(self, fn, args):
+        start = time.monotonic()
+        result = await fn(*args)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _timed(self, fn, args):
+        start = time.monotonic()
+        result = fn(*args)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _backoff(self, attempt: int) -> float:
+        # jitter completo: un valor aleatorio entre 0 y la espera exponencial
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt)))
+
+    def _count(self, event: str):
+        if self.metrics is not None:
+            self.metrics.increment("external_call_events_total", backend=self.name, event=event)
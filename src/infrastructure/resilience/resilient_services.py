@@ -0,0 +1,63 @@
+# resilient_services.py contiene decoradores de los puertos que pasan cada llamada por un ResilientCaller
+
+from typing import Dict, Any
+from ...application.ports.ocr_service import OCRService, ImageSource, read_image_bytes
+from ...application.ports.gemini_interface import GeminiInterface
+from ...application.ports.async_ocr_service import AsyncOCRService
+from ...application.ports.async_gemini_interface import AsyncGeminiInterface
+from .resilient_caller import ResilientCaller
+
+
+class ResilientOCRService(OCRService):
+    """
+    Decorador de OCRService con plazo, reintentos, circuito y duplicados.
+    El servicio envuelto debe lanzar sus errores en vez de devolver "".
+    """
+    def __init__(self, ocr_service: OCRService, caller: ResilientCaller):
+        self.ocr_service = ocr_service
+        self.caller = caller
+
+    def extract_text(self, image: ImageSource) -> str:
+        # los bytes se leen una vez porque la imagen puede enviarse varias veces
+        content = read_image_bytes(image)
+        return self.caller.call(self.ocr_service.extract_text, content)
+
+
+class ResilientGeminiService(GeminiInterface):
+    """
+    Decorador de GeminiInterface con plazo, reintentos, circuito y duplicados.
+    El servicio envuelto debe lanzar sus errores en vez de devolver el diccionario de respaldo.
+    """
+    def __init__(self, gemini_service: GeminiInterface, caller: ResilientCaller):
+        self.gemini_service = gemini_service
+        self.caller = caller
+
+    def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        return self.caller.call(self.gemini_service.process_text_from_receipt, receipt_text)
+
+
+class AsyncResilientOCRService(AsyncOCRService):
+    """
+    Versión asíncrona de ResilientOCRService. Puede compartir el ResilientCaller
+    del camino síncrono para que los dos usen el mismo circuito y las mismas latencias.
+    """
+    def __init__(self, ocr_service: AsyncOCRService, caller: ResilientCaller):
+        self.ocr_service = ocr_service
+        self.caller = caller
+
+    async def extract_text(self, image: ImageSource) -> str:
+        content = read_image_bytes(image)
+        return await self.caller.call_async(self.ocr_service.extract_text, content)
+
+
+class AsyncResilientGeminiService(AsyncGeminiInterface):
+    """
+    Versión asíncrona de ResilientGeminiService. Puede compartir el ResilientCaller
+    del camino síncrono para que los dos usen el mismo circuito y las mismas latencias.
+    """
+    def __init__(self, gemini_service: AsyncGeminiInterface, caller: ResilientCaller):
+        self.gemini_service = gemini_service
+        self.caller = caller
+
+    async def process_text_from_receipt(self, receipt_text: str) -> Dict[str, Any]:
+        return await self.caller.call_async(self.gemini_service.process_text_from_receipt, receipt_text)
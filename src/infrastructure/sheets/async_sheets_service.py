@@ -0,0 +1,33 @@
+# src/infrastructure/sheets/async_sheets_service.py
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from ...application.ports.async_sheets_service import AsyncSheetsService
+from ...application.usecases.receipt_processing_result import ReceiptProcessingResult
+
+
+class ThreadedAsyncSheetsService(AsyncSheetsService):
+    """
+    Implementación de AsyncSheetsService sobre el servicio síncrono de Sheets.
+    googleapiclient no tiene cliente asíncrono, así que la escritura corre en un pool
+    pequeño de hilos; con el buffer de escritura activo solo encola filas y vuelve enseguida.
+    """
+    def __init__(self, service_factory: Callable, executor: ThreadPoolExecutor, **service_kwargs):
+        """
+        Args:
+            service_factory: Clase o fábrica con la firma de GoogleSheetsService.
+            executor: Pool de hilos donde se construye el servicio y se escribe.
+            service_kwargs: Argumentos comunes para la fábrica (write_buffer, client_pool, metrics).
+        """
+        self.service_factory = service_factory
+        self.executor = executor
+        self.service_kwargs = service_kwargs
+
+    async def save_results(self, creds, user_email: str, results: List[ReceiptProcessingResult]) -> Dict:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._save, creds, user_email, results)
+
+    def _save(self, creds, user_email: str, results: List[ReceiptProcessingResult]) -> Dict:
+        sheets_service = self.service_factory(creds=creds, user_email=user_email, **self.service_kwargs)
+        return sheets_service.save_results_to_sheet(results)
@@ -1,43 +1,93 @@
 # src/infrastructure/sheets/google_sheets_service.py
 
 import os
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import time
+from typing import Callable, List
 from ...application.usecases.receipt_processing_result import ReceiptProcessingResult
 from .sheet_factory import SheetFactory
+from .sheets_write_buffer import SheetsWriteBuffer
+from ..clients.google_client_pool import GoogleClientPool
 from ..db.sqlite_manager import get_spreadsheet_id, set_spreadsheet_id
+from ...application.ports.metrics_recorder import MetricsRecorder
 
 
 class GoogleSheetsService:
-    def __init__(self, creds, user_email: str):
+    def __init__(
+        self,
+        creds,
+        user_email: str,
+        write_buffer: SheetsWriteBuffer = None,
+        client_pool: GoogleClientPool = None,
+        metrics: MetricsRecorder = None
+    ):
         self.creds = creds
         self.user_email = user_email
         self.range_name = "'Gastos'!A1"
+        # si hay buffer, las filas se escriben en diferido y en bloque
+        self.write_buffer = write_buffer
+        # registro opcional de la duracion de cada llamada a sqlite y a la api
+        self.metrics = metrics
 
-        # Inicializamos la factory
-        self.sheet_factory = SheetFactory(self.creds)
+        # Con pool se reutiliza el cliente del usuario en vez de llamar a build() en cada peticion
+        self.client_pool = client_pool
+        if self.client_pool is not None:
+            self.service = self.client_pool.get(self.user_email, 'sheets', 'v4', self.creds)
+        else:
+            from googleapiclient.discovery import build
+            self.service = build('sheets', 'v4', credentials=self.creds)
 
         # Revisamos si ya existe un spreadsheet para el usuario
+        start = time.perf_counter()
         self.spreadsheet_id = get_spreadsheet_id(self.user_email)
+        self._observe("sqlite_lookup", start)
         if not self.spreadsheet_id:
             if not self.creds or not self.user_email:
                 raise ValueError("No hay credenciales disponibles para crear la hoja del usuario")
+            # La factory solo se necesita para crear la hoja y comparte el mismo cliente
+            self.sheet_factory = SheetFactory(self.creds, service=self.service)
+            start = time.perf_counter()
             self.spreadsheet_id = self.sheet_factory.create_user_spreadsheet(
                 title=f"ticketapp - {self.user_email}"
             )
+            self._observe("sheets_create", start)
+            start = time.perf_counter()
             set_spreadsheet_id(self.user_email, self.spreadsheet_id)
+            self._observe("sqlite_write", start)
 
-        self.service = build('sheets', 'v4', credentials=self.creds)
+    def save_to_sheet(self, result: ReceiptProcessingResult, on_written: Callable = None, on_failed: Callable = None):
+        return self.save_results_to_sheet([result], on_written=on_written, on_failed=on_failed)
 
-    def save_to_sheet(self, result: ReceiptProcessingResult):
+    def save_results_to_sheet(
+        self, results: List[ReceiptProcessingResult], on_written: Callable = None, on_failed: Callable = None
+    ):
+        """
+        Guarda varios recibos con una sola llamada de append.
+        Cada recibo lleva sus filas de productos seguidas de su fila de total.
+        Con buffer las filas solo se encolan ("queued" en la respuesta), `on_written`
+        se llama cuando de verdad llegan a la hoja y `on_failed` si el buffer las da por perdidas.
+        """
+        if self.write_buffer is not None:
+            rows = self._build_rows(results)
+            pending = self.write_buffer.enqueue(
+                self._service_for_current_thread, self.spreadsheet_id, rows,
+                user_email=self.user_email, on_written=on_written, on_failed=on_failed
+            )
+            return {
+                "spreadsheet_id": self.spreadsheet_id,
+                "updated_cells": 0,
+                "pending_rows": pending,
+                "queued": True
+            }
+
+        from googleapiclient.errors import HttpError
         try:
             # Verificamos si la hoja está vacía
             is_sheet_empty = False
             try:
-                result_check = self.service.spreadsheets().values().get(
+                result_check = self._execute("sheets_get", self.service.spreadsheets().values().get(
                     spreadsheetId=self.spreadsheet_id,
                     range="'Gastos'!A1:A1"
-                ).execute()
+                ))
                 if 'values' not in result_check:
                     is_sheet_empty = True
             except HttpError as e:
@@ -50,32 +100,28 @@ class GoogleSheetsService:
             if is_sheet_empty:
                 headers = ["fecha", "producto", "cantidad", "precio unitario", "total"]
                 header_body = {'values': [headers]}
-                self.service.spreadsheets().values().append(
+                self._execute("sheets_append_header", self.service.spreadsheets().values().append(
                     spreadsheetId=self.spreadsheet_id,
                     range=self.range_name,
                     valueInputOption='RAW',  # RAW evita interpretación automática
                     body=header_body
-                ).execute()
+                ))
 
-            # Construimos las filas, forzando fecha como texto con ' delante
-            rows = [
-                [f"'{item.fecha}", item.producto, item.cantidad, f"{item.precio:.2f}", ""]
-                for item in result.receipt_data_list
-            ]
-            # Agregamos la fila del total al final
-            rows.append(["", "", "", "", f"{result.total:.2f}"])
+            rows = self._build_rows(results)
 
             body = {'values': rows}
-            result_append = self.service.spreadsheets().values().append(
+            result_append = self._execute("sheets_append", self.service.spreadsheets().values().append(
                 spreadsheetId=self.spreadsheet_id,
                 range=self.range_name,
                 valueInputOption='RAW',  # RAW para mantener el formato
                 insertDataOption='INSERT_ROWS',
                 body=body
-            ).execute()
+            ))
 
             updated_cells = result_append.get('updates', {}).get('updatedCells', 0)
             print(f"{updated_cells} celdas actualizadas")
+            if on_written is not None:
+                on_written()
 
             return {
                 "spreadsheet_id": self.spreadsheet_id,
@@ -85,3 +131,33 @@ class GoogleSheetsService:
         except Exception as e:
             print(f"Error al escribir en Google Sheets: {e}")
             raise
+
+    def _execute(self, stage: str, request):
+        # ejecuta la peticion a la api midiendo su duracion
+        start = time.perf_counter()
+        try:
+            return request.execute()
+        finally:
+            self._observe(stage, start)
+
+    def _observe(self, stage: str, start: float):
+        if self.metrics is not None:
+            self.metrics.observe_duration(stage, time.perf_counter() - start)
+
+    def _service_for_current_thread(self):
+        # el buffer escribe desde su propio hilo; con pool cada hilo recibe su propio cliente
+        if self.client_pool is not None:
+            return self.client_pool.get(self.user_email, 'sheets', 'v4', self.creds)
+        return self.service
+
+    def _build_rows(self, results: List[ReceiptProcessingResult]) -> list:
+        # Construimos las filas, forzando fecha como texto con ' delante
+        rows = []
+        for result in results:
+            rows.extend(
+                [f"'{item.fecha}", item.producto, item.cantidad, f"{item.precio:.2f}", ""]
+                for item in result.receipt_data_list
+            )
+            # Agregamos la fila del total al final de cada recibo
+            rows.append(["", "", "", "", f"{result.total:.2f}"])
+        return rows
@@ -1,15 +1,17 @@
 # sheet_factory.py esta clase se encarga de crear hojas de calculo en google sheets
 
-from googleapiclient.discovery import build
-
 class SheetFactory:
-    def __init__(self, creds):
+    def __init__(self, creds, service=None):
         """
         inicializa la fabrica con credenciales de google sheets/drive
+        si se pasa un servicio de sheets ya construido se reutiliza
         """
         self.creds = creds
-        # se construye el servicio de sheets
-        self.service = build("sheets", "v4", credentials=self.creds)
+        # se construye el servicio de sheets solo si no se recibio uno
+        if service is None:
+            from googleapiclient.discovery import build
+            service = build("sheets", "v4", credentials=self.creds)
+        self.service = service
 
     def create_user_spreadsheet(self, title="ticketapp"):
         """
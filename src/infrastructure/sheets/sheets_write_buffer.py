@@ -0,0 +1,390 @@
+# sheets_write_buffer.py esta clase acumula filas por hoja de calculo y las escribe en google sheets en bloque
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from ...application.ports.metrics_recorder import MetricsRecorder
+from ..resilience.resilient_caller import RETRYABLE_STATUS
+
+HEADERS = ["fecha", "producto", "cantidad", "precio unitario", "total"]
+
+JOURNAL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending_rows (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        spreadsheet_id TEXT NOT NULL,
+        user_email TEXT,
+        rows TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+"""
+
+# filas que no se pudieron escribir nunca (hoja borrada, permiso retirado, demasiados intentos)
+DEAD_LETTER_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS failed_rows (
+        id INTEGER PRIMARY KEY,
+        spreadsheet_id TEXT NOT NULL,
+        user_email TEXT,
+        rows TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        failed_at REAL NOT NULL,
+        error TEXT
+    )
+"""
+
+
+class SheetsWriteBuffer:
+    """
+    Buffer de escritura diferida: junta las filas de muchos recibos por spreadsheet_id
+    y las envia con un solo `values().append` cuando se supera `max_rows` o pasa
+    `flush_interval` segundos desde la primera fila pendiente.
+    Con `journal_path` las filas pendientes se guardan también en SQLite hasta que
+    se escriben, y las que quedaron de un arranque anterior se vuelven a encolar.
+    Los errores que no se arreglan reintentando (403, 404, 400, token revocado) y las
+    filas que superan `max_attempts` se apartan a `failed_rows` para no bloquear la hoja.
+    """
+    def __init__(
+        self,
+        max_rows: int = 500,
+        flush_interval: float = 2.0,
+        range_name: str = "'Gastos'!A1",
+        metrics: MetricsRecorder = None,
+        journal_path: Optional[str] = None,
+        service_resolver: Optional[Callable] = None,
+        max_retry_interval: float = 60.0,
+        close_attempts: int = 3,
+        max_attempts: int = 10
+    ):
+        """
+        Args:
+            max_rows: Filas pendientes de una hoja a partir de las que se escribe sin esperar.
+            flush_interval: Segundos máximos que espera la primera fila pendiente de una hoja.
+            range_name: Rango donde se añaden las filas.
+            metrics: Registro opcional de la duración de cada escritura y de los fallos.
+            journal_path: Ruta de un archivo SQLite donde se guardan las filas pendientes.
+            service_resolver: Función opcional que recibe un email y devuelve una fábrica de
+                clientes de sheets, para escribir las filas recuperadas sin esperar al usuario.
+            max_retry_interval: Espera máxima en segundos entre dos intentos fallidos de una hoja.
+            close_attempts: Intentos de escritura al cerrar antes de dejar las filas en el journal.
+            max_attempts: Intentos fallidos de una fila antes de darla por perdida.
+        """
+        self.max_rows = max_rows
+        self.metrics = metrics
+        self.flush_interval = flush_interval
+        self.range_name = range_name
+        self.service_resolver = service_resolver
+        self.max_retry_interval = max_retry_interval
+        self.close_attempts = close_attempts
+        self.max_attempts = max_attempts
+        # spreadsheet_id -> {"service_factory", "user_email", "entries", "since", "retry_at", "failures"}
+        # cada entrada es un enqueue: {"id" (fila del journal), "rows", "on_written", "on_failed", "attempts"}
+        self._buffers = {}
+        # hojas que ya tienen encabezados, para no consultar a1 en cada recibo
+        self._headers_written = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.journal_path = str(journal_path) if journal_path else None
+        self._local = threading.local()
+        self._journal_lock = threading.Lock()
+        if self.journal_path:
+            Path(self.journal_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = self._journal()
+            conn.execute(JOURNAL_SCHEMA)
+            conn.execute(DEAD_LETTER_SCHEMA)
+            conn.commit()
+            self._replay_journal()
+        self._flusher = threading.Thread(target=self._flush_loop, name="sheets-flusher", daemon=True)
+        self._flusher.start()
+
+    def enqueue(
+        self, service_factory, spreadsheet_id: str, rows: list, user_email: str = None,
+        on_written: Callable = None, on_failed: Callable = None
+    ) -> int:
+        """
+        agrega filas al buffer de la hoja y devuelve cuantas filas quedan pendientes.
+        `service_factory` devuelve un cliente de sheets valido para el hilo que lo llama;
+        `on_written` se llama (sin argumentos, desde el hilo de escritura) cuando las filas ya estan en sheets
+        y `on_failed` (con el error) cuando se dan por perdidas.
+        """
+        if self._closed:
+            raise RuntimeError("el buffer de sheets ya esta cerrado")
+
+        # la consulta de a1 se hace una sola vez por hoja
+        needs_headers = spreadsheet_id not in self._headers_written and self._is_sheet_empty(service_factory(), spreadsheet_id)
+        with self._lock:
+            add_headers = needs_headers and spreadsheet_id not in self._headers_written
+            self._headers_written.add(spreadsheet_id)
+        if add_headers:
+            rows = [HEADERS] + list(rows)
+
+        # las filas quedan en disco antes de confirmar el encolado
+        entry = _entry(self._journal_add(spreadsheet_id, user_email, rows), rows, on_written, on_failed)
+
+        with self._lock:
+            buffer = self._buffer(spreadsheet_id, user_email)
+            # se usa la fabrica mas reciente, con las credenciales mas nuevas
+            buffer["service_factory"] = service_factory
+            if not buffer["entries"]:
+                buffer["since"] = time.monotonic()
+            if add_headers:
+                buffer["entries"].insert(0, entry)
+            else:
+                buffer["entries"].append(entry)
+            pending = _count_rows(buffer["entries"])
+
+        if pending >= self.max_rows:
+            self._wake.set()
+        return pending
+
+    def flush(self, spreadsheet_id: str = None) -> bool:
+        """escribe de inmediato las filas pendientes de una hoja, o de todas; devuelve false si alguna fallo."""
+        with self._lock:
+            ids = [spreadsheet_id] if spreadsheet_id else list(self._buffers)
+        written = True
+        for sid in ids:
+            written = self._flush_one(sid) and written
+        return written
+
+    def pending_rows(self) -> int:
+        """devuelve el numero de filas que aun no se han escrito en sheets."""
+        with self._lock:
+            return sum(_count_rows(buffer["entries"]) for buffer in self._buffers.values())
+
+    def close(self):
+        """vacia todos los buffers y detiene el hilo de escritura (se llama al apagar la aplicacion)."""
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=max(self.flush_interval, 1) * 2)
+        # un fallo puntual de la api no debe perder las filas: se reintenta con espera creciente
+        for attempt in range(self.close_attempts):
+            if self.flush():
+                return
+            if attempt + 1 < self.close_attempts:
+                time.sleep(min(self.max_retry_interval, 2 ** attempt))
+
+        with self._lock:
+            left = {sid: buffer["entries"] for sid, buffer in self._buffers.items() if buffer["entries"]}
+        if not left:
+            return
+        count = sum(_count_rows(entries) for entries in left.values())
+        if self.journal_path:
+            print(f"⚠️ Quedan {count} filas sin escribir en Google Sheets, se reintentan al arrancar desde {self.journal_path}")
+            return
+        # sin journal las filas solo quedan en el log, para poder recuperarlas a mano
+        print(f"⚠️ Se pierden {count} filas que no se pudieron escribir en Google Sheets:")
+        for sid, entries in left.items():
+            for entry in entries:
+                print(f"⚠️ {sid}: {json.dumps(entry['rows'], ensure_ascii=False)}")
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                due = [
+                    sid for sid, buffer in self._buffers.items()
+                    if buffer["entries"] and buffer["service_factory"] is not None and now >= buffer["retry_at"]
+                    and (_count_rows(buffer["entries"]) >= self.max_rows or now - buffer["since"] >= self.flush_interval)
+                ]
+            for sid in due:
+                self._flush_one(sid)
+
+    def _flush_one(self, spreadsheet_id: str) -> bool:
+        with self._lock:
+            buffer = self._buffers.get(spreadsheet_id)
+            if not buffer or not buffer["entries"]:
+                return True
+            service_factory = buffer["service_factory"]
+            if service_factory is None:
+                # filas recuperadas sin credenciales: se escriben con el siguiente recibo del usuario
+                return False
+            entries, buffer["entries"] = buffer["entries"], []
+        rows = [row for entry in entries for row in entry["rows"]]
+
+        start = time.perf_counter()
+        try:
+            service = service_factory()
+            result_append = service.spreadsheets().values().append(
+                spreadsheetId=spreadsheet_id,
+                range=self.range_name,
+                valueInputOption='RAW',  # RAW para mantener el formato
+                insertDataOption='INSERT_ROWS',
+                body={'values': rows}
+            ).execute()
+            updated_cells = result_append.get('updates', {}).get('updatedCells', 0)
+            print(f"{updated_cells} celdas actualizadas en {spreadsheet_id} ({len(rows)} filas)")
+            if self.metrics is not None:
+                self.metrics.observe_duration("sheets_append", time.perf_counter() - start)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.increment("receipt_failures_total", stage="sheets_append")
+            print(f"Error al escribir en Google Sheets: {e}")
+            if is_permanent_error(e):
+                # la hoja no va a aceptar estas filas por mucho que se reintente
+                with self._lock:
+                    self._headers_written.discard(spreadsheet_id)
+                self._dead_letter(spreadsheet_id, entries, e)
+                return False
+            for entry in entries:
+                entry["attempts"] += 1
+            exhausted = [entry for entry in entries if entry["attempts"] >= self.max_attempts]
+            # las filas vuelven al principio del buffer y la hoja espera mas en cada fallo seguido
+            with self._lock:
+                buffer["entries"] = [entry for entry in entries if entry["attempts"] < self.max_attempts] + buffer["entries"]
+                buffer["failures"] += 1
+                backoff = min(self.max_retry_interval, self.flush_interval * 2 ** buffer["failures"])
+                buffer["retry_at"] = time.monotonic() + backoff
+            if exhausted:
+                self._dead_letter(spreadsheet_id, exhausted, e)
+            return False
+
+        with self._lock:
+            buffer["failures"] = 0
+            buffer["retry_at"] = 0.0
+        self._journal_remove([entry["id"] for entry in entries if entry["id"] is not None])
+        for entry in entries:
+            _notify(entry["on_written"])
+        return True
+
+    def _dead_letter(self, spreadsheet_id: str, entries: list, error: Exception):
+        """aparta las filas que no se van a poder escribir y avisa a quien las encolo."""
+        count = _count_rows(entries)
+        if self.metrics is not None:
+            self.metrics.increment("receipt_failures_total", stage="sheets_dead_letter")
+        ids = [entry["id"] for entry in entries if entry["id"] is not None]
+        moved = False
+        if self.journal_path and ids:
+            conn = self._journal()
+            try:
+                with self._journal_lock, conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO failed_rows (id, spreadsheet_id, user_email, rows, created_at, failed_at, error) "
+                        "SELECT id, spreadsheet_id, user_email, rows, created_at, ?, ? FROM pending_rows WHERE id=?",
+                        [(time.time(), str(error), entry_id) for entry_id in ids]
+                    )
+                    conn.executemany("DELETE FROM pending_rows WHERE id=?", [(entry_id,) for entry_id in ids])
+                moved = True
+            except sqlite3.Error as e:
+                print(f"⚠️ No se pudieron apartar {count} filas en el journal de Google Sheets: {e}")
+        if moved:
+            print(f"⚠️ Se apartan {count} filas de {spreadsheet_id} que no se pueden escribir en Google Sheets a failed_rows de {self.journal_path}")
+        else:
+            # sin journal las filas solo quedan en el log, para poder recuperarlas a mano
+            print(f"⚠️ Se pierden {count} filas de {spreadsheet_id} que no se pueden escribir en Google Sheets:")
+            for entry in entries:
+                print(f"⚠️ {spreadsheet_id}: {json.dumps(entry['rows'], ensure_ascii=False)}")
+        for entry in entries:
+            _notify(entry["on_failed"], error)
+
+    def _buffer(self, spreadsheet_id: str, user_email: Optional[str]) -> dict:
+        # se llama con el lock tomado
+        buffer = self._buffers.get(spreadsheet_id)
+        if buffer is None:
+            buffer = self._buffers[spreadsheet_id] = {
+                "service_factory": None,
+                "user_email": user_email,
+                "entries": [],
+                "since": time.monotonic(),
+                "retry_at": 0.0,
+                "failures": 0
+            }
+        elif user_email:
+            buffer["user_email"] = user_email
+        return buffer
+
+    def _replay_journal(self):
+        rows = self._journal().execute(
+            "SELECT id, spreadsheet_id, user_email, rows FROM pending_rows ORDER BY id"
+        ).fetchall()
+        if not rows:
+            return
+        with self._lock:
+            for entry_id, spreadsheet_id, user_email, entry_rows in rows:
+                buffer = self._buffer(spreadsheet_id, user_email)
+                buffer["entries"].append(_entry(entry_id, json.loads(entry_rows)))
+                # los encabezados, si hacian falta, ya van en las filas guardadas
+                self._headers_written.add(spreadsheet_id)
+            for buffer in self._buffers.values():
+                # se escriben en la primera vuelta del hilo si hay con que hacerlo
+                buffer["since"] = 0.0
+                if self.service_resolver is not None and buffer["user_email"]:
+                    buffer["service_factory"] = self.service_resolver(buffer["user_email"])
+        print(f"🔹 {len(rows)} escrituras pendientes de Google Sheets recuperadas de {self.journal_path}")
+
+    def _journal_add(self, spreadsheet_id: str, user_email: Optional[str], rows: list) -> Optional[int]:
+        if not self.journal_path:
+            return None
+        conn = self._journal()
+        with self._journal_lock, conn:
+            cursor = conn.execute(
+                "INSERT INTO pending_rows (spreadsheet_id, user_email, rows, created_at) VALUES (?, ?, ?, ?)",
+                (spreadsheet_id, user_email, json.dumps(rows, ensure_ascii=False), time.time())
+            )
+        return cursor.lastrowid
+
+    def _journal_remove(self, ids: list):
+        if not self.journal_path or not ids:
+            return
+        conn = self._journal()
+        try:
+            with self._journal_lock, conn:
+                conn.executemany("DELETE FROM pending_rows WHERE id=?", [(entry_id,) for entry_id in ids])
+        except sqlite3.Error as e:
+            # las filas ya estan en sheets; en el peor caso se repiten al arrancar
+            print(f"⚠️ No se pudieron borrar {len(ids)} escrituras del journal de Google Sheets: {e}")
+
+    def _journal(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.journal_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _is_sheet_empty(self, service, spreadsheet_id: str) -> bool:
+        from googleapiclient.errors import HttpError
+        start = time.perf_counter()
+        try:
+            result_check = service.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id,
+                range="'Gastos'!A1:A1"
+            ).execute()
+            if self.metrics is not None:
+                self.metrics.observe_duration("sheets_get", time.perf_counter() - start)
+            return 'values' not in result_check
+        except HttpError as e:
+            if e.resp.status == 400:
+                return True
+            raise
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """decide si un error de la api de sheets no se arregla reintentando (permiso, hoja borrada, token revocado)."""
+    from google.auth.exceptions import RefreshError
+    from googleapiclient.errors import HttpError
+    if isinstance(error, RefreshError):
+        return True
+    if isinstance(error, HttpError):
+        return error.resp.status not in RETRYABLE_STATUS
+    return False
+
+
+def _entry(entry_id: Optional[int], rows: list, on_written: Callable = None, on_failed: Callable = None) -> dict:
+    return {"id": entry_id, "rows": rows, "on_written": on_written, "on_failed": on_failed, "attempts": 0}
+
+
+def _notify(callback: Optional[Callable], *args):
+    if callback is None:
+        return
+    try:
+        callback(*args)
+    except Exception as e:
+        print(f"⚠️ Error al avisar del resultado de la escritura en Google Sheets: {e}")
+
+
+def _count_rows(entries: list) -> int:
+    return sum(len(entry["rows"]) for entry in entries)
@@ -0,0 +1,88 @@
+# warm_up.py prepara los clientes de los backends en segundo plano y dice cuando la aplicacion esta lista
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+from ...application.ports.metrics_recorder import MetricsRecorder
+
+
+class WarmUp:
+    """
+    Ejecuta en paralelo las tareas de calentamiento registradas (importar librerías,
+    construir clientes, abrir conexiones) sin bloquear el arranque. `ready` es True
+    cuando todas terminaron bien; sin tareas, la aplicación está lista desde el principio.
+    """
+    def __init__(self, metrics: Optional[MetricsRecorder] = None):
+        """
+        Args:
+            metrics: Registro opcional de la duración de cada tarea ("warm_up_<nombre>").
+        """
+        self.metrics = metrics
+        self._tasks: Dict[str, Callable[[], object]] = {}
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started_at = None
+
+    def register(self, name: str, task: Callable[[], object]):
+        """anade una tarea; se ejecuta al llamar a start."""
+        with self._lock:
+            self._tasks[name] = task
+            self._state[name] = {"state": "pending"}
+
+    def start(self):
+        """lanza todas las tareas en hilos propios y vuelve de inmediato."""
+        with self._lock:
+            tasks = list(self._tasks.items())
+            self._started_at = time.perf_counter()
+        if not tasks:
+            self._done.set()
+            return
+        threads = [
+            threading.Thread(target=self._run, args=(name, task), name=f"warm-up-{name}", daemon=True)
+            for name, task in tasks
+        ]
+        for thread in threads:
+            thread.start()
+        # un hilo mas marca el final cuando terminan todas
+        threading.Thread(target=self._wait_all, args=(threads,), name="warm-up", daemon=True).start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """espera a que terminen las tareas; devuelve si la aplicacion quedo lista."""
+        self._done.wait(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._done.is_set() and all(task["state"] == "done" for task in self._state.values())
+
+    def status(self) -> dict:
+        """devuelve el estado, la duracion y el error de cada tarea."""
+        with self._lock:
+            tasks = {name: dict(state) for name, state in self._state.items()}
+            finished = self._done.is_set()
+        return {"ready": self.ready, "finished": finished, "tasks": tasks}
+
+    def _run(self, name: str, task: Callable[[], object]):
+        with self._lock:
+            self._state[name] = {"state": "running"}
+        start = time.perf_counter()
+        try:
+            task()
+            state = {"state": "done"}
+        except Exception as e:
+            print(f"⚠️ Error en el calentamiento de {name}: {e}")
+            state = {"state": "failed", "error": str(e)}
+        elapsed = time.perf_counter() - start
+        state["seconds"] = round(elapsed, 3)
+        with self._lock:
+            self._state[name] = state
+        if self.metrics is not None:
+            self.metrics.observe_duration(f"warm_up_{name}", elapsed)
+
+    def _wait_all(self, threads):
+        for thread in threads:
+            thread.join()
+        self._done.set()
+        print(f"🔹 Calentamiento terminado en {time.perf_counter() - self._started_at:.2f} s: {self.status()['tasks']}")